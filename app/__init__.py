@@ -1,31 +1,58 @@
 from flask import Flask
-from pymongo import MongoClient
 from config import Config
-from pymongo.errors import ServerSelectionTimeoutError
 import logging
 
-mongo = None
+logger = logging.getLogger(__name__)
+
 
 def create_app(config_class=Config):
-    global mongo
     app = Flask(__name__, static_folder="../static")
     app.config.from_object(config_class)
-    logging.basicConfig(level=logging.DEBUG)
+    logging.basicConfig(level=app.config["LOG_LEVEL"])
+
+    # orjson-backed JSON for responses and `tojson` (ObjectId, datetime, Decimal128)
+    from .utils.json_provider import init_json
+    init_json(app)
+
+    from .utils.instrumentation import init_instrumentation
+
+    # The Mongo client is created lazily per process (see models.get_mongo_client),
+    # so this is safe to call before gunicorn forks its workers.
+
+    # Password hashes run on a small process pool, created on first use
+    from .utils.passwords import init_passwords
+    init_passwords(app)
+
+    from .utils.query_executor import init_query_executor
+    init_query_executor(app)
 
-    # Initialize Mongo client
-    mongo = MongoClient(
-        app.config["MONGO_URI"],
-        serverSelectionTimeoutMS=5000
-    )
+    from .models.migrations import init_migrations
+    init_migrations(app)
 
-    try:
-        mongo.admin.command("ping")
-        print("✅ Mongo connected")
-    except ServerSelectionTimeoutError as e:
-        print("❌ Mongo connection failed:", e)
-        raise
+    from .utils.assets import init_assets
+    init_assets(app)
 
-    app.mongo_client = mongo
+    # Registered before compression so it runs after it and sees final sizes
+    init_instrumentation(app)
+
+    from .utils.read_routing import init_read_routing
+    init_read_routing(app)
+
+    from .utils.profiling import init_profiling
+    init_profiling(app)
+
+    # Pushes group balance deltas to SSE clients (see routes/dashboard/groupRoute.group_live)
+    from .utils.live import init_live
+    init_live(app)
+
+    # Expense writes move the group up its members' "my groups"
+    from .models.membershipModel import init_memberships
+    init_memberships(app)
+
+    from .utils.compression import compress_response
+    from .utils.cache import cached_fragment
+    app.after_request(compress_response)
+    app.jinja_env.globals["cached"] = cached_fragment
 
     # Import blueprints here to avoid circular imports
     from .routes.userAuth import user_bp
@@ -36,6 +63,9 @@ def create_app(config_class=Config):
     from .routes.dashboard.settingsRoute import settings_bp
     from .routes.landing import land
     from .routes.dashboard.reportRoute import report_bp
+    from .routes.metrics import metrics_bp
+    from .routes.profiling import profiling_bp
+    from .routes.api import api_bp
 
     # Register blueprints
     app.register_blueprint(land)
@@ -46,5 +76,12 @@ def create_app(config_class=Config):
     app.register_blueprint(expense_bp)
     app.register_blueprint(settings_bp)
     app.register_blueprint(report_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(profiling_bp)
+    app.register_blueprint(api_bp)
+
+    if app.config["ASYNC_VIEWS"]:
+        from .routes.dashboard.asyncRoute import init_async_views
+        init_async_views(app)
 
     return app
@@ -1,16 +1,140 @@
-from flask import current_app
+from flask import current_app, g
+from pymongo import MongoClient
+from pymongo.read_preferences import (
+    Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+)
+import importlib.util
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# Wire compressors and the module pymongo needs for each
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+_client_lock = threading.Lock()
+_warned_no_transactions = set()
+
+
+def available_compressors(names):
+    wanted = [n.strip() for n in names.split(",") if n.strip()]
+    return [n for n in wanted if n in COMPRESSOR_MODULES and importlib.util.find_spec(COMPRESSOR_MODULES[n])]
+
+
+def mongo_client_options(config):
+    options = {
+        "serverSelectionTimeoutMS": config["MONGO_SERVER_SELECTION_TIMEOUT_MS"],
+        "maxPoolSize": config["MONGO_MAX_POOL_SIZE"],
+        "minPoolSize": config["MONGO_MIN_POOL_SIZE"],
+        "maxIdleTimeMS": config["MONGO_MAX_IDLE_TIME_MS"],
+        "waitQueueTimeoutMS": config["MONGO_WAIT_QUEUE_TIMEOUT_MS"],
+    }
+    compressors = available_compressors(config["MONGO_COMPRESSORS"])
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return options
+
+
+def get_mongo_client(app):
+    """
+    One MongoClient per process, created on first use. pymongo clients are
+    not fork-safe, so nothing is opened while create_app runs in the
+    gunicorn master; each worker builds its own after the fork.
+    """
+    pid = os.getpid()
+    entry = app.extensions.get("mongo")
+    if entry is not None and entry[0] == pid:
+        return entry[1]
+
+    with _client_lock:
+        entry = app.extensions.get("mongo")
+        if entry is not None and entry[0] == pid:
+            return entry[1]
+
+        from ..utils.instrumentation import command_listener, pool_monitor
+        options = mongo_client_options(app.config)
+        client = MongoClient(
+            app.config["MONGO_URI"],
+            event_listeners=[command_listener, pool_monitor],
+            **options
+        )
+        app.extensions["mongo"] = (pid, client)
+        logger.info("Mongo client created (pid %s, pool %s-%s, compressors %s)",
+                    pid, options["minPoolSize"], options["maxPoolSize"], options.get("compressors", "none"))
+        return client
+
+
+def read_preference(name, max_staleness=-1):
+    if not name or name not in READ_PREFERENCES:
+        return None
+    if name == "primary":
+        return Primary()
+    return READ_PREFERENCES[name](max_staleness=max_staleness)
+
+
+# -------------------------
+# READ POLICIES
+# -------------------------
+# "primary"   - writes, and reads that must see them (the default)
+# "analytics" - heavy aggregates and report scans; may go to a secondary
+#               no more than ANALYTICS_MAX_STALENESS_SECONDS behind
+def resolve_read_preference(policy=None):
+    policy = policy or g.get("read_policy") or "primary"
+
+    if policy == "primary":
+        return None
+
+    # Right after this client wrote something, keep it on the primary
+    if g.get("pin_primary"):
+        return None
+
+    if policy == "analytics":
+        return read_preference(
+            current_app.config["ANALYTICS_READ_PREFERENCE"],
+            current_app.config["ANALYTICS_MAX_STALENESS_SECONDS"]
+        )
+    raise ValueError(f"Unknown read policy: {policy}")
+
 
 class GetDB:
     @staticmethod
-    def _get_db():
+    def _get_db(policy=None):
         db_name = current_app.config.get('MONGO_DBNAME')
         if not db_name:
             raise RuntimeError("MONGO_DBNAME is not set in config.py.")
 
+        pref = resolve_read_preference(policy)
+
         try:
-            db = current_app.mongo_client[db_name]
-            db.client.admin.command('ping')
-            return db
-        
+            client = get_mongo_client(current_app._get_current_object())
+            if pref is None:
+                return client[db_name]
+            return client.get_database(db_name, read_preference=pref)
+
         except Exception as e:
             raise RuntimeError(f"MONGO ERROR: {e}")
+
+    @staticmethod
+    def run_atomically(fn, purpose="writing"):
+        """
+        fn(session) inside a transaction, retried on transient errors.
+        Standalone servers have none: fn(None) runs the writes one by one.
+        """
+        client = GetDB._get_db().client
+        topology = getattr(getattr(client, "topology_description", None), "topology_type_name", None)
+        if not isinstance(topology, str) or topology not in ("ReplicaSetWithPrimary", "Sharded"):
+            if purpose not in _warned_no_transactions:
+                _warned_no_transactions.add(purpose)
+                logger.warning("No transaction support (%s), %s without one", topology, purpose)
+            return fn(None)
+        with client.start_session() as session:
+            return session.with_transaction(fn)
@@ -0,0 +1,247 @@
+# archiveModel.py
+import logging
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReplaceOne
+from . import GetDB
+from .expenseModel import ExpenseModel, SCHEMA_VERSION, to_ref
+from .groupModel import GroupModel, id_variants
+
+logger = logging.getLogger(__name__)
+
+# Hot / cold layout
+#
+#   expenses           - recent expenses, what every page reads
+#   expenses_archive   - old expenses, moved as is; only reports read them
+#   expense_buckets    - one per (group, month) of archived expenses, pre-summed:
+#                        { group_id, month: "2024-03", year, count, total, members,
+#                          users: { uid: { paid, should, net, owes, owed, created } } }
+#   archive_snapshots  - one per group (_id = group_id), the same sums over all
+#                        its buckets plus `through`, the newest archiving cutoff
+#
+# Live numbers are snapshot + whatever is still in `expenses`, so a group
+# page reads one small document plus the recent window however old it is.
+#
+# Archived expenses are read-only. They can still be opened
+# (ExpenseModel.get_by_id looks here too), but their amounts are already
+# summed into the buckets and the snapshot, so editing or deleting one is
+# refused (is_archived) rather than leaving those totals wrong.
+USER_STATS = ("paid", "should", "net", "owes", "owed", "created")
+
+
+class ArchiveModel:
+
+    @staticmethod
+    def cold(policy=None):
+        return GetDB._get_db(policy).expenses_archive
+
+    @staticmethod
+    def buckets(policy=None):
+        return GetDB._get_db(policy).expense_buckets
+
+    @staticmethod
+    def snapshots(policy=None):
+        return GetDB._get_db(policy).archive_snapshots
+
+    # -------------------------
+    # SUMMARIES
+    # -------------------------
+    @staticmethod
+    def summarize(expenses):
+        """Pre-summed counters for a batch of expenses, per member."""
+        summary = {"count": 0, "total": 0.0, "users": {}}
+
+        def stats(uid):
+            return summary["users"].setdefault(str(uid), dict.fromkeys(USER_STATS, 0.0))
+
+        for e in expenses:
+            amount = float(e.get("amount", 0))
+            creator = str(e.get("created_by"))
+            summary["count"] += 1
+            summary["total"] += amount
+            stats(creator)["created"] += amount
+
+            for uid, data in ExpenseModel.final_split(e).items():
+                net = float(data.get("net_balance", 0))
+                user = stats(uid)
+                user["paid"] += float(data.get("paid", 0))
+                user["should"] += float(data.get("should_pay", 0))
+                user["net"] += net
+                if net < 0:
+                    user["owes"] += -net
+                    # Same rule as get_total_owed_to_user
+                    if str(uid) != creator:
+                        stats(creator)["owed"] += -net
+        return summary
+
+    @staticmethod
+    def _inc_update(summary):
+        inc = {"count": summary["count"], "total": round(summary["total"], 2)}
+        for uid, stats in summary["users"].items():
+            for key, value in stats.items():
+                if value:
+                    inc[f"users.{uid}.{key}"] = round(value, 2)
+        return {
+            "$inc": inc,
+            "$addToSet": {"members": {"$each": [to_ref(uid) for uid in summary["users"]]}}
+        }
+
+    # -------------------------
+    # ARCHIVING
+    # -------------------------
+    @staticmethod
+    def cutoff(days):
+        return datetime.utcnow() - timedelta(days=days)
+
+    @staticmethod
+    def _archivable_filter(cutoff):
+        # Only migrated (v3) expenses: buckets and cold reads assume one shape
+        return {"created_at": {"$lt": cutoff}, "schema_version": SCHEMA_VERSION}
+
+    @staticmethod
+    def groups_to_archive(cutoff):
+        return [
+            g for g in ExpenseModel.collection().distinct("group_id", ArchiveModel._archivable_filter(cutoff))
+            if g is not None
+        ]
+
+    @staticmethod
+    def archive_group(group_id, cutoff, batch_size=1000):
+        """
+        Moves the group's expenses older than `cutoff` to the cold
+        collection and folds them into its month buckets and snapshot.
+        Each batch is one transaction, so readers never see an expense
+        both in the snapshot and in the hot collection.
+        """
+        group_ref = to_ref(group_id)
+        query = {"group_id": group_ref, **ArchiveModel._archivable_filter(cutoff)}
+        moved = 0
+
+        while True:
+            docs = list(ExpenseModel.collection().find(query).sort("_id", 1).limit(batch_size))
+            if not docs:
+                break
+
+            months = {}
+            for d in docs:
+                months.setdefault((d["created_at"].year, d["created_at"].month), []).append(d)
+
+            def move(session):
+                ArchiveModel.cold().bulk_write(
+                    [ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in docs],
+                    ordered=False, session=session
+                )
+                for (year, month), month_docs in months.items():
+                    update = ArchiveModel._inc_update(ArchiveModel.summarize(month_docs))
+                    update["$set"] = {"year": year, "month_number": month}
+                    ArchiveModel.buckets().update_one(
+                        {"group_id": group_ref, "month": f"{year}-{month:02d}"},
+                        update, upsert=True, session=session
+                    )
+                update = ArchiveModel._inc_update(ArchiveModel.summarize(docs))
+                update["$max"] = {"through": cutoff}
+                ArchiveModel.snapshots().update_one({"_id": group_ref}, update, upsert=True, session=session)
+                ExpenseModel.collection().delete_many(
+                    {"_id": {"$in": [d["_id"] for d in docs]}}, session=session
+                )
+
+            # Standalone servers have no transactions: a crash half way
+            # through a group can leave it counted twice, re-run from a backup.
+            GetDB.run_atomically(move, "archiving")
+            moved += len(docs)
+
+        if moved:
+            # Older checkpoints no longer line up with the hot collection
+            from .settlementModel import SettlementModel
+            SettlementModel.write_checkpoint(group_ref)
+            GroupModel.touch(group_ref)
+        return moved
+
+    @staticmethod
+    def archive_expenses(days, limit_groups=None):
+        cutoff = ArchiveModel.cutoff(days)
+        moved = {}
+        for group_id in ArchiveModel.groups_to_archive(cutoff)[:limit_groups]:
+            moved[str(group_id)] = ArchiveModel.archive_group(group_id, cutoff)
+            logger.info("Archived %d expenses of group %s", moved[str(group_id)], group_id)
+        return moved
+
+    # -------------------------
+    # READS
+    # -------------------------
+    @staticmethod
+    def get_snapshot(group_id):
+        return ArchiveModel.snapshots().find_one({"_id": {"$in": id_variants(group_id)}})
+
+    @staticmethod
+    def snapshot_users(snapshot):
+        """{ uid: { paid, should, net, owes, owed, created } }, rounded."""
+        return {
+            uid: {key: round(stats.get(key, 0.0), 2) for key in USER_STATS}
+            for uid, stats in ((snapshot or {}).get("users") or {}).items()
+        }
+
+    @staticmethod
+    def snapshot_balances(snapshot):
+        return {uid: stats["net"] for uid, stats in ArchiveModel.snapshot_users(snapshot).items()}
+
+    @staticmethod
+    def get_month_buckets(group_id):
+        return list(
+            ArchiveModel.buckets().find(
+                {"group_id": {"$in": id_variants(group_id)}},
+                {"month": 1, "count": 1, "total": 1}
+            ).sort("month", -1)
+        )
+
+    @staticmethod
+    def is_archived(expense_id):
+        return ArchiveModel.cold().find_one({"_id": ObjectId(str(expense_id))}, {"_id": 1}) is not None
+
+    @staticmethod
+    def get_archived_expenses_for_user(user_id):
+        return [
+            ExpenseModel.hydrate(e)
+            for e in ArchiveModel.cold("analytics").find(ExpenseModel._user_expenses_filter(user_id)).sort("created_at", -1)
+        ]
+
+    @staticmethod
+    def _member_filter(user_id):
+        return {"members": {"$in": id_variants(user_id)}}
+
+    @staticmethod
+    def _user_projection(user_id, *fields):
+        return {f"users.{user_id}": 1, **dict.fromkeys(fields, 1)}
+
+    @staticmethod
+    def _sum_user_stat(docs, user_id, key):
+        return round(sum(((d.get("users") or {}).get(str(user_id)) or {}).get(key, 0.0) for d in docs), 2)
+
+    @staticmethod
+    def get_user_total(user_id, key):
+        """One of USER_STATS summed over the archived part of every group."""
+        docs = ArchiveModel.snapshots("analytics").find(
+            ArchiveModel._member_filter(user_id), ArchiveModel._user_projection(user_id)
+        )
+        return ArchiveModel._sum_user_stat(docs, user_id, key)
+
+    @staticmethod
+    def get_user_monthly(user_id):
+        return ArchiveModel.buckets("analytics").find(
+            ArchiveModel._member_filter(user_id),
+            ArchiveModel._user_projection(user_id, "year", "month_number")
+        )
+
+    @staticmethod
+    def merge_monthly(rows, buckets, user_id):
+        """Adds archived months to the monthly pipeline's rows (same shape)."""
+        totals = {(r["_id"]["year"], r["_id"]["month"]): r["total_amount"] for r in rows}
+        for b in buckets:
+            created = ((b.get("users") or {}).get(str(user_id)) or {}).get("created", 0.0)
+            if created:
+                key = (b["year"], b["month_number"])
+                totals[key] = round(totals.get(key, 0.0) + created, 2)
+        return [
+            {"_id": {"year": year, "month": month}, "total_amount": total}
+            for (year, month), total in sorted(totals.items())
+        ]
@@ -0,0 +1,223 @@
+# asyncDB.py
+import asyncio
+import logging
+from bson.objectid import ObjectId
+from flask import current_app
+
+from . import mongo_client_options, resolve_read_preference
+from .archiveModel import ArchiveModel
+from .expenseModel import ExpenseModel, ACTIVE_GROUP_FIELDS, BALANCE_FIELDS
+from .settlementModel import SettlementModel
+from .groupModel import GroupModel, id_variants, to_object_id
+from .userModel import UserModel
+from ..utils.instrumentation import command_listener, pool_monitor
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:  # motor is optional, fall back to the sync pool on a thread
+    AsyncIOMotorClient = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncGetDB:
+    """Motor database for async views, or None when motor is not installed."""
+
+    @staticmethod
+    def _get_db(policy=None):
+        if AsyncIOMotorClient is None:
+            return None
+
+        client = getattr(current_app, "motor_client", None)
+        if client is None:
+            # connect=False: Flask runs every async view on a fresh event loop,
+            # the motor client must not bind to the first one it sees.
+            client = AsyncIOMotorClient(
+                current_app.config["MONGO_URI"],
+                connect=False,
+                event_listeners=[command_listener, pool_monitor],
+                **mongo_client_options(current_app.config)
+            )
+            current_app.motor_client = client
+
+        pref = resolve_read_preference(policy)
+        if pref is None:
+            return client[current_app.config["MONGO_DBNAME"]]
+        return client.get_database(current_app.config["MONGO_DBNAME"], read_preference=pref)
+
+
+async def _in_thread(fn, *args, **kwargs):
+    # The query executor copies the contextvars, so the app context comes along
+    return await asyncio.wrap_future(current_app.query_executor.submit(fn, *args, **kwargs))
+
+
+class AsyncReads:
+    """Async twins of the read queries used by the dashboard and reports.
+
+    Query shapes come from the sync models so both paths stay identical.
+    """
+
+    # -------------------------
+    # USERS
+    # -------------------------
+    @staticmethod
+    async def get_user_by_ID(user_id):
+        db = AsyncGetDB._get_db()
+        if db is None:
+            return await _in_thread(UserModel.get_user_by_ID, user_id)
+        return await db.users.find_one({"_id": ObjectId(user_id)})
+
+    @staticmethod
+    async def get_all_active_users_except(exclude_user_id):
+        db = AsyncGetDB._get_db()
+        if db is None:
+            return await _in_thread(UserModel.get_all_active_users_except, exclude_user_id)
+        return await db.users.find({"_id": {"$ne": ObjectId(exclude_user_id)}}).to_list(None)
+
+    # -------------------------
+    # GROUPS
+    # -------------------------
+    @staticmethod
+    async def get_user_groups(user_id):
+        db = AsyncGetDB._get_db()
+        if db is None:
+            return await _in_thread(GroupModel.get_user_groups, user_id)
+        return await db.groups.find({"group_members": to_object_id(user_id)}).to_list(None)
+
+    @staticmethod
+    async def get_user_groups_with_users(user_id):
+        db = AsyncGetDB._get_db()
+        if db is None:
+            return await _in_thread(GroupModel.get_user_groups_with_users, user_id)
+
+        groups = await db.groups.aggregate(
+            GroupModel._summary_pipeline({"group_members": to_object_id(user_id)})
+        ).to_list(None)
+        users = await db.users.find(
+            {"_id": {"$in": GroupModel._member_ids(groups, 5)}}
+        ).to_list(None)
+        return GroupModel._attach_members(groups, users, 5)
+
+    # -------------------------
+    # EXPENSES
+    # -------------------------
+    @staticmethod
+    async def get_expenses_for_user(user_id):
+        db = AsyncGetDB._get_db()
+        if db is None:
+            return await _in_thread(ExpenseModel.get_expenses_for_user, user_id)
+        if not user_id:
+            return []
+        expenses = await db.expenses.find(
+            ExpenseModel._user_expenses_filter(user_id)
+        ).sort("created_at", -1).to_list(None)
+        return [ExpenseModel.hydrate(e) for e in expenses]
+
+    @staticmethod
+    async def get_expenses_for_group(group_id, include_archived=False):
+        db = AsyncGetDB._get_db()
+        if db is None:
+            return await _in_thread(ExpenseModel.get_expenses_for_group, group_id, include_archived)
+        if not group_id:
+            return []
+        expenses = await db.expenses.find(
+            ExpenseModel._group_filter(group_id)
+        ).sort("created_at", -1).to_list(None)
+        if include_archived:
+            expenses += await AsyncGetDB._get_db("analytics").expenses_archive.find(
+                ExpenseModel._group_filter(group_id)
+            ).sort("created_at", -1).to_list(None)
+        return [ExpenseModel.hydrate(e) for e in expenses]
+
+    @staticmethod
+    async def get_most_active_groups_for_user(user_id, limit=10):
+        db = AsyncGetDB._get_db("analytics")
+        if db is None:
+            return await _in_thread(ExpenseModel.get_most_active_groups_for_user, user_id, limit)
+
+        pipeline = ExpenseModel._most_active_groups_pipeline(user_id, limit)
+        rows = await db.expenses.aggregate(pipeline).to_list(None)
+        groups = await AsyncGetDB._get_db().groups.find(
+            ExpenseModel._active_groups_filter(rows), ACTIVE_GROUP_FIELDS
+        ).to_list(None)
+        return ExpenseModel._attach_groups(rows, groups)
+
+    @staticmethod
+    async def get_monthly_expenses_for_user(user_id):
+        db = AsyncGetDB._get_db("analytics")
+        if db is None:
+            return await _in_thread(ExpenseModel.get_monthly_expenses_for_user, user_id)
+        pipeline = ExpenseModel._monthly_expenses_pipeline(user_id)
+        rows = await db.expenses.aggregate(pipeline).to_list(None)
+        buckets = await db.expense_buckets.find(
+            ArchiveModel._member_filter(user_id),
+            ArchiveModel._user_projection(user_id, "year", "month_number")
+        ).to_list(None)
+        return ArchiveModel.merge_monthly(rows, buckets, user_id)
+
+    @staticmethod
+    async def _archived_user_total(db, user_id, key):
+        snapshots = await db.archive_snapshots.find(
+            ArchiveModel._member_filter(user_id), ArchiveModel._user_projection(user_id)
+        ).to_list(None)
+        return ArchiveModel._sum_user_stat(snapshots, user_id, key)
+
+    @staticmethod
+    async def _user_settled(user_id):
+        # Settlements are read from the primary like the sync twin
+        settlements = await AsyncGetDB._get_db().settlements.find(
+            SettlementModel._user_filter(user_id), {"from_user": 1, "to_user": 1, "amount": 1}
+        ).to_list(None)
+        return SettlementModel._sum_settled(settlements, user_id)
+
+    @staticmethod
+    async def get_total_owed_to_user(user_id):
+        db = AsyncGetDB._get_db("analytics")
+        if db is None:
+            return await _in_thread(ExpenseModel.get_total_owed_to_user, user_id)
+        pipeline = ExpenseModel._owed_to_user_pipeline(user_id)
+        expenses = await db.expenses.aggregate(pipeline).to_list(None)
+        archived = await AsyncReads._archived_user_total(db, user_id, "owed")
+        _, received = await AsyncReads._user_settled(user_id)
+        return max(round(ExpenseModel._sum_owed_to_user(expenses, user_id) + archived - received, 2), 0)
+
+    @staticmethod
+    async def get_total_user_owes(user_id):
+        db = AsyncGetDB._get_db("analytics")
+        if db is None:
+            return await _in_thread(ExpenseModel.get_total_user_owes, user_id)
+        pipeline = ExpenseModel._user_owes_pipeline(user_id)
+        expenses = await db.expenses.aggregate(pipeline).to_list(None)
+        archived = await AsyncReads._archived_user_total(db, user_id, "owes")
+        paid, _ = await AsyncReads._user_settled(user_id)
+        return max(round(ExpenseModel._sum_user_owes(expenses, user_id) + archived - paid, 2), 0)
+
+    @staticmethod
+    async def member_balances(group):
+        db = AsyncGetDB._get_db()
+        if db is None:
+            from ..routes.dashboard.groupRoute import cached_member_balances
+            return await _in_thread(cached_member_balances, group)
+
+        from ..utils.cache import fragment_cache
+        key = ("balances", str(group["_id"]), group.get("version", 0))
+        hit = fragment_cache.get(key)
+        if hit is not None:
+            return hit
+        group_id = group["_id"]
+        snapshot, checkpoint = await asyncio.gather(
+            db.archive_snapshots.find_one({"_id": group_id}),
+            db.balance_checkpoints.find_one(SettlementModel._checkpoint_filter(group_id), sort=[("as_of", -1)])
+        )
+        balances, window = SettlementModel._balance_start(snapshot, checkpoint)
+        expenses, settlements = await asyncio.gather(
+            db.expenses.find(
+                SettlementModel._in_window(ExpenseModel._group_filter(group_id), window), BALANCE_FIELDS
+            ).to_list(None),
+            db.settlements.find(
+                SettlementModel._in_window({"group_id": {"$in": id_variants(group_id)}}, window)
+            ).to_list(None)
+        )
+        balances = SettlementModel._add_deltas(balances, expenses, settlements)
+        fragment_cache.set(key, balances)
+        return balances
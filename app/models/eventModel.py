@@ -0,0 +1,193 @@
+# eventModel.py
+import logging
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from . import GetDB
+from .expenseModel import ExpenseModel, encode_splits, to_ref
+
+logger = logging.getLogger(__name__)
+
+# expense_events - append-only log of every write that moves money:
+#   { _id, type: created | updated | deleted | settled, at,
+#     expense_id | settlement_id, before, after }
+#   before/after are the money-relevant state of the expense (or the
+#   settlement) around the write, so a projection applies after - before
+#   without looking anything up:
+#     expense    { amount, group_id, created_by, created_at, splits: [{ u, s, p }] }
+#     settlement { amount, group_id, from_user, to_user, created_at }
+#
+# The log is ordered by the event's ObjectId `_id`, made when the event
+# is built, so writes to different groups never touch a shared counter
+# document. An _id is taken before its write commits and can become
+# visible after later ones, so readers only go up to ids older than
+# EVENT_SETTLE_SECONDS (longer than a transaction may stay open, 60s by
+# default); everything before that point has committed or never will.
+# This assumes the app servers' clocks agree to well within that window.
+EVENT_TYPES = ("created", "updated", "deleted", "settled")
+EXPENSE_STATE_FIELDS = {"amount": 1, "group_id": 1, "created_by": 1, "created_at": 1,
+                        "splits": 1, "final_split": 1, "split_with": 1}
+EVENT_SETTLE_SECONDS = 90
+
+
+class EventModel:
+
+    @staticmethod
+    def collection():
+        return GetDB._get_db().expense_events
+
+    # -------------------------
+    # STATE
+    # -------------------------
+    @staticmethod
+    def expense_state(doc):
+        """The part of an expense (any schema version) balances and totals depend on."""
+        if not doc:
+            return None
+        splits = doc.get("splits")
+        if splits is None:
+            splits = encode_splits(ExpenseModel.final_split(doc), members=doc.get("split_with"))
+        return {
+            "amount": float(doc.get("amount") or 0),
+            "group_id": to_ref(doc.get("group_id")),
+            "created_by": to_ref(doc.get("created_by")),
+            "created_at": doc.get("created_at"),
+            "splits": [{"u": to_ref(e["u"]), "s": e["s"], "p": e["p"]} for e in splits],
+        }
+
+    @staticmethod
+    def settlement_state(doc):
+        return {
+            "amount": float(doc.get("amount") or 0),
+            "group_id": to_ref(doc.get("group_id")),
+            "from_user": to_ref(doc.get("from_user")),
+            "to_user": to_ref(doc.get("to_user")),
+            "created_at": doc.get("created_at"),
+        }
+
+    # -------------------------
+    # APPEND
+    # -------------------------
+    @staticmethod
+    def build_event(event_type, before=None, after=None, at=None, **refs):
+        return {
+            "_id": ObjectId(),
+            "type": event_type,
+            "at": at or datetime.utcnow(),
+            **{k: to_ref(v) for k, v in refs.items()},
+            "before": before,
+            "after": after,
+        }
+
+    @staticmethod
+    def append(event_type, before=None, after=None, session=None, **refs):
+        """Log one write; pass the session of the transaction that made it."""
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"Unknown event type: {event_type}")
+        event = EventModel.build_event(event_type, before, after, **refs)
+        EventModel.collection().insert_one(event, session=session)
+        return event
+
+    # -------------------------
+    # READ
+    # -------------------------
+    @staticmethod
+    def settled_before():
+        """Events with a smaller _id can no longer appear (see the note at the top)."""
+        return ObjectId.from_datetime(datetime.utcnow() - timedelta(seconds=EVENT_SETTLE_SECONDS))
+
+    @staticmethod
+    def read_after(position, limit=1000):
+        """Settled events after `position` (an event _id, None for the start), in log order."""
+        query = {"_id": {"$lt": EventModel.settled_before()}}
+        if position is not None:
+            query["_id"]["$gt"] = position
+        return list(EventModel.collection().find(query).sort("_id", 1).limit(limit))
+
+    @staticmethod
+    def last_position():
+        """_id of the newest settled event, None while there is none."""
+        last = EventModel.collection().find_one(
+            {"_id": {"$lt": EventModel.settled_before()}}, {"_id": 1}, sort=[("_id", -1)]
+        )
+        return last["_id"] if last else None
+
+    @staticmethod
+    def history(expense_id):
+        """Every logged write of one expense, oldest first (audit trail)."""
+        return list(EventModel.collection().find({"expense_id": to_ref(expense_id)}).sort("_id", 1))
+
+    @staticmethod
+    def for_group(group_id, until=None):
+        """The group's events up to `until` (a datetime), in log order."""
+        # An edit can move an expense between groups: both sides count
+        group_ref = to_ref(group_id)
+        query = {"$or": [{"before.group_id": group_ref}, {"after.group_id": group_ref}]}
+        if until is not None:
+            query["at"] = {"$lte": until}
+        return EventModel.collection().find(query).sort("_id", 1)
+
+    # -------------------------
+    # BACKFILL
+    # -------------------------
+    @staticmethod
+    def backfill(batch_size=1000):
+        """
+        A `created` / `settled` event for every expense and settlement
+        written before the log existed, dated when it was created.
+        Safe to re-run: the unique indexes skip ones already logged.
+        """
+        from .archiveModel import ArchiveModel
+        from .settlementModel import SettlementModel
+
+        # Edited or deleted since the log started: it was created as the
+        # first logged write found it, not as it is now
+        first_before = {}
+        for e in EventModel.collection().find(
+            {"type": {"$in": ["updated", "deleted"]}}, {"expense_id": 1, "before": 1}
+        ).sort("_id", 1):
+            first_before.setdefault(e["expense_id"], e["before"])
+
+        def unlogged(collection, event_type, ref, state_of, projection=None):
+            logged = {e[ref] for e in EventModel.collection().find({"type": event_type}, {ref: 1})}
+            for doc in collection.find({}, projection).sort("_id", 1):
+                if doc["_id"] not in logged:
+                    yield doc["_id"], first_before.pop(doc["_id"], None) or state_of(doc)
+
+        added = 0
+        for event_type, ref, rows in (
+            ("created", "expense_id", unlogged(ExpenseModel.collection(), "created", "expense_id",
+                                               EventModel.expense_state, EXPENSE_STATE_FIELDS)),
+            ("created", "expense_id", unlogged(ArchiveModel.cold(), "created", "expense_id",
+                                               EventModel.expense_state, EXPENSE_STATE_FIELDS)),
+            ("settled", "settlement_id", unlogged(SettlementModel.collection(), "settled", "settlement_id",
+                                                  EventModel.settlement_state)),
+        ):
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    added += EventModel._insert_backfill(batch, event_type, ref)
+                    batch = []
+            if batch:
+                added += EventModel._insert_backfill(batch, event_type, ref)
+
+        # Deleted since the log started, before anything logged its creation
+        created = {e["expense_id"] for e in EventModel.collection().find({"type": "created"}, {"expense_id": 1})}
+        leftover = [(eid, state) for eid, state in first_before.items() if eid not in created and state]
+        if leftover:
+            added += EventModel._insert_backfill(leftover, "created", "expense_id")
+        return added
+
+    @staticmethod
+    def _insert_backfill(rows, event_type, ref):
+        """rows: [(source _id, state)]"""
+        events = [
+            EventModel.build_event(event_type, after=state, at=state.get("created_at"), **{ref: _id})
+            for _id, state in rows
+        ]
+        try:
+            return len(EventModel.collection().insert_many(events, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            # Logged meanwhile by a live write
+            return e.details.get("nInserted", 0)
@@ -2,60 +2,260 @@
 from bson.objectid import ObjectId
 from datetime import datetime
 from . import GetDB
+from .groupModel import GroupModel, id_variants
+
+# v1 stored group_id / created_by / split_with as strings,
+# v2 stores them as ObjectId references,
+# v3 replaces split_with / final_split / custom_payments / custom_shares
+#    with one splits array: [{ u: user ObjectId, s: should_pay, p: paid, c: custom share }]
+# (see migrations.py)
+SCHEMA_VERSION = 3
+
+# What balance reads need from an expense, whatever version it is stored as
+BALANCE_FIELDS = {"final_split": 1, "splits": 1}
+
+# Groups joined to the most active list, without the member array
+# (which can run to thousands of ids)
+ACTIVE_GROUP_FIELDS = {"group_members": 0}
+
+
+def to_ref(x):
+    """ObjectId for anything that looks like an id, everything else as is."""
+    if x is None or isinstance(x, ObjectId):
+        return x
+    return ObjectId(str(x)) if ObjectId.is_valid(str(x)) else x
+
+
+def encode_splits(final_split, members=None, split_type=None, custom_shares=None):
+    """final_split map -> compact splits array. Net balance is derived on read."""
+    custom_shares = {str(k): v for k, v in (custom_shares or {}).items()}
+    splits = []
+    for uid, data in (final_split or {}).items():
+        entry = {
+            "u": to_ref(uid),
+            "s": round(float(data.get("should_pay", 0)), 2),
+            "p": round(float(data.get("paid", 0)), 2),
+        }
+        # Raw custom input (weights or amounts) can't be derived from s
+        if split_type == "custom" and custom_shares.get(str(uid)):
+            entry["c"] = float(custom_shares[str(uid)])
+        splits.append(entry)
+
+    # Members without a computed split still belong to the expense
+    listed = {str(e["u"]) for e in splits}
+    for uid in members or []:
+        if str(uid) not in listed:
+            splits.append({"u": to_ref(uid), "s": 0.0, "p": 0.0})
+    return splits
+
 
 class ExpenseModel:
 
     @staticmethod
-    def collection():
-        return GetDB._get_db().expenses
+    def collection(policy=None):
+        return GetDB._get_db(policy).expenses
 
 
     @staticmethod
-    def create_expense(data):
-        doc = {
+    def build_document(data):
+        return {
+            "schema_version": SCHEMA_VERSION,
             "title": data.get("title"),
             "amount": float(data.get("amount")),
-            "group_id": data.get("group_id"),
-            "created_by": data.get("created_by"),
+            "group_id": to_ref(data.get("group_id")),
+            "created_by": to_ref(data.get("created_by")),
             "split_type": data.get("split_type"),
-            "split_with": data.get("split_with", []),            # list of user ids (strings)
-            "custom_payments": data.get("custom_payments", {}),  # { user_id: amount_paid }
-            "custom_shares": data.get("custom_shares", {}),      # { user_id: share_amount_or_percent }
-            "final_split": data.get("final_split", {}),          # { user_id: { should_pay, paid, net_balance } }
+            "splits": encode_splits(
+                data.get("final_split", {}),
+                members=data.get("split_with", []),
+                split_type=data.get("split_type"),
+                custom_shares=data.get("custom_shares")
+            ),
             "description": data.get("description"),
-            "created_at": datetime.utcnow(),
+            "created_at": data.get("created_at") or datetime.utcnow(),
         }
-        return ExpenseModel.collection().insert_one(doc)
 
     @staticmethod
-    def get_expenses_for_user(user_id):
-        if not user_id:
-            return []
+    def hydrate(doc):
+        """
+        Readers hand out the v1 shape (string ids) whatever version is
+        stored, so routes and templates don't care about the migration.
+        """
+        if not doc:
+            return doc
+        for field in ("group_id", "created_by"):
+            if isinstance(doc.get(field), ObjectId):
+                doc[field] = str(doc[field])
+
+        if "splits" in doc:
+            splits = doc.pop("splits")
+            doc["final_split"] = ExpenseModel._final_split_from(splits)
+            doc["split_with"] = [str(e["u"]) for e in splits]
+            doc["custom_payments"] = {str(e["u"]): e["p"] for e in splits}
+            doc["custom_shares"] = {str(e["u"]): e.get("c", 0.0) for e in splits}
+        elif "split_with" in doc:
+            doc["split_with"] = [str(u) for u in doc["split_with"]]
+        return doc
+
+    @staticmethod
+    def _final_split_from(splits):
+        return {
+            str(e["u"]): {
+                "should_pay": e["s"],
+                "paid": e["p"],
+                "net_balance": round(e["p"] - e["s"], 2)
+            }
+            for e in splits
+        }
+
+    @staticmethod
+    def final_split(doc):
+        """{ user_id: { should_pay, paid, net_balance } } from any stored version."""
+        if "splits" in doc:
+            return ExpenseModel._final_split_from(doc["splits"])
+        return doc.get("final_split") or {}
+
+    @staticmethod
+    def _group_filter(group_id):
+        return {"group_id": {"$in": id_variants(group_id)}}
+
+    @staticmethod
+    def _touch_owner(doc):
+        # Group expenses are versioned by their group (touched next to
+        # each write), ones outside any group by their creator
+        if doc and not doc.get("group_id"):
+            from .userModel import UserModel
+            UserModel.touch(doc.get("created_by"))
+
+    @staticmethod
+    def create_expense(data):
+        from .eventModel import EventModel
+        from .projectionModel import schedule_catch_up
+        doc = ExpenseModel.build_document(data)
+
+        # The expense and its log entry commit together (see eventModel.py)
+        def write(session):
+            result = ExpenseModel.collection().insert_one(doc, session=session)
+            EventModel.append("created", after=EventModel.expense_state(doc),
+                              expense_id=result.inserted_id, session=session)
+            return result
+
+        result = GetDB.run_atomically(write, "logging expense events")
+        ExpenseModel._touch_owner(doc)
+        # After the insert: a read between an earlier bump and the insert
+        # would cache the old data under the new version
+        GroupModel.touch(doc.get("group_id"))
+        if data.get("created_at"):
+            # Backdated (seeds, imports): checkpoints past it never saw it
+            from .settlementModel import SettlementModel
+            SettlementModel.invalidate_checkpoints(doc.get("group_id"), doc["created_at"])
+        schedule_catch_up()
+        return result
 
-        expenses = ExpenseModel.collection().find({
+    @staticmethod
+    def _user_expenses_filter(user_id):
+        ids = id_variants(user_id)
+        return {
             "$or": [
-                {"created_by": user_id},
-                {"split_with": {"$in": [user_id]}}
+                {"created_by": {"$in": ids}},
+                {"splits.u": {"$in": ids}},
+                {"split_with": {"$in": ids}}     # v1/v2, until migrated (legacy_split_with index)
             ]
-        }).sort("created_at", -1)
+        }
 
-        return list(expenses) if expenses else []
+    @staticmethod
+    def get_expenses_for_user(user_id, include_archived=False):
+        if not user_id:
+            return []
+
+        expenses = ExpenseModel.collection().find(
+            ExpenseModel._user_expenses_filter(user_id)
+        ).sort("created_at", -1)
+
+        expenses = [ExpenseModel.hydrate(e) for e in expenses] if expenses else []
+        if include_archived:
+            from .archiveModel import ArchiveModel
+            expenses += ArchiveModel.get_archived_expenses_for_user(user_id)
+        return expenses
 
 
     @staticmethod
     def get_by_id(expense_id):
-        return ExpenseModel.collection().find_one({"_id": ObjectId(expense_id)})
+        doc = ExpenseModel.collection().find_one({"_id": ObjectId(expense_id)})
+        if doc is None:
+            # Archived expenses can still be viewed (but not edited, see archiveModel.py)
+            from .archiveModel import ArchiveModel
+            doc = ArchiveModel.cold().find_one({"_id": ObjectId(expense_id)})
+        return ExpenseModel.hydrate(doc)
 
     @staticmethod
     def update_expense(expense_id, data):
-        return ExpenseModel.collection().update_one(
-            {"_id": ObjectId(expense_id)},
-            {"$set": data}
-        )
+        data = dict(data)
+        for field in ("group_id", "created_by"):
+            if field in data:
+                data[field] = to_ref(data[field])
+
+        update = {"$set": data}
+        if "final_split" in data:
+            data["splits"] = encode_splits(
+                data.pop("final_split"),
+                members=data.pop("split_with", None),
+                split_type=data.get("split_type"),
+                custom_shares=data.pop("custom_shares", None)
+            )
+            data.pop("custom_payments", None)
+            data["schema_version"] = SCHEMA_VERSION
+            update["$unset"] = {"split_with": "", "final_split": "", "custom_payments": "", "custom_shares": ""}
+
+        from .eventModel import EventModel, EXPENSE_STATE_FIELDS
+        from .projectionModel import schedule_catch_up
+
+        def write(session):
+            before = ExpenseModel.collection().find_one_and_update(
+                {"_id": ObjectId(expense_id)}, update,
+                projection=EXPENSE_STATE_FIELDS, session=session
+            )
+            if before:
+                after = ExpenseModel.collection().find_one({"_id": before["_id"]}, EXPENSE_STATE_FIELDS,
+                                                           session=session)
+                EventModel.append("updated", before=EventModel.expense_state(before),
+                                  after=EventModel.expense_state(after), expense_id=before["_id"], session=session)
+            return before
+
+        before = GetDB.run_atomically(write, "logging expense events")
+        if before:
+            from .settlementModel import SettlementModel
+            ExpenseModel._touch_owner(before)
+            GroupModel.touch(before.get("group_id"))
+            SettlementModel.invalidate_checkpoints(before.get("group_id"), before.get("created_at"))
+            if data.get("group_id") and str(data["group_id"]) != str(before.get("group_id")):
+                GroupModel.touch(data["group_id"])
+                SettlementModel.invalidate_checkpoints(data["group_id"], before.get("created_at"))
+            schedule_catch_up()
+        return before
 
     @staticmethod
     def delete_expense(expense_id):
-        return ExpenseModel.collection().delete_one({"_id": ObjectId(expense_id)})
+        from .eventModel import EventModel, EXPENSE_STATE_FIELDS
+        from .projectionModel import schedule_catch_up
+
+        def write(session):
+            deleted = ExpenseModel.collection().find_one_and_delete(
+                {"_id": ObjectId(expense_id)}, projection=EXPENSE_STATE_FIELDS, session=session
+            )
+            if deleted:
+                EventModel.append("deleted", before=EventModel.expense_state(deleted),
+                                  expense_id=deleted["_id"], session=session)
+            return deleted
+
+        deleted = GetDB.run_atomically(write, "logging expense events")
+        if deleted:
+            from .settlementModel import SettlementModel
+            ExpenseModel._touch_owner(deleted)
+            GroupModel.touch(deleted.get("group_id"))
+            SettlementModel.invalidate_checkpoints(deleted.get("group_id"), deleted.get("created_at"))
+            schedule_catch_up()
+        return deleted
 
     # ---------------- CORE: Calculate split ----------------
     @staticmethod
@@ -170,69 +370,153 @@ class ExpenseModel:
         return result
 
 
+    # ---------------- Greedy settlement ----------------
     @staticmethod
-    def get_expenses_for_group(group_id):
+    def settle_debts(nets):
+        """
+        nets: { user_id: net_balance }, positive = should receive.
+        Matches debtors to creditors greedily and returns
+        [{ from_user, to_user, amount }].
+        """
+        nets = {uid: round(float(amt), 2) for uid, amt in nets.items()}
+        creditors = [uid for uid, amt in nets.items() if amt > 0]
+        debtors = [uid for uid, amt in nets.items() if amt < 0]
+
+        transfers = []
+        ci = di = 0
+        while di < len(debtors) and ci < len(creditors):
+            debtor, creditor = debtors[di], creditors[ci]
+
+            # Always work from what is still outstanding on both sides
+            pay_amount = round(min(-nets[debtor], nets[creditor]), 2)
+            if pay_amount > 0:
+                transfers.append({
+                    "from_user": debtor,
+                    "to_user": creditor,
+                    "amount": pay_amount
+                })
+
+            nets[debtor] = round(nets[debtor] + pay_amount, 2)
+            nets[creditor] = round(nets[creditor] - pay_amount, 2)
+
+            if nets[debtor] >= 0:
+                di += 1
+            if nets[creditor] <= 0:
+                ci += 1
+
+        return transfers
+
+    # ---------------- Balances across expenses ----------------
+    @staticmethod
+    def sum_net_balances(expenses):
+        """{ user_id: summed net_balance } over the final_split of each expense."""
+        balances = {}
+        for expense in expenses:
+            fs = ExpenseModel.final_split(expense)
+            for uid, data in fs.items():
+                uid = str(uid)
+                balances[uid] = balances.get(uid, 0.0) + float(data.get("net_balance", 0.0))
+        return balances
+
+    @staticmethod
+    def get_expenses_for_group(group_id, include_archived=False):
+        """Hot expenses only, unless include_archived (reports)."""
+        return list(ExpenseModel.iter_expenses_for_group(group_id, include_archived))
+
+    @staticmethod
+    def iter_expenses_for_group(group_id, include_archived=False):
+        """Same as get_expenses_for_group, hydrated one at a time off the cursor."""
         if not group_id:
-            return []
+            return
 
-        expenses = ExpenseModel.collection().find({
-            "group_id": group_id
-        }).sort("created_at", -1)
+        cursors = [ExpenseModel.collection()]
+        if include_archived:
+            from .archiveModel import ArchiveModel
+            cursors.append(ArchiveModel.cold("analytics"))
 
-        return list(expenses) if expenses else []
+        for collection in cursors:
+            for e in collection.find(ExpenseModel._group_filter(group_id)).sort("created_at", -1):
+                yield ExpenseModel.hydrate(e)
     
+    # -------------------------------------------
+    # PAGES (keyset on created_at, _id; newest first)
+    # -------------------------------------------
     @staticmethod
-    def get_most_active_groups_for_user(user_id, limit=10):
+    def _after_filter(created_at, last_id):
+        return {"$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}}
+        ]}
+
+    @staticmethod
+    def get_page(query, limit, after=None, projection=None):
         """
-        Count expenses per group where user is either creator or in split_with.
-        Returns list of groups sorted by activity.
+        One page of hot expenses matching `query`, after the (created_at, _id)
+        of the previous page's last row. Returns (expenses, has_more).
         """
+        if after:
+            query = {"$and": [query, ExpenseModel._after_filter(*after)]}
+        if projection is not None:
+            projection = {**projection, "created_at": 1}
+
+        rows = list(
+            ExpenseModel.collection().find(query, projection)
+            .sort([("created_at", -1), ("_id", -1)])
+            .limit(limit + 1)
+        )
+        return [ExpenseModel.hydrate(e) for e in rows[:limit]], len(rows) > limit
 
-        pipeline = [
-            {
-                "$match": {
-                    "$or": [
-                        {"created_by": user_id},
-                        {"split_with": {"$in": [user_id]}}
-                    ]
-                }
-            },
+    @staticmethod
+    def _most_active_groups_pipeline(user_id, limit):
+        return [
+            {"$match": ExpenseModel._user_expenses_filter(user_id)},
+            {"$match": {"group_id": {"$nin": [None, ""]}}},
             {
                 "$group": {
-                    "_id": "$group_id",
+                    # Until every expense is v2 a group's expenses may hold its
+                    # id as a string or an ObjectId; both count towards one bucket
+                    "_id": {"$toString": "$group_id"},
                     "expense_count": {"$sum": 1}
                 }
             },
-            {"$sort": {"expense_count": -1}},
+            {"$sort": {"expense_count": -1, "_id": 1}},
             {"$limit": limit}
         ]
 
-        data = list(ExpenseModel.collection().aggregate(pipeline))
+    @staticmethod
+    def get_most_active_groups_for_user(user_id, limit=10):
+        """
+        Count expenses per group where user is either creator or in split_with.
+        Returns list of groups sorted by activity, each joined with its
+        group document (without group_members) under "group".
+        """
+        pipeline = ExpenseModel._most_active_groups_pipeline(user_id, limit)
+        rows = list(ExpenseModel.collection("analytics").aggregate(pipeline))
+        groups = GroupModel.collection().find(ExpenseModel._active_groups_filter(rows), ACTIVE_GROUP_FIELDS)
+        return ExpenseModel._attach_groups(rows, groups)
 
-        # Fetch full group details
-        for g in data:
-            group = ExpenseModel.collection().find_one({"_id": ObjectId(g["_id"])})
-            g["group"] = group
+    @staticmethod
+    def _active_groups_filter(rows):
+        return {"_id": {"$in": [ObjectId(row["_id"]) for row in rows if ObjectId.is_valid(row["_id"])]}}
 
-        return data
+    @staticmethod
+    def _attach_groups(rows, groups):
+        by_id = {str(group["_id"]): group for group in groups}
+        return [
+            {"_id": to_ref(row["_id"]), "expense_count": row["expense_count"], "group": by_id.get(row["_id"])}
+            for row in rows
+        ]
 
 
     # -------------------------------------------
     # 2️⃣ MONTHLY EXPENSES FOR A USER
     # -------------------------------------------
     @staticmethod
-    def get_monthly_expenses_for_user(user_id):
-        """
-        Returns monthly grouped expense totals for the user in format:
-        [
-            { "_id": { "year": 2025, "month": 1 }, "total_amount": 200 },
-            { "_id": { "year": 2025, "month": 2 }, "total_amount": 340 }
-        ]
-        """
-        pipeline = [
+    def _monthly_expenses_pipeline(user_id):
+        return [
             {
                 "$match": {
-                    "created_by": user_id
+                    "created_by": {"$in": id_variants(user_id)}
                 }
             },
             {
@@ -252,38 +536,37 @@ class ExpenseModel:
             }
         ]
 
-        return list(ExpenseModel.collection().aggregate(pipeline))
+    @staticmethod
+    def get_monthly_expenses_for_user(user_id):
+        """
+        Returns monthly grouped expense totals for the user in format:
+        [
+            { "_id": { "year": 2025, "month": 1 }, "total_amount": 200 },
+            { "_id": { "year": 2025, "month": 2 }, "total_amount": 340 }
+        ]
+        """
+        from .archiveModel import ArchiveModel
+        pipeline = ExpenseModel._monthly_expenses_pipeline(user_id)
+        rows = list(ExpenseModel.collection("analytics").aggregate(pipeline))
+        return ArchiveModel.merge_monthly(rows, ArchiveModel.get_user_monthly(user_id), user_id)
 
 
     # -------------------------------------------
     # 3️⃣ TOTAL OWED TO USER (what others owe me)
     # -------------------------------------------
     @staticmethod
-    def get_total_owed_to_user(user_id):
-        """
-        Sum of (should_pay - paid) for users OTHER than created_by,
-        but only from final_split field.
-        """
-
-        pipeline = [
-            {
-                "$match": {
-                    "created_by": user_id
-                }
-            },
-            {
-                "$project": {
-                    "final_split": 1
-                }
-            }
+    def _owed_to_user_pipeline(user_id):
+        return [
+            {"$match": {"created_by": {"$in": id_variants(user_id)}}},
+            {"$project": BALANCE_FIELDS}
         ]
 
-        expenses = ExpenseModel.collection().aggregate(pipeline)
-
+    @staticmethod
+    def _sum_owed_to_user(expenses, user_id):
         total = 0
 
         for exp in expenses:
-            fs = exp.get("final_split", {})
+            fs = ExpenseModel.final_split(exp)
             for uid, bal in fs.items():
                 if uid != user_id:   # others owe me
                     net = bal.get("net_balance", 0)
@@ -292,35 +575,40 @@ class ExpenseModel:
 
         return round(total, 2)
 
+    @staticmethod
+    def get_total_owed_to_user(user_id):
+        """
+        Sum of (should_pay - paid) for users OTHER than created_by,
+        but only from final_split field.
+        """
+        from .archiveModel import ArchiveModel
+        from .settlementModel import SettlementModel
+        pipeline = ExpenseModel._owed_to_user_pipeline(user_id)
+        expenses = ExpenseModel.collection("analytics").aggregate(pipeline)
+        archived = ArchiveModel.get_user_total(user_id, "owed")
+        _, received = SettlementModel.get_user_settled(user_id)
+        return max(round(ExpenseModel._sum_owed_to_user(expenses, user_id) + archived - received, 2), 0)
+
 
     # -------------------------------------------
     # 4️⃣ TOTAL USER OWES (what I owe others)
     # -------------------------------------------
     @staticmethod
-    def get_total_user_owes(user_id):
-        """
-        Sum of negative net_balance for the user across all expenses.
-        """
-
-        pipeline = [
-            {
-                "$match": {
-                    "split_with": {"$in": [user_id]}
-                }
-            },
-            {
-                "$project": {
-                    "final_split": 1
-                }
-            }
+    def _user_owes_pipeline(user_id):
+        return [
+            {"$match": {"$or": [
+                {"splits.u": {"$in": id_variants(user_id)}},
+                {"split_with": {"$in": id_variants(user_id)}}
+            ]}},
+            {"$project": BALANCE_FIELDS}
         ]
 
-        expenses = ExpenseModel.collection().aggregate(pipeline)
-
+    @staticmethod
+    def _sum_user_owes(expenses, user_id):
         total = 0
 
         for exp in expenses:
-            fs = exp.get("final_split", {})
+            fs = ExpenseModel.final_split(exp)
             my_data = fs.get(user_id)
 
             if my_data:
@@ -329,3 +617,16 @@ class ExpenseModel:
                     total += abs(net)
 
         return round(total, 2)
+
+    @staticmethod
+    def get_total_user_owes(user_id):
+        """
+        Sum of negative net_balance for the user across all expenses.
+        """
+        from .archiveModel import ArchiveModel
+        from .settlementModel import SettlementModel
+        pipeline = ExpenseModel._user_owes_pipeline(user_id)
+        expenses = ExpenseModel.collection("analytics").aggregate(pipeline)
+        archived = ArchiveModel.get_user_total(user_id, "owes")
+        paid, _ = SettlementModel.get_user_settled(user_id)
+        return max(round(ExpenseModel._sum_user_owes(expenses, user_id) + archived - paid, 2), 0)
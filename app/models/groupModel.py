@@ -1,11 +1,20 @@
 from . import GetDB
 from bson import ObjectId
+from config import Config
 from datetime import datetime, timedelta
 import uuid
 
 INVITE_COLLECTION = "group_invites"
 INVITE_TTL_DAYS = 7  # token lifetime
 
+# What a group card in a listing shows; the member array is cut to a preview
+LISTING_FIELDS = {"group_title": 1, "group_photo": 1, "created_by": 1, "is_personal": 1,
+                  "total_balance": 1, "version": 1, "created_at": 1}
+
+# Called with the group id after a write that can move balances
+# (expenses, settlements); the live-update broker listens here.
+_change_listeners = []
+
 
 def to_object_id(x):
     """Convert id to ObjectId safely."""
@@ -20,6 +29,20 @@ def to_object_id(x):
     return ObjectId(str(x))
 
 
+def id_variants(x):
+    """
+    Both encodings of one id. Expenses moved from string to ObjectId
+    references in schema v2; filters match either while old documents
+    are still being migrated.
+    """
+    if x is None:
+        return [None]
+    if isinstance(x, ObjectId) or ObjectId.is_valid(str(x)):
+        oid = to_object_id(x)
+        return [oid, str(oid)]
+    return [x]
+
+
 class GroupModel:
 
     @staticmethod
@@ -31,7 +54,7 @@ class GroupModel:
     # CREATE GROUP
     # -------------------------
     @staticmethod
-    def create_group(created_by, title, description, group_photo=None, members=None, is_personal=False):
+    def build_group(created_by, title, description, group_photo=None, members=None, is_personal=False):
         if members is None:
             members = []
 
@@ -45,7 +68,10 @@ class GroupModel:
         # Convert all members safely
         valid_member_ids = [to_object_id(m) for m in members if m]
 
-        group_data = {
+        return {
+            # Pages read these instead of the member array (see MEMBER STATS)
+            "member_count": len(valid_member_ids),
+            "member_preview": valid_member_ids[:Config.MEMBER_PREVIEW_SIZE],
             "created_by": created_by_oid,
             "group_title": title,
             "group_description": description,
@@ -53,10 +79,24 @@ class GroupModel:
             "group_members": valid_member_ids,
             "total_balance": 0,
             "created_at": datetime.utcnow(),
-            "is_personal": is_personal
+            "is_personal": is_personal,
+            "version": 1
         }
 
-        res = GroupModel.collection().insert_one(group_data)
+    @staticmethod
+    def create_group(created_by, title, description, group_photo=None, members=None, is_personal=False):
+        group_data = GroupModel.build_group(
+            created_by, title, description, group_photo, members, is_personal
+        )
+        from .membershipModel import MembershipModel
+
+        def write(session):
+            res = GroupModel.collection().insert_one(group_data, session=session)
+            MembershipModel.add(res.inserted_id, group_data["group_members"], owner_id=group_data["created_by"],
+                                at=group_data["created_at"], session=session)
+            return res
+
+        res = GetDB.run_atomically(write, "writing memberships")
         return str(res.inserted_id)
 
     # -------------------------
@@ -66,15 +106,114 @@ class GroupModel:
     def find_by_id(group_id):
         return GroupModel.collection().find_one({"_id": to_object_id(group_id)})
 
+    @staticmethod
+    def find_summary(group_id):
+        """The group without its member array (see MEMBER STATS)."""
+        rows = list(GroupModel.collection().aggregate(GroupModel._summary_pipeline({"_id": to_object_id(group_id)})))
+        return rows[0] if rows else None
+
+    @staticmethod
+    def is_member(group_id, *user_ids, projection=None):
+        """The group (only `projection`) if every one of user_ids belongs to it, else None."""
+        return GroupModel.collection().find_one(
+            {"_id": to_object_id(group_id), "group_members": {"$all": [to_object_id(u) for u in user_ids]}},
+            projection or {"_id": 1}
+        )
+
+    # -------------------------
+    # MEMBER STATS
+    # -------------------------
+    # group_members stays the full list (membership checks match against it
+    # in the query), but nothing that renders a group loads it: documents
+    # carry member_count and the first MEMBER_PREVIEW_SIZE ids as
+    # member_preview, recomputed on the server after every member change.
+    # Groups written before then get both computed at read time until
+    # `flask backfill-memberships` stores them.
+    @staticmethod
+    def _member_stats_stage():
+        return {"$set": {
+            "member_count": {"$size": "$group_members"},
+            "member_preview": {"$slice": ["$group_members", Config.MEMBER_PREVIEW_SIZE]},
+        }}
+
+    @staticmethod
+    def refresh_member_stats(group_id=None, session=None):
+        """Recompute member_count / member_preview of one group, or of all of them."""
+        query = {} if group_id is None else {"_id": to_object_id(group_id)}
+        return GroupModel.collection().update_many(query, [GroupModel._member_stats_stage()], session=session)
+
+    @staticmethod
+    def _summary_pipeline(match):
+        return [
+            {"$match": match},
+            {"$set": {
+                "member_count": {"$ifNull": ["$member_count", {"$size": "$group_members"}]},
+                "member_preview": {"$ifNull": [
+                    "$member_preview", {"$slice": ["$group_members", Config.MEMBER_PREVIEW_SIZE]}
+                ]},
+            }},
+            {"$project": {"group_members": 0}},
+        ]
+
+    @staticmethod
+    def member_count(group):
+        if "member_count" in group:
+            return group["member_count"]
+        return len(group.get("group_members", []))
+
+    @staticmethod
+    def get_members_page(group_id, limit, after=None):
+        """
+        One page of a group's members: ([{ user_id, role, joined_at }], cursor
+        values of the next page or None). From memberships by user id once
+        MEMBERSHIP_READS is on, else a slice of the member array by offset.
+        """
+        gid = to_object_id(group_id)
+        after = after or {}
+        if Config.MEMBERSHIP_READS:
+            from .membershipModel import MembershipModel
+            query = {"group_id": gid}
+            if after.get("u"):
+                query["user_id"] = {"$gt": to_object_id(after["u"])}
+            rows = list(
+                MembershipModel.collection()
+                .find(query, {"user_id": 1, "role": 1, "joined_at": 1, "_id": 0})
+                .sort("user_id", 1).limit(limit + 1)
+            )
+            page = rows[:limit]
+            next_after = {"u": str(page[-1]["user_id"])} if len(rows) > limit else None
+            return page, next_after
+
+        offset = int(after.get("o", 0))
+        group = GroupModel.collection().find_one(
+            {"_id": gid}, {"created_by": 1, "group_members": {"$slice": [offset, limit + 1]}}
+        ) or {}
+        ids = group.get("group_members", [])
+        page = [
+            {"user_id": uid, "role": "owner" if uid == group.get("created_by") else "member"}
+            for uid in ids[:limit]
+        ]
+        return page, ({"o": offset + limit} if len(ids) > limit else None)
+
     # -------------------------
     # JOIN GROUP
     # -------------------------
     @staticmethod
     def join_group(group_id, user_id):
-        return GroupModel.collection().update_one(
-            {"_id": to_object_id(group_id)},
-            {"$addToSet": {"group_members": to_object_id(user_id)}}
-        )
+        from .membershipModel import MembershipModel
+
+        def write(session):
+            result = GroupModel.collection().update_one(
+                {"_id": to_object_id(group_id)},
+                {"$addToSet": {"group_members": to_object_id(user_id)}, "$inc": {"version": 1}},
+                session=session
+            )
+            if result.matched_count:
+                GroupModel.refresh_member_stats(group_id, session=session)
+                MembershipModel.add(group_id, [user_id], session=session)
+            return result
+
+        return GetDB.run_atomically(write, "writing memberships")
 
     # -------------------------
     # LEAVE GROUP
@@ -88,10 +227,18 @@ class GroupModel:
         if str(group["created_by"]) == str(user_id):
             return {"success": False, "message": "Group creator cannot leave the group."}
 
-        GroupModel.collection().update_one(
-            {"_id": to_object_id(group_id)},
-            {"$pull": {"group_members": to_object_id(user_id)}}
-        )
+        from .membershipModel import MembershipModel
+
+        def write(session):
+            GroupModel.collection().update_one(
+                {"_id": to_object_id(group_id)},
+                {"$pull": {"group_members": to_object_id(user_id)}, "$inc": {"version": 1}},
+                session=session
+            )
+            GroupModel.refresh_member_stats(group_id, session=session)
+            MembershipModel.remove(group_id, [user_id], session=session)
+
+        GetDB.run_atomically(write, "writing memberships")
         return {"success": True, "message": "Left group successfully."}
 
     # -------------------------
@@ -121,32 +268,56 @@ class GroupModel:
         if update_fields:
             GroupModel.collection().update_one(
                 {"_id": to_object_id(group_id)},
-                {"$set": update_fields}
+                {"$set": update_fields, "$inc": {"version": 1}}
             )
 
+        from .membershipModel import MembershipModel
+
         # Add members
         if add_members:
             oids = [to_object_id(m) for m in add_members]
-            GroupModel.collection().update_one(
-                {"_id": to_object_id(group_id)},
-                {"$addToSet": {"group_members": {"$each": oids}}}
-            )
+
+            def write_added(session):
+                GroupModel.collection().update_one(
+                    {"_id": to_object_id(group_id)},
+                    {"$addToSet": {"group_members": {"$each": oids}}, "$inc": {"version": 1}},
+                    session=session
+                )
+                GroupModel.refresh_member_stats(group_id, session=session)
+                MembershipModel.add(group_id, oids, owner_id=group["created_by"], session=session)
+
+            GetDB.run_atomically(write_added, "writing memberships")
 
         # Remove members (except creator)
         if remove_members:
             safe_remove = [m for m in remove_members if str(m) != str(group["created_by"])]
             if safe_remove:
                 oids = [to_object_id(m) for m in safe_remove]
-                GroupModel.collection().update_one(
-                    {"_id": to_object_id(group_id)},
-                    {"$pull": {"group_members": {"$in": oids}}}
-                )
+
+                def write_removed(session):
+                    GroupModel.collection().update_one(
+                        {"_id": to_object_id(group_id)},
+                        {"$pull": {"group_members": {"$in": oids}}, "$inc": {"version": 1}},
+                        session=session
+                    )
+                    GroupModel.refresh_member_stats(group_id, session=session)
+                    MembershipModel.remove(group_id, oids, session=session)
+
+                GetDB.run_atomically(write_removed, "writing memberships")
 
         return {"success": True, "message": "Group updated successfully."}
 
     # -------------------------
     # GET USER GROUPS
     # -------------------------
+    @staticmethod
+    def _user_groups_filter(user_id):
+        """The user's groups: by _id from memberships once backfilled, else by member array."""
+        if Config.MEMBERSHIP_READS:
+            from .membershipModel import MembershipModel
+            return {"_id": {"$in": MembershipModel.group_ids(user_id)}}
+        return {"group_members": to_object_id(user_id)}
+
     @staticmethod
     def get_user_groups(user_id):
         # If a dictionary is passed, treat it as a custom query
@@ -154,31 +325,95 @@ class GroupModel:
             return list(GroupModel.collection().find(user_id))
 
         # Otherwise, treat it as normal user_id
-        uid = to_object_id(user_id)
-        return list(GroupModel.collection().find({"group_members": uid}))
+        return list(GroupModel.collection().find(GroupModel._user_groups_filter(user_id)))
 
 
     # -------------------------
     # GET GROUPS WITH USERS
     # -------------------------
     @staticmethod
-    def get_user_groups_with_users(user_id):
+    def get_user_group_versions(user_id):
+        """[(group _id, version)] of the user's groups, without the documents."""
+        groups = GroupModel.collection().find(GroupModel._user_groups_filter(user_id), {"version": 1})
+        return [(g["_id"], g.get("version", 0)) for g in groups]
+
+    @staticmethod
+    def get_user_groups_page(user_id, limit, after_id=None, projection=None):
+        query = GroupModel._user_groups_filter(user_id)
+        if after_id is not None:
+            query = {"$and": [query, {"_id": {"$gt": to_object_id(after_id)}}]}
+        rows = list(GroupModel.collection().find(query, projection).sort("_id", 1).limit(limit + 1))
+        return rows[:limit], len(rows) > limit
+
+    @staticmethod
+    def get_user_groups_with_users(user_id, preview=5, with_users=True):
+        """
+        The user's groups without member arrays; members_full holds the first
+        `preview` members (left for attach_preview_users when not with_users).
+        """
         db = GetDB._get_db()
-        uid = to_object_id(user_id)
 
-        groups = list(db.groups.find({"group_members": uid}))
+        groups = list(db.groups.aggregate(GroupModel._summary_pipeline(GroupModel._user_groups_filter(user_id))))
+        if not with_users:
+            return groups
+        return GroupModel.attach_preview_users(groups, preview)
 
-        # Collect all user ids
-        user_ids = {member for g in groups for member in g.get("group_members", [])}
+    @staticmethod
+    def get_user_groups_recent(user_id, limit, after=None, preview=5, with_users=True):
+        """
+        A page of the user's groups from memberships, most recently active
+        first. Each carries member_count and members_full for its first
+        `preview` members only. Returns (groups, cursor of the next page):
+        the cursor is the last row's (last_activity, group_id), None at the end.
+        """
+        from .membershipModel import MembershipModel
 
-        users_map = {
-            str(u["_id"]): u
-            for u in db.users.find({"_id": {"$in": list(user_ids)}})
+        db = GetDB._get_db()
+        rows, has_more = MembershipModel.page_for_user(user_id, limit, after)
+        ids = [row["group_id"] for row in rows]
+        found = {
+            g["_id"]: g
+            for g in db.groups.find({"_id": {"$in": ids}}, {**LISTING_FIELDS, "group_members": {"$slice": preview}})
         }
+        counts = MembershipModel.counts(ids)
+
+        groups = []
+        for row in rows:
+            group = found.get(row["group_id"])
+            if group is None:
+                continue
+            group["member_count"] = counts.get(group["_id"], 0)
+            group["role"] = row.get("role")
+            group["last_activity"] = row.get("last_activity")
+            groups.append(group)
+
+        if with_users:
+            GroupModel.attach_preview_users(groups, projection={"username": 1, "profile_pic": 1})
+        after = (rows[-1]["last_activity"], rows[-1]["group_id"]) if has_more else None
+        return groups, after
+
+    @staticmethod
+    def _preview_ids(group, limit=None):
+        ids = group.get("member_preview", group.get("group_members", []))
+        return ids[:limit] if limit else ids
+
+    @staticmethod
+    def _member_ids(groups, limit=None):
+        return list({member for g in groups for member in GroupModel._preview_ids(g, limit)})
+
+    @staticmethod
+    def attach_preview_users(groups, limit=None, projection=None):
+        """members_full for each group: its first `limit` members' user documents, in one read."""
+        users = GetDB._get_db().users.find({"_id": {"$in": GroupModel._member_ids(groups, limit)}}, projection)
+        return GroupModel._attach_members(groups, users, limit)
+
+    @staticmethod
+    def _attach_members(groups, users, limit=None):
+        users_map = {str(u["_id"]): u for u in users}
 
         for g in groups:
             g["members_full"] = [
-                users_map.get(str(uid)) for uid in g.get("group_members", [])
+                users_map.get(str(uid)) for uid in GroupModel._preview_ids(g, limit)
             ]
 
         return groups
@@ -235,7 +470,7 @@ class GroupModel:
         db = GetDB._get_db()
 
         pipeline = [
-            {"$match": {"group_id": to_object_id(group_id)}},
+            {"$match": {"group_id": {"$in": id_variants(group_id)}}},
             {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
         ]
 
@@ -244,8 +479,9 @@ class GroupModel:
 
         GroupModel.collection().update_one(
             {"_id": to_object_id(group_id)},
-            {"$set": {"total_balance": total_balance}}
+            {"$set": {"total_balance": total_balance}, "$inc": {"version": 1}}
         )
+        GroupModel.changed(group_id)
 
         return total_balance
 
@@ -266,9 +502,45 @@ class GroupModel:
     
     @staticmethod
     def add_total_balance(group_id, amount):
-        return GroupModel.collection().update_one(
+        result = GroupModel.collection().update_one(
+            {"_id": to_object_id(group_id)},
+            {"$inc": {"total_balance": float(amount), "version": 1}}
+        )
+        GroupModel.changed(group_id)
+        return result
+
+    # -------------------------
+    # VERSION STAMPS
+    # -------------------------
+    @staticmethod
+    def touch(group_id):
+        """Bump the version stamp so cached fragments for the group are skipped."""
+        if not group_id:
+            return None
+        result = GroupModel.collection().update_one(
             {"_id": to_object_id(group_id)},
-            {"$inc": {"total_balance": float(amount)}}
+            {"$inc": {"version": 1}}
+        )
+        GroupModel.changed(group_id)
+        return result
+
+    @staticmethod
+    def on_change(listener):
+        if listener not in _change_listeners:
+            _change_listeners.append(listener)
+        return listener
+
+    @staticmethod
+    def changed(group_id):
+        for listener in _change_listeners:
+            listener(group_id)
+
+    @staticmethod
+    def touch_user_groups(user_id):
+        """A member's profile shows up in every group they belong to."""
+        return GroupModel.collection().update_many(
+            GroupModel._user_groups_filter(user_id),
+            {"$inc": {"version": 1}}
         )
 
     @staticmethod
@@ -0,0 +1,155 @@
+# membershipModel.py
+import logging
+from datetime import datetime, timedelta
+from pymongo import UpdateOne, DESCENDING
+from . import GetDB
+from .groupModel import GroupModel, to_object_id, id_variants
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# memberships - one document per (user, group), next to groups.group_members:
+#   { user_id, group_id, role: owner | member, joined_at, last_activity }
+#   "My groups" is a range scan of (user_id, last_activity) instead of a
+#   query on every group's member array, and a group's member count is an
+#   index count instead of loading the array. GroupModel keeps both in step
+#   (create/join/leave/update); `flask backfill-memberships` builds it for
+#   groups created before it existed.
+OWNER = "owner"
+MEMBER = "member"
+
+
+class MembershipModel:
+
+    @staticmethod
+    def collection():
+        return GetDB._get_db().memberships
+
+    # -------------------------
+    # WRITES (called by GroupModel)
+    # -------------------------
+    @staticmethod
+    def add(group_id, user_ids, owner_id=None, at=None, session=None):
+        """Upsert memberships; someone already in the group keeps their role and joined_at."""
+        group_oid = to_object_id(group_id)
+        at = at or datetime.utcnow()
+        requests = [
+            UpdateOne(
+                {"user_id": to_object_id(uid), "group_id": group_oid},
+                {"$setOnInsert": {
+                    "role": OWNER if uid == str(owner_id) else MEMBER,
+                    "joined_at": at,
+                    "last_activity": at,
+                }},
+                upsert=True
+            )
+            for uid in dict.fromkeys(str(u) for u in user_ids if u)
+        ]
+        if requests:
+            MembershipModel.collection().bulk_write(requests, ordered=False, session=session)
+        return len(requests)
+
+    @staticmethod
+    def remove(group_id, user_ids, session=None):
+        return MembershipModel.collection().delete_many(
+            {"group_id": to_object_id(group_id), "user_id": {"$in": [to_object_id(u) for u in user_ids]}},
+            session=session
+        ).deleted_count
+
+    @staticmethod
+    def touch_activity(group_id, at=None):
+        """
+        Move the group up everyone's "my groups". Only memberships older
+        than MEMBERSHIP_ACTIVITY_RESOLUTION_SECONDS are rewritten, so a burst
+        of writes to a big group costs one update_many, the rest match nothing.
+        """
+        if not group_id:
+            return 0
+        at = at or datetime.utcnow()
+        stale = at - timedelta(seconds=Config.MEMBERSHIP_ACTIVITY_RESOLUTION_SECONDS)
+        return MembershipModel.collection().update_many(
+            {"group_id": to_object_id(group_id), "last_activity": {"$lt": stale}},
+            {"$set": {"last_activity": at}}
+        ).modified_count
+
+    # -------------------------
+    # READS
+    # -------------------------
+    @staticmethod
+    def group_ids(user_id):
+        """The user's group ids, read from the index alone."""
+        rows = MembershipModel.collection().find({"user_id": to_object_id(user_id)}, {"group_id": 1, "_id": 0})
+        return [row["group_id"] for row in rows]
+
+    @staticmethod
+    def page_for_user(user_id, limit, after=None):
+        """
+        The user's memberships, most recently active group first.
+        after: (last_activity, group_id) of the last row of the previous page.
+        Returns (rows, has_more).
+        """
+        query = {"user_id": to_object_id(user_id)}
+        if after is not None:
+            at, group_id = after
+            query["$or"] = [
+                {"last_activity": {"$lt": at}},
+                {"last_activity": at, "group_id": {"$lt": to_object_id(group_id)}},
+            ]
+        rows = list(
+            MembershipModel.collection()
+            .find(query, {"group_id": 1, "role": 1, "joined_at": 1, "last_activity": 1})
+            .sort([("last_activity", DESCENDING), ("group_id", DESCENDING)])
+            .limit(limit + 1)
+        )
+        return rows[:limit], len(rows) > limit
+
+    @staticmethod
+    def counts(group_ids):
+        """{ group_id: member count } without loading any member array."""
+        pipeline = [
+            {"$match": {"group_id": {"$in": [to_object_id(g) for g in group_ids]}}},
+            {"$group": {"_id": "$group_id", "count": {"$sum": 1}}},
+        ]
+        return {row["_id"]: row["count"] for row in MembershipModel.collection().aggregate(pipeline)}
+
+    @staticmethod
+    def count(group_id):
+        return MembershipModel.collection().count_documents({"group_id": to_object_id(group_id)})
+
+    # -------------------------
+    # BACKFILL
+    # -------------------------
+    @staticmethod
+    def backfill(batch_size=500):
+        """
+        Bring memberships in line with every group's member array: add the
+        missing ones, drop the ones for members who left. last_activity
+        starts at the group's newest expense (or its creation). Safe to re-run.
+        """
+        db = GetDB._get_db()
+        added = removed = groups = 0
+        cursor = GroupModel.collection().find(
+            {}, {"group_members": 1, "created_by": 1, "created_at": 1}
+        ).batch_size(batch_size)
+        for group in cursor:
+            members = [m for m in group.get("group_members", []) if m]
+            latest = db.expenses.find_one(
+                {"group_id": {"$in": id_variants(group["_id"])}}, {"created_at": 1},
+                sort=[("created_at", DESCENDING)]
+            )
+            dates = [d for d in (group.get("created_at"), (latest or {}).get("created_at")) if d]
+            at = max(dates) if dates else datetime.utcnow()
+
+            existing = set(MembershipModel.collection().distinct("user_id", {"group_id": group["_id"]}))
+            MembershipModel.add(group["_id"], members, owner_id=group.get("created_by"), at=at)
+            added += len({to_object_id(m) for m in members} - existing)
+            gone = existing - {to_object_id(m) for m in members}
+            if gone:
+                removed += MembershipModel.remove(group["_id"], gone)
+            groups += 1
+        return {"groups": groups, "added": added, "removed": removed}
+
+
+def init_memberships(app):
+    # Expense and settlement writes already announce their group here
+    GroupModel.on_change(MembershipModel.touch_activity)
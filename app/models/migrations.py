@@ -0,0 +1,307 @@
+# migrations.py
+import logging
+import time
+import click
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from . import GetDB
+from .expenseModel import SCHEMA_VERSION
+from .archiveModel import ArchiveModel
+from .eventModel import EventModel
+from .projectionModel import ProjectionModel, PROJECTIONS
+from .membershipModel import MembershipModel
+from .groupModel import GroupModel
+
+logger = logging.getLogger(__name__)
+
+
+def _to_object_id(field):
+    # Ids that aren't valid ObjectIds (or are missing) are left untouched
+    return {"$convert": {"input": field, "to": "objectId", "onError": field, "onNull": None}}
+
+
+# Runs server side, so each document is rewritten atomically and a
+# concurrent update from the app can't be overwritten with stale values.
+# Handles v1 and v2 documents alike ($convert leaves ObjectIds as they are).
+# Mirrors expenseModel.encode_splits.
+EXPENSE_UPGRADE = [
+    {
+        "$set": {
+            "group_id": _to_object_id("$group_id"),
+            "created_by": _to_object_id("$created_by"),
+            "splits": {
+                "$cond": [
+                    {"$gt": [{"$size": {"$objectToArray": {"$ifNull": ["$final_split", {}]}}}, 0]},
+                    {"$map": {
+                        "input": {"$objectToArray": "$final_split"},
+                        "as": "fs",
+                        "in": {"$let": {
+                            "vars": {"share_value": {"$arrayElemAt": [
+                                {"$filter": {
+                                    "input": {"$objectToArray": {"$ifNull": ["$custom_shares", {}]}},
+                                    "as": "cs",
+                                    "cond": {"$eq": ["$$cs.k", "$$fs.k"]}
+                                }}, 0
+                            ]}},
+                            "in": {"$mergeObjects": [
+                                {
+                                    "u": _to_object_id("$$fs.k"),
+                                    "s": {"$round": [{"$toDouble": {"$ifNull": ["$$fs.v.should_pay", 0]}}, 2]},
+                                    "p": {"$round": [{"$toDouble": {"$ifNull": ["$$fs.v.paid", 0]}}, 2]},
+                                },
+                                # Raw custom input is only kept for custom splits
+                                {"$cond": [
+                                    {"$and": [
+                                        {"$eq": ["$split_type", "custom"]},
+                                        {"$ne": [{"$ifNull": ["$$share_value.v", 0]}, 0]}
+                                    ]},
+                                    {"c": {"$toDouble": "$$share_value.v"}},
+                                    {}
+                                ]}
+                            ]}
+                        }}
+                    }},
+                    # No computed split: keep the members with zero amounts
+                    {"$map": {
+                        "input": {"$ifNull": ["$split_with", []]},
+                        "as": "uid",
+                        "in": {"u": _to_object_id("$$uid"), "s": 0.0, "p": 0.0}
+                    }}
+                ]
+            },
+            "schema_version": SCHEMA_VERSION
+        }
+    },
+    {"$unset": ["split_with", "final_split", "custom_payments", "custom_shares"]}
+]
+
+
+# -------------------------
+# INDEXES
+# -------------------------
+# Hot and cold expenses are read with the same filters, so they share indexes
+EXPENSE_INDEXES = [
+    # Multikey: one entry per member, replaces scanning split_with with $in
+    IndexModel([("splits.u", ASCENDING), ("created_at", DESCENDING)], name="splits_user_recent"),
+    IndexModel([("created_by", ASCENDING), ("created_at", DESCENDING)], name="creator_recent"),
+    IndexModel([("group_id", ASCENDING), ("created_at", DESCENDING)], name="group_recent"),
+    # The "until migrated" split_with branch of the $or filters
+    # (ExpenseModel._user_expenses_filter, _user_owes_pipeline): an $or
+    # only uses indexes when every branch has one. Sparse, so it only
+    # holds expenses not yet migrated and empties out as they are.
+    IndexModel([("split_with", ASCENDING)], name="legacy_split_with", sparse=True),
+]
+
+INDEXES = {
+    "expenses": EXPENSE_INDEXES,
+    # Archive (see archiveModel.py): reports read the cold collection the
+    # way pages read the hot one, the summaries are found by group or member
+    "expenses_archive": EXPENSE_INDEXES,
+    "expense_buckets": [
+        IndexModel([("group_id", ASCENDING), ("month", DESCENDING)], name="group_month", unique=True),
+        IndexModel([("members", ASCENDING)], name="members"),
+    ],
+    "archive_snapshots": [
+        IndexModel([("members", ASCENDING)], name="members"),
+    ],
+    # Settle-up (see settlementModel.py)
+    "settlements": [
+        IndexModel([("group_id", ASCENDING), ("created_at", DESCENDING)], name="group_recent"),
+        IndexModel([("from_user", ASCENDING)], name="from_user"),
+        IndexModel([("to_user", ASCENDING)], name="to_user"),
+    ],
+    "balance_checkpoints": [
+        IndexModel([("group_id", ASCENDING), ("stale", ASCENDING), ("as_of", DESCENDING)], name="group_latest"),
+    ],
+    # Event log (see eventModel.py): read in _id order by the projections,
+    # per expense for its history, per group for point-in-time balances
+    "expense_events": [
+        IndexModel([("expense_id", ASCENDING), ("_id", ASCENDING)], name="expense_history"),
+        IndexModel([("after.group_id", ASCENDING), ("at", ASCENDING)], name="group_after"),
+        IndexModel([("before.group_id", ASCENDING), ("at", ASCENDING)], name="group_before"),
+        # One creation per expense and one event per settlement, so a backfill can be re-run
+        IndexModel([("expense_id", ASCENDING)], name="expense_created", unique=True,
+                   partialFilterExpression={"type": "created"}),
+        IndexModel([("settlement_id", ASCENDING)], name="settlement_settled", unique=True,
+                   partialFilterExpression={"type": "settled"}),
+    ],
+    # OTPs (see otpModel.py): one per email, removed by the TTL monitor once expired
+    "otps": [
+        IndexModel([("email", ASCENDING)], name="email", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_ttl", expireAfterSeconds=0),
+    ],
+    # Group membership (see membershipModel.py): "my groups" by recent
+    # activity, members and counts per group, one membership per pair,
+    # a group's member list in pages (GroupModel.get_members_page)
+    "memberships": [
+        IndexModel([("user_id", ASCENDING), ("group_id", ASCENDING)], name="user_group", unique=True),
+        IndexModel([("user_id", ASCENDING), ("last_activity", DESCENDING), ("group_id", DESCENDING)],
+                   name="user_recent"),
+        IndexModel([("group_id", ASCENDING), ("last_activity", ASCENDING)], name="group_activity"),
+        IndexModel([("group_id", ASCENDING), ("user_id", ASCENDING)], name="group_user"),
+    ],
+    # Multikey, for reads that still go through the member array
+    "groups": [
+        IndexModel([("group_members", ASCENDING)], name="members"),
+    ],
+    # Users: emails and usernames are stored lowercased (userModel.build_user);
+    # these are the duplicate check when a pending signup is finalized
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email", unique=True),
+        IndexModel([("username", ASCENDING)], name="username", unique=True),
+    ],
+    # Signups waiting for their OTP (see pendingSignupModel.py)
+    "pending_signups": [
+        IndexModel([("token_hash", ASCENDING)], name="token", unique=True),
+        IndexModel([("email", ASCENDING)], name="email", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_ttl", expireAfterSeconds=0),
+    ],
+    # Sliding-window rate limit counters (see utils/rate_limit.py)
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_ttl", expireAfterSeconds=0),
+    ],
+    "proj_user_monthly": [
+        IndexModel([("user_id", ASCENDING), ("year", ASCENDING), ("month", ASCENDING)], name="user_month"),
+    ],
+}
+
+
+# Indexes a newer layout no longer has; dropped by ensure-indexes
+DROPPED_INDEXES = {
+    # Events used to carry a counter-issued seq (see eventModel.py): left
+    # in place, the unique index would refuse every event without one
+    "expense_events": ["seq"],
+}
+
+
+def ensure_indexes(db):
+    for collection, names in DROPPED_INDEXES.items():
+        existing = db[collection].index_information()
+        for name in names:
+            if name in existing:
+                db[collection].drop_index(name)
+                logger.info("Dropped index %s.%s", collection, name)
+
+    created = {}
+    for collection, models in INDEXES.items():
+        created[collection] = db[collection].create_indexes(models)
+    return created
+
+
+# -------------------------
+# EXPENSE SCHEMA
+# -------------------------
+def pending_expenses_filter():
+    return {"schema_version": {"$ne": SCHEMA_VERSION}}
+
+
+def migrate_expenses(db, batch_size=1000, pause=0.05, limit=None):
+    """
+    Rewrites older expenses in _id order, batch_size at a time, sleeping
+    `pause` seconds between batches to keep load on the primary low.
+    Safe to stop and re-run: migrated documents no longer match.
+    """
+    migrated = 0
+    last_id = None
+
+    while limit is None or migrated < limit:
+        query = pending_expenses_filter()
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+
+        size = batch_size if limit is None else min(batch_size, limit - migrated)
+        ids = [d["_id"] for d in db.expenses.find(query, {"_id": 1}).sort("_id", 1).limit(size)]
+        if not ids:
+            break
+
+        result = db.expenses.update_many(
+            {"_id": {"$in": ids}, **pending_expenses_filter()},
+            EXPENSE_UPGRADE
+        )
+        migrated += result.modified_count
+        last_id = ids[-1]
+        logger.info("Migrated %d expenses to v%d (last _id %s)", migrated, SCHEMA_VERSION, last_id)
+
+        if pause:
+            time.sleep(pause)
+
+    return migrated
+
+
+def init_migrations(app):
+
+    @app.cli.command("ensure-indexes")
+    def ensure_indexes_command():
+        """Create the indexes the queries rely on (no-op when they exist)."""
+        for collection, names in ensure_indexes(GetDB._get_db()).items():
+            click.echo(f"✅ {collection}: {', '.join(names)}")
+
+    @app.cli.command("migrate-expenses")
+    @click.option("--batch-size", default=1000, show_default=True)
+    @click.option("--pause-ms", default=50, show_default=True, help="sleep between batches")
+    @click.option("--limit", type=int, default=None, help="stop after this many documents")
+    @click.option("--dry-run", is_flag=True, help="only count documents still on the old schema")
+    def migrate_expenses_command(batch_size, pause_ms, limit, dry_run):
+        """Move expenses to the current schema, online and in batches."""
+        db = GetDB._get_db()
+        pending = db.expenses.count_documents(pending_expenses_filter())
+        click.echo(f"{pending} expenses still need migrating")
+        if dry_run or not pending:
+            return
+
+        started = time.perf_counter()
+        migrated = migrate_expenses(db, batch_size, pause_ms / 1000, limit)
+        remaining = db.expenses.count_documents(pending_expenses_filter())
+        click.echo(f"✅ Migrated {migrated} expenses in {time.perf_counter() - started:.1f}s, {remaining} left")
+
+    @app.cli.command("archive-expenses")
+    @click.option("--older-than-days", type=int, default=None, help="defaults to ARCHIVE_AFTER_DAYS")
+    @click.option("--limit-groups", type=int, default=None, help="stop after this many groups")
+    @click.option("--dry-run", is_flag=True, help="only list the groups that have expenses to archive")
+    def archive_expenses_command(older_than_days, limit_groups, dry_run):
+        """Move old expenses to the cold collection and pre-summed month buckets."""
+        days = older_than_days or app.config["ARCHIVE_AFTER_DAYS"]
+        groups = ArchiveModel.groups_to_archive(ArchiveModel.cutoff(days))
+        click.echo(f"{len(groups)} groups have expenses older than {days} days")
+        if dry_run or not groups:
+            return
+
+        started = time.perf_counter()
+        moved = ArchiveModel.archive_expenses(days, limit_groups)
+        click.echo(
+            f"✅ Archived {sum(moved.values())} expenses of {len(moved)} groups "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+    @app.cli.command("project-events")
+    @click.option("--backfill", is_flag=True, help="first log expenses and settlements written before the event log")
+    @click.option("--rebuild", type=click.Choice(sorted(PROJECTIONS)), multiple=True,
+                  help="drop this projection and replay the whole log into it")
+    @click.option("--batch-size", default=5000, show_default=True)
+    def project_events_command(backfill, rebuild, batch_size):
+        """Bring the expense event projections up to date with the log."""
+        started = time.perf_counter()
+        if backfill:
+            click.echo(f"✅ Logged {EventModel.backfill()} earlier expenses and settlements")
+
+        for name in rebuild:
+            click.echo(f"✅ Rebuilt {name} from {ProjectionModel.rebuild(name, batch_size)} events")
+
+        last = EventModel.last_position()
+        for name, applied in ProjectionModel.catch_up(batch_size=batch_size).items():
+            if applied is None:
+                click.echo(f"⏭️  {name}: being fed by another worker")
+            else:
+                click.echo(f"✅ {name}: {applied} new events, at {ProjectionModel.offset(name)} of {last}")
+        click.echo(f"Done in {time.perf_counter() - started:.1f}s")
+
+    @app.cli.command("backfill-memberships")
+    @click.option("--batch-size", default=500, show_default=True)
+    def backfill_memberships_command(batch_size):
+        """Build memberships and member counts/previews from every group's member array (then set MEMBERSHIP_READS=true)."""
+        started = time.perf_counter()
+        done = MembershipModel.backfill(batch_size)
+        stats = GroupModel.refresh_member_stats()
+        click.echo(
+            f"✅ {done['groups']} groups: {done['added']} memberships added, {done['removed']} removed, "
+            f"{stats.modified_count} member previews updated in {time.perf_counter() - started:.1f}s"
+        )
@@ -1,10 +1,23 @@
 from . import GetDB
 from config import Config
+from pymongo import ReturnDocument
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
-import random
+import hashlib
+import hmac
+import secrets
+
+# otps - one per email: { email, code_hash, expires_at, attempts, used, created_at }
+#        code_hash is an HMAC of email + code, the code itself is never stored.
+#        A TTL index on expires_at removes expired records (see migrations.py).
+
+
+def hash_otp(email, otp):
+    key = (Config.OTP_SECRET or Config.SECRET_KEY).encode()
+    return hmac.new(key, f"{email}:{otp}".encode(), hashlib.sha256).hexdigest()
+
 
 class OTPModel:
 
@@ -15,12 +28,22 @@ class OTPModel:
 
     @staticmethod
     def generate_otp(email):
-        otp = random.randint(100000, 999999)
-        expires_at = datetime.utcnow() + timedelta(seconds=Config.OTP_TTL_SECONDS)
+        otp = f"{secrets.randbelow(10 ** Config.OTP_LENGTH):0{Config.OTP_LENGTH}d}"
+        now = datetime.utcnow()
 
+        # A new code replaces the old one and resets its attempts
         OTPModel.collection().update_one(
             {"email": email},
-            {"$set": {"otp": otp, "expires_at": expires_at, "verified": False}},
+            {
+                "$set": {
+                    "code_hash": hash_otp(email, otp),
+                    "expires_at": now + timedelta(seconds=Config.OTP_TTL_SECONDS),
+                    "attempts": 0,
+                    "used": False,
+                    "created_at": now,
+                },
+                "$unset": {"otp": "", "verified": ""}  # plaintext records from before hashing
+            },
             upsert=True
         )
 
@@ -67,21 +90,45 @@ class OTPModel:
 
     @staticmethod
     def verify_otp(email, otp):
-        record = OTPModel.collection().find_one({"email": email})
+        """
+        One round trip: a live, unused record under the attempt limit has its
+        attempts bumped and is marked used if the code matches.
+        """
+        now = datetime.utcnow()
+        code_hash = hash_otp(email, str(otp).strip())
+        record = OTPModel.collection().find_one_and_update(
+            {
+                "email": email,
+                "used": False,
+                "expires_at": {"$gt": now},
+                "attempts": {"$lt": Config.OTP_MAX_ATTEMPTS},
+            },
+            [{"$set": {
+                "attempts": {"$add": ["$attempts", 1]},
+                "used": {"$eq": ["$code_hash", code_hash]},
+            }}],
+            projection={"used": 1, "attempts": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if record is not None:
+            if record["used"]:
+                return True, "OTP verified"
+            left = Config.OTP_MAX_ATTEMPTS - record["attempts"]
+            if left <= 0:
+                return False, "Too many incorrect attempts. Request a new OTP."
+            return False, f"Incorrect OTP ({left} attempt{'s' if left != 1 else ''} left)"
+
+        # Failure path only: say why nothing matched
+        record = OTPModel.collection().find_one({"email": email}, {"used": 1, "expires_at": 1, "attempts": 1})
         if not record:
             return False, "OTP not found"
-        if record.get("verified"):
+        if record.get("used"):
             return False, "OTP already verified"
-        if record.get("otp") != otp:
-            return False, "Incorrect OTP"
-        if datetime.utcnow() > record.get("expires_at"):
+        if record.get("expires_at") and record["expires_at"] <= now:
             return False, "OTP expired"
-
-        OTPModel.collection().update_one(
-            {"email": email},
-            {"$set": {"verified": True}}
-        )
-        return True, "OTP verified"
+        if record.get("attempts", 0) >= Config.OTP_MAX_ATTEMPTS:
+            return False, "Too many incorrect attempts. Request a new OTP."
+        return False, "OTP not found"
 
     @staticmethod
     def resend_otp(email) -> bool:
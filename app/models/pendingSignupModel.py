@@ -0,0 +1,77 @@
+# pendingSignupModel.py
+from . import GetDB
+from .userModel import UserModel
+from config import Config
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+import hashlib
+import secrets
+
+# pending_signups - a signup waiting for its email OTP:
+#   { token_hash, email, username, full_name, phone_no, password_hash,
+#     created_at, expires_at }
+#   The browser only holds the opaque token (in the session cookie); the
+#   password is hashed before it is stored. One per email, a new signup
+#   replaces the previous one. A TTL index on expires_at removes abandoned
+#   ones (see migrations.py).
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class PendingSignupModel:
+
+    @staticmethod
+    def collection():
+        return GetDB._get_db().pending_signups
+
+    @staticmethod
+    def create(email, username, full_name, phone_no, password_hash):
+        """Store the signup, returns the token to hand to the browser."""
+        token = secrets.token_urlsafe(32)
+        now = datetime.utcnow()
+        PendingSignupModel.collection().update_one(
+            {"email": email},
+            {"$set": {
+                "token_hash": hash_token(token),
+                "username": username.lower().strip(),
+                "full_name": full_name,
+                "phone_no": phone_no,
+                "password_hash": password_hash,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=Config.PENDING_SIGNUP_TTL_SECONDS),
+            }},
+            upsert=True
+        )
+        return token
+
+    @staticmethod
+    def get(token):
+        if not token:
+            return None
+        return PendingSignupModel.collection().find_one({
+            "token_hash": hash_token(token),
+            # The TTL monitor runs once a minute, don't trust what it hasn't removed yet
+            "expires_at": {"$gt": datetime.utcnow()},
+        })
+
+    @staticmethod
+    def finalize(pending):
+        """
+        Create the verified user in one insert. The unique email and
+        username indexes on users are the duplicate check, so a name taken
+        since signup fails here (returns None) instead of a separate read.
+        """
+        user = UserModel.build_user(
+            pending["email"], pending["username"], pending["full_name"],
+            pending["phone_no"], pending["password_hash"],
+            extra_fields={"isVerified": True}
+        )
+        try:
+            inserted = UserModel.collection().insert_one(user)
+        except DuplicateKeyError:
+            return None
+        finally:
+            PendingSignupModel.collection().delete_one({"_id": pending["_id"]})
+        return inserted.inserted_id
@@ -0,0 +1,281 @@
+# projectionModel.py
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from . import GetDB
+from .eventModel import EventModel
+from .expenseModel import to_ref
+from ..utils.background import submit_in_app
+
+logger = logging.getLogger(__name__)
+
+# Derived views of expense_events, each kept up to date incrementally:
+#
+#   projection_offsets    - { _id: projection name, position, owner, lease_until, updated_at }
+#                           the _id of the last event each projection applied, plus
+#                           a lease so only one worker feeds a projection at a time
+#   proj_group_balances   - { _id: group_id, balances: { uid: net }, last_event }
+#   proj_group_totals     - { _id: group_id, total, count, last_event }
+#   proj_user_monthly     - { _id: "uid:2025-03", user_id, year, month, total_amount, last_event }
+#
+# Every document also records the newest event folded into it, so
+# replaying a batch that was half applied before a crash skips what it
+# already holds. Any of them can be dropped and rebuilt from the log.
+LEASE_SECONDS = 60
+
+
+class Projection:
+    """
+    A view fed from the event log. Subclasses say what one expense or
+    settlement state adds to which document; an event then contributes
+    its `after` state minus its `before` state.
+    """
+
+    name = None
+
+    def collection(self):
+        return GetDB._get_db()[f"proj_{self.name}"]
+
+    def contributions(self, event_type, state):
+        """[(document _id, { field: amount }, { field: value to set })] for one state."""
+        raise NotImplementedError
+
+    def fold(self, events, applied=None):
+        """
+        { _id: (inc, set, last event _id) } for a run of events, skipping
+        the ones a document already holds (`applied` = { _id: last_event }).
+        """
+        applied = applied or {}
+        folded = {}
+        for event in events:
+            for state, sign in ((event.get("before"), -1), (event.get("after"), 1)):
+                if not state:
+                    continue
+                for key, inc, fields in self.contributions(event["type"], state):
+                    if applied.get(key) is not None and event["_id"] <= applied[key]:
+                        continue
+                    total, values, _ = folded.get(key, ({}, {}, None))
+                    for field, amount in inc.items():
+                        total[field] = round(total.get(field, 0) + sign * amount, 2)
+                    values.update(fields)
+                    folded[key] = (total, values, event["_id"])
+        return folded
+
+    def keys(self, events):
+        return {
+            key
+            for event in events
+            for state in (event.get("before"), event.get("after")) if state
+            for key, _, _ in self.contributions(event["type"], state)
+        }
+
+    def apply(self, events, session=None):
+        keys = list(self.keys(events))
+        applied = {
+            d["_id"]: d.get("last_event")
+            for d in self.collection().find({"_id": {"$in": keys}}, {"last_event": 1}, session=session)
+        }
+        requests = []
+        for key, (inc, values, last_event) in self.fold(events, applied).items():
+            update = {"$max": {"last_event": last_event}}
+            if inc:
+                update["$inc"] = inc
+            if values:
+                update["$set"] = values
+            requests.append(UpdateOne({"_id": key}, update, upsert=True))
+        if requests:
+            self.collection().bulk_write(requests, ordered=False, session=session)
+        return len(requests)
+
+
+class GroupBalances(Projection):
+    name = "group_balances"
+
+    def contributions(self, event_type, state):
+        if not state.get("group_id"):
+            return []
+        if event_type == "settled":
+            # from_user paid to_user back (see settlementModel.py)
+            return [(state["group_id"], {
+                f"balances.{state['from_user']}": state["amount"],
+                f"balances.{state['to_user']}": -state["amount"],
+            }, {})]
+        inc = {}
+        for e in state["splits"]:
+            field = f"balances.{e['u']}"
+            inc[field] = round(inc.get(field, 0.0) + e["p"] - e["s"], 2)
+        return [(state["group_id"], inc, {})]
+
+    def as_of(self, group_id, at):
+        """{ uid: net } of the group as the log had it at `at`, replayed in memory."""
+        group_ref = to_ref(group_id)
+        total, _, _ = self.fold(EventModel.for_group(group_ref, until=at)).get(group_ref, ({}, {}, 0))
+        prefix = len("balances.")
+        return {field[prefix:]: net for field, net in total.items()}
+
+
+class GroupTotals(Projection):
+    name = "group_totals"
+
+    def contributions(self, event_type, state):
+        if event_type == "settled" or not state.get("group_id"):
+            return []
+        return [(state["group_id"], {"total": state["amount"], "count": 1}, {})]
+
+
+class UserMonthly(Projection):
+    """Same numbers as ExpenseModel.get_monthly_expenses_for_user: amounts by creator and month."""
+    name = "user_monthly"
+
+    def contributions(self, event_type, state):
+        created_at = state.get("created_at")
+        if event_type == "settled" or not state.get("created_by") or created_at is None:
+            return []
+        key = f"{state['created_by']}:{created_at.year}-{created_at.month:02d}"
+        return [(key, {"total_amount": state["amount"]},
+                 {"user_id": state["created_by"], "year": created_at.year, "month": created_at.month})]
+
+
+PROJECTIONS = {p.name: p for p in (GroupBalances(), GroupTotals(), UserMonthly())}
+
+
+class ProjectionModel:
+
+    @staticmethod
+    def offsets():
+        return GetDB._get_db().projection_offsets
+
+    @staticmethod
+    def offset(name):
+        """_id of the last event the projection applied, None before the first."""
+        doc = ProjectionModel.offsets().find_one({"_id": name})
+        return doc.get("position") if doc else None
+
+    # -------------------------
+    # LEASE
+    # -------------------------
+    @staticmethod
+    def _claim(name, owner):
+        now = datetime.utcnow()
+        try:
+            return ProjectionModel.offsets().find_one_and_update(
+                {"_id": name, "$or": [{"lease_until": {"$lt": now}}, {"lease_until": {"$exists": False}}]},
+                {"$set": {"owner": owner, "lease_until": now + timedelta(seconds=LEASE_SECONDS)},
+                 "$setOnInsert": {"position": None}},
+                upsert=True, return_document=ReturnDocument.AFTER
+            ) is not None
+        except DuplicateKeyError:
+            # Exists and someone else holds the lease
+            return False
+
+    @staticmethod
+    def _release(name, owner):
+        ProjectionModel.offsets().update_one(
+            {"_id": name, "owner": owner}, {"$unset": {"owner": "", "lease_until": ""}}
+        )
+
+    # -------------------------
+    # FEEDING
+    # -------------------------
+    @staticmethod
+    def _run(projection, owner, batch_size, max_batches=None):
+        applied, batches = 0, 0
+        while max_batches is None or batches < max_batches:
+            events = EventModel.read_after(ProjectionModel.offset(projection.name), batch_size)
+            if not events:
+                break
+
+            def write(session):
+                projection.apply(events, session)
+                ProjectionModel.offsets().update_one(
+                    {"_id": projection.name, "owner": owner},
+                    {"$set": {"position": events[-1]["_id"], "updated_at": datetime.utcnow(),
+                              "lease_until": datetime.utcnow() + timedelta(seconds=LEASE_SECONDS)}},
+                    session=session
+                )
+
+            # Documents and offset move together; without transactions the
+            # per-document last_event keeps a replayed batch from counting twice
+            GetDB.run_atomically(write, "projecting events")
+            applied += len(events)
+            batches += 1
+        return applied
+
+    @staticmethod
+    def catch_up(names=None, batch_size=1000, max_batches=None):
+        """Apply new events to each projection; { name: events applied, None if leased elsewhere }."""
+        owner = uuid.uuid4().hex
+        done = {}
+        for name in names or PROJECTIONS:
+            if not ProjectionModel._claim(name, owner):
+                done[name] = None
+                continue
+            try:
+                done[name] = ProjectionModel._run(PROJECTIONS[name], owner, batch_size, max_batches)
+            finally:
+                ProjectionModel._release(name, owner)
+        return done
+
+    @staticmethod
+    def rebuild(name, batch_size=5000):
+        """Drop a projection and replay the whole log into it."""
+        owner = uuid.uuid4().hex
+        if not ProjectionModel._claim(name, owner):
+            raise RuntimeError(f"Projection {name} is being fed by another worker, try again")
+        try:
+            PROJECTIONS[name].collection().delete_many({})
+            ProjectionModel.offsets().update_one({"_id": name}, {"$set": {"position": None}})
+            return ProjectionModel._run(PROJECTIONS[name], owner, batch_size)
+        finally:
+            ProjectionModel._release(name, owner)
+
+    # -------------------------
+    # READS
+    # -------------------------
+    @staticmethod
+    def group_balances(group_id):
+        doc = PROJECTIONS["group_balances"].collection().find_one({"_id": to_ref(group_id)}) or {}
+        return {uid: round(net, 2) for uid, net in doc.get("balances", {}).items()}
+
+    @staticmethod
+    def balances_as_of(group_id, at):
+        return PROJECTIONS["group_balances"].as_of(group_id, at)
+
+
+# -------------------------
+# BACKGROUND CATCH-UP
+# -------------------------
+# One pending run per worker: writes while it runs make it loop once more
+_catch_up = {"running": False, "dirty": False}
+_catch_up_lock = threading.Lock()
+
+
+def schedule_catch_up():
+    from flask import current_app
+    if not current_app.config["PROJECTIONS_LIVE"]:
+        return
+    with _catch_up_lock:
+        _catch_up["dirty"] = True
+        if _catch_up["running"]:
+            return
+        _catch_up["running"] = True
+    submit_in_app(_drain)
+
+
+def _drain():
+    from flask import current_app
+    try:
+        while True:
+            with _catch_up_lock:
+                if not _catch_up["dirty"]:
+                    _catch_up["running"] = False
+                    return
+                _catch_up["dirty"] = False
+            ProjectionModel.catch_up(batch_size=current_app.config["PROJECTION_BATCH_SIZE"])
+    except Exception:
+        with _catch_up_lock:
+            _catch_up["running"] = False
+        raise
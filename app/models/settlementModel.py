@@ -0,0 +1,230 @@
+# settlementModel.py
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from . import GetDB
+from .archiveModel import ArchiveModel
+from .expenseModel import ExpenseModel, BALANCE_FIELDS, to_ref
+from .groupModel import GroupModel, id_variants
+from ..utils.background import submit_in_app
+
+logger = logging.getLogger(__name__)
+
+# settlements          - { group_id, from_user, to_user, amount, note, created_by, created_at }
+#                        from_user paid to_user back: from_user's net goes up, to_user's down
+# balance_checkpoints  - { group_id, as_of, balances: { uid: net }, stale, generation,
+#                          settlement_id, created_at }
+#                        every net balance of the group up to `as_of`, so a balance
+#                        read only scans what was written after the latest one.
+#
+# A checkpoint goes stale when an expense it already covers is added
+# (backdated), edited or deleted; readers skip stale ones and a background task recomputes it.
+
+
+class SettlementModel:
+
+    @staticmethod
+    def collection():
+        return GetDB._get_db().settlements
+
+    @staticmethod
+    def checkpoints():
+        return GetDB._get_db().balance_checkpoints
+
+    @staticmethod
+    def build_document(group_id, from_user, to_user, amount, created_by, note=""):
+        return {
+            "group_id": to_ref(group_id),
+            "from_user": to_ref(from_user),
+            "to_user": to_ref(to_user),
+            "amount": round(float(amount), 2),
+            "note": note,
+            "created_by": to_ref(created_by),
+            "created_at": datetime.utcnow(),
+        }
+
+    @staticmethod
+    def record_settlement(group_id, from_user, to_user, amount, created_by, note=""):
+        from .eventModel import EventModel
+        from .projectionModel import schedule_catch_up
+        doc = SettlementModel.build_document(group_id, from_user, to_user, amount, created_by, note)
+
+        def write(session):
+            result = SettlementModel.collection().insert_one(doc, session=session)
+            EventModel.append("settled", after=EventModel.settlement_state(doc),
+                              settlement_id=result.inserted_id, session=session)
+            return result
+
+        result = GetDB.run_atomically(write, "logging expense events")
+        SettlementModel.write_checkpoint(group_id, settlement_id=result.inserted_id)
+        GroupModel.touch(group_id)
+        schedule_catch_up()
+        return result
+
+    @staticmethod
+    def get_for_group(group_id, limit=10):
+        return list(
+            SettlementModel.collection().find({"group_id": {"$in": id_variants(group_id)}})
+            .sort("created_at", -1).limit(limit)
+        )
+
+    # -------------------------
+    # BALANCES
+    # -------------------------
+    @staticmethod
+    def apply_settlements(balances, settlements):
+        for s in settlements:
+            amount = float(s.get("amount", 0))
+            from_user, to_user = str(s["from_user"]), str(s["to_user"])
+            balances[from_user] = round(balances.get(from_user, 0.0) + amount, 2)
+            balances[to_user] = round(balances.get(to_user, 0.0) - amount, 2)
+        return balances
+
+    @staticmethod
+    def _checkpoint_filter(group_id, before=None):
+        query = {"group_id": {"$in": id_variants(group_id)}, "stale": False}
+        if before is not None:
+            query["as_of"] = {"$lt": before}
+        return query
+
+    @staticmethod
+    def latest_checkpoint(group_id, before=None):
+        return SettlementModel.checkpoints().find_one(
+            SettlementModel._checkpoint_filter(group_id, before), sort=[("as_of", -1)]
+        )
+
+    @staticmethod
+    def _balance_start(snapshot, checkpoint, as_of=None):
+        """(starting balances, created_at window of what to add on top)"""
+        # Archiving past a checkpoint moves expenses it reads as deltas
+        through = (snapshot or {}).get("through")
+        if checkpoint and through and through > checkpoint["as_of"]:
+            checkpoint = None
+
+        window = {}
+        if checkpoint:
+            balances = {uid: float(net) for uid, net in checkpoint["balances"].items()}
+            window["$gt"] = checkpoint["as_of"]
+        else:
+            balances = ArchiveModel.snapshot_balances(snapshot)
+        if as_of is not None:
+            window["$lte"] = as_of
+        return balances, window
+
+    @staticmethod
+    def _in_window(query, window):
+        return {**query, "created_at": window} if window else query
+
+    @staticmethod
+    def _add_deltas(balances, expenses, settlements):
+        for uid, net in ExpenseModel.sum_net_balances(expenses).items():
+            balances[uid] = round(balances.get(uid, 0.0) + net, 2)
+        return SettlementModel.apply_settlements(balances, settlements)
+
+    @staticmethod
+    def compute_balances(group_id, as_of=None):
+        """
+        { user_id: net } for the group, optionally only up to `as_of`:
+        latest checkpoint + expenses and settlements written after it.
+        """
+        balances, window = SettlementModel._balance_start(
+            ArchiveModel.get_snapshot(group_id),
+            SettlementModel.latest_checkpoint(group_id, before=as_of),
+            as_of
+        )
+        expenses = ExpenseModel.collection().find(
+            SettlementModel._in_window(ExpenseModel._group_filter(group_id), window), BALANCE_FIELDS
+        )
+        settlements = SettlementModel.collection().find(
+            SettlementModel._in_window({"group_id": {"$in": id_variants(group_id)}}, window)
+        )
+        return SettlementModel._add_deltas(balances, expenses, settlements)
+
+    # -------------------------
+    # CHECKPOINTS
+    # -------------------------
+    @staticmethod
+    def write_checkpoint(group_id, **extra):
+        # Expenses younger than the lag may not be visible yet, leave them as deltas
+        as_of = datetime.utcnow() - timedelta(seconds=current_app.config["CHECKPOINT_LAG_SECONDS"])
+        latest = SettlementModel.latest_checkpoint(group_id)
+        if latest and latest["as_of"] >= as_of:
+            return None
+
+        return SettlementModel.checkpoints().insert_one({
+            "group_id": to_ref(group_id),
+            "as_of": as_of,
+            "balances": SettlementModel.compute_balances(group_id, as_of),
+            "stale": False,
+            "generation": 0,
+            "created_at": datetime.utcnow(),
+            **extra
+        })
+
+    @staticmethod
+    def invalidate_checkpoints(group_id, since):
+        """Something dated `since` changed: checkpoints covering it are recomputed in the background."""
+        if not group_id or since is None:
+            return 0
+        result = SettlementModel.checkpoints().update_many(
+            {"group_id": {"$in": id_variants(group_id)}, "as_of": {"$gte": since}},
+            {"$set": {"stale": True}, "$inc": {"generation": 1}}
+        )
+        if result.modified_count:
+            submit_in_app(SettlementModel.rebuild_checkpoints, group_id)
+        return result.modified_count
+
+    @staticmethod
+    def rebuild_checkpoints(group_id):
+        stale = list(
+            SettlementModel.checkpoints().find({"group_id": {"$in": id_variants(group_id)}, "stale": True})
+            .sort("as_of", -1)
+        )
+        if not stale:
+            return None
+
+        # Only the newest one is ever read, the rest are superseded by it
+        latest, superseded = stale[0], stale[1:]
+        if superseded:
+            SettlementModel.checkpoints().delete_many(
+                {"_id": {"$in": [c["_id"] for c in superseded]}, "stale": True}
+            )
+
+        snapshot = ArchiveModel.get_snapshot(group_id)
+        if (snapshot or {}).get("through") and snapshot["through"] > latest["as_of"]:
+            return SettlementModel.checkpoints().delete_one({"_id": latest["_id"]})
+
+        balances = SettlementModel.compute_balances(group_id, latest["as_of"])
+        # An edit while this ran bumped the generation and queued another rebuild
+        result = SettlementModel.checkpoints().update_one(
+            {"_id": latest["_id"], "generation": latest["generation"]},
+            {"$set": {"balances": balances, "stale": False, "rebuilt_at": datetime.utcnow()}}
+        )
+        logger.info("Rebuilt balance checkpoint of group %s (%d updated)", group_id, result.modified_count)
+        return result
+
+    # -------------------------
+    # USER TOTALS
+    # -------------------------
+    @staticmethod
+    def _user_filter(user_id):
+        ids = id_variants(user_id)
+        return {"$or": [{"from_user": {"$in": ids}}, {"to_user": {"$in": ids}}]}
+
+    @staticmethod
+    def _sum_settled(settlements, user_id):
+        """(paid back by the user, received by the user)"""
+        paid = received = 0.0
+        for s in settlements:
+            if str(s["from_user"]) == str(user_id):
+                paid += float(s.get("amount", 0))
+            elif str(s["to_user"]) == str(user_id):
+                received += float(s.get("amount", 0))
+        return round(paid, 2), round(received, 2)
+
+    @staticmethod
+    def get_user_settled(user_id):
+        settlements = SettlementModel.collection().find(
+            SettlementModel._user_filter(user_id), {"from_user": 1, "to_user": 1, "amount": 1}
+        )
+        return SettlementModel._sum_settled(settlements, user_id)
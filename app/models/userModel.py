@@ -1,6 +1,7 @@
-from werkzeug.security import generate_password_hash
+from ..utils.passwords import hash_password
+from pymongo import ReturnDocument
 from . import GetDB
-from datetime import datetime
+from datetime import datetime, timedelta
 from bson import ObjectId
 
 class UserModel:
@@ -12,7 +13,7 @@ class UserModel:
 
 
     @staticmethod
-    def create_user(email, username, full_name, phone_no, password, extra_fields=None):
+    def build_user(email, username, full_name, phone_no, password_hash, extra_fields=None):
 
         base_user = {
             "profile_image": None,
@@ -20,7 +21,7 @@ class UserModel:
             "username": username.lower().strip(),
             "full_name": full_name,
             "phone_no": phone_no,
-            "password": generate_password_hash(password),
+            "password": password_hash,
             "created_at": datetime.utcnow(),
 
             "isVerified": False,
@@ -41,13 +42,23 @@ class UserModel:
             },
             "password_last_changed": datetime.utcnow(),
             "failed_login_attempts": 0,
-            "account_locked_until": None
+            "account_locked_until": None,
+            "version": 1
         }
 
         # Merge custom fields
         if extra_fields:
             base_user.update(extra_fields)
 
+        return base_user
+
+    @staticmethod
+    def create_user(email, username, full_name, phone_no, password, extra_fields=None):
+        base_user = UserModel.build_user(
+            email, username, full_name, phone_no,
+            hash_password(password),
+            extra_fields
+        )
         return UserModel.collection().insert_one(base_user)
 
     
@@ -56,7 +67,7 @@ class UserModel:
         """
         Updates the user password and stores the timestamp of the change.
         """
-        hashed_password = generate_password_hash(new_password)
+        hashed_password = hash_password(new_password)
         return UserModel.collection().update_one(
             {"_id": user_id},
             {"$set": {"password": hashed_password, "password_last_changed": datetime.utcnow()}}
@@ -119,6 +130,12 @@ class UserModel:
             "_id": {"$ne": ObjectId(exclude_user_id)}
         }))
 
+    @staticmethod
+    def get_users_by_ids(user_ids, projection=None):
+        """{ str(_id): user } for just these users."""
+        ids = [ObjectId(str(u)) for u in user_ids if ObjectId.is_valid(str(u))]
+        return {str(u["_id"]): u for u in UserModel.collection().find({"_id": {"$in": ids}}, projection)}
+
     @staticmethod
     def get_all_users():
         return list(UserModel.collection().find())
@@ -135,6 +152,69 @@ class UserModel:
             }
         )
     
+    # -------------------------
+    # FAILED LOGINS / LOCKOUT
+    # -------------------------
+    @staticmethod
+    def record_failed_login(user_id, max_failures, lockout_seconds):
+        """
+        Count one wrong password. The max_failures-th in a row locks the
+        account for lockout_seconds and starts the count again.
+        Returns the new { failed_login_attempts, account_locked_until }.
+        """
+        locked_until = datetime.utcnow() + timedelta(seconds=lockout_seconds)
+        return UserModel.collection().find_one_and_update(
+            {"_id": ObjectId(user_id)},
+            [
+                {"$set": {"failed_login_attempts": {"$add": [{"$ifNull": ["$failed_login_attempts", 0]}, 1]}}},
+                {"$set": {
+                    "account_locked_until": {"$cond": [
+                        {"$gte": ["$failed_login_attempts", max_failures]}, locked_until, "$account_locked_until"
+                    ]},
+                    "failed_login_attempts": {"$cond": [
+                        {"$gte": ["$failed_login_attempts", max_failures]}, 0, "$failed_login_attempts"
+                    ]},
+                }},
+            ],
+            projection={"failed_login_attempts": 1, "account_locked_until": 1},
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def clear_failed_logins(user):
+        # Only costs a write when there is something to clear
+        if not user.get("failed_login_attempts") and not user.get("account_locked_until"):
+            return None
+        return UserModel.collection().update_one(
+            {"_id": user["_id"]},
+            {"$set": {"failed_login_attempts": 0, "account_locked_until": None}}
+        )
+
+    @staticmethod
+    def find_signup_conflict(email, username):
+        """
+        A user already holding the email or the username, in one query.
+        Both are stored lowercased (build_user), so exact matches on the
+        unique indexes do what the case-insensitive regex lookup did.
+        """
+        values = list({email.lower().strip(), username.lower().strip()})
+        return UserModel.collection().find_one(
+            {"$or": [{"email": {"$in": values}}, {"username": {"$in": values}}]},
+            {"email": 1, "username": 1}
+        )
+
+    @staticmethod
+    def rehash_password(user_id, old_hash, password):
+        """
+        Store `password` under the configured hashing method, unless the
+        password changed meanwhile (the filter pins the hash it replaces).
+        Not a password change: password_last_changed stays as it is.
+        """
+        return UserModel.collection().update_one(
+            {"_id": ObjectId(str(user_id)), "password": old_hash},
+            {"$set": {"password": hash_password(password)}}
+        )
+
     @staticmethod
     def set_verified(email):
         return UserModel.collection().update_one(
@@ -189,10 +269,17 @@ class UserModel:
     def update_user(user_id, updates: dict):
         return UserModel.collection().update_one(
             {"_id": user_id},
-            {"$set": updates}
+            {"$set": updates, "$inc": {"version": 1}}
         )
     
+    @staticmethod
+    def touch(user_id):
+        """Bump the version stamp, e.g. when an expense outside any group changes."""
+        if not user_id:
+            return None
+        return UserModel.collection().update_one({"_id": ObjectId(str(user_id))}, {"$inc": {"version": 1}})
+
     @staticmethod
     def hash_password(password):
-        return generate_password_hash(password)
+        return hash_password(password)
 
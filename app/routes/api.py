@@ -0,0 +1,363 @@
+from flask import Blueprint, request, jsonify, abort, current_app, g
+from bson.objectid import ObjectId
+import hashlib
+from ..models.groupModel import GroupModel, to_object_id
+from ..models.userModel import UserModel
+from ..models.expenseModel import ExpenseModel
+from ..models.archiveModel import ArchiveModel
+from ..models.settlementModel import SettlementModel
+from ..utils.serialize import (
+    parse_fields, select_fields, projection_for,
+    encode_cursor, decode_cursor, parse_datetime
+)
+from .userAuth import SetAndGetSession
+
+api_bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Resource field -> stored fields it is built from (for ?fields=)
+GROUP_FIELDS = {
+    "title": ("group_title",),
+    "description": ("group_description",),
+    "photo": ("group_photo",),
+    "created_by": ("created_by",),
+    # The first MEMBER_PREVIEW_SIZE; all of them are at /groups/<id>/members
+    "members": ("member_preview",),
+    "member_count": ("member_count",),
+    "is_personal": ("is_personal",),
+    "total_balance": ("total_balance",),
+    "version": ("version",),
+    "created_at": ("created_at",),
+}
+EXPENSE_FIELDS = {
+    "title": ("title",),
+    "amount": ("amount",),
+    "group_id": ("group_id",),
+    "created_by": ("created_by",),
+    "split_type": ("split_type",),
+    "description": ("description",),
+    "created_at": ("created_at",),
+    "splits": ("splits", "final_split", "split_with"),
+}
+# Without ?fields=: everything but the member array
+GROUP_SUMMARY = {"group_members": 0}
+
+
+# -------------------------
+# HELPERS
+# -------------------------
+def _fail(status, message):
+    response = jsonify({"error": message})
+    response.status_code = status
+    abort(response)
+
+
+@api_bp.before_request
+def _authenticate():
+    """Session cookie for the browser, the same JWT as a Bearer token for other clients."""
+    token = request.cookies.get("session_token")
+    auth = request.headers.get("Authorization", "")
+    if auth.startswith("Bearer "):
+        token = auth[len("Bearer "):]
+
+    session = SetAndGetSession(token=token) if token else {"status": False, "error": "Missing token"}
+    if not session["status"]:
+        _fail(401, session["error"])
+    g.api_user_id = str(session["data"]["user_id"])
+
+
+def _etag(*parts):
+    # Responses are per user and per query string (fields, cursor, limit)
+    raw = "|".join(str(p) for p in (g.api_user_id, request.path, request.query_string.decode(), *parts))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _conditional(tag, build):
+    """304 when the client already has `tag`, otherwise build() as JSON. build() only runs on a miss."""
+    # Weak comparison: compression turns the strong tag into W/"..."
+    if request.if_none_match.contains_weak(tag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(tag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def _fields(allowed):
+    try:
+        return parse_fields(request.args.get("fields"), allowed)
+    except ValueError as e:
+        _fail(400, str(e))
+
+
+def _page_size():
+    try:
+        size = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        size = 0
+    if not 1 <= size <= MAX_PAGE_SIZE:
+        _fail(400, f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return size
+
+
+def _cursor():
+    token = request.args.get("cursor")
+    if not token:
+        return None
+    try:
+        return decode_cursor(token)
+    except ValueError as e:
+        _fail(400, str(e))
+
+
+def _object_id(value):
+    if not ObjectId.is_valid(str(value)):
+        _fail(404, "Not found")
+    return ObjectId(str(value))
+
+
+def _member_group(group_id, projection=None):
+    """The group if the caller belongs to it; 404 otherwise, so ids don't leak."""
+    group = GroupModel.collection().find_one(
+        {"_id": _object_id(group_id), "group_members": to_object_id(g.api_user_id)},
+        projection
+    )
+    if group is None:
+        _fail(404, "Group not found")
+    return group
+
+
+# -------------------------
+# RESOURCES
+# -------------------------
+def group_resource(group, fields=None):
+    return select_fields({
+        "id": group["_id"],
+        "title": group.get("group_title"),
+        "description": group.get("group_description"),
+        "photo": group.get("group_photo"),
+        "created_by": group.get("created_by"),
+        "members": GroupModel._preview_ids(group),
+        "member_count": GroupModel.member_count(group),
+        "is_personal": group.get("is_personal", False),
+        "total_balance": group.get("total_balance", 0),
+        "version": group.get("version", 0),
+        "created_at": group.get("created_at"),
+    }, fields)
+
+
+def expense_resource(expense, fields=None):
+    return select_fields({
+        "id": expense["_id"],
+        "title": expense.get("title"),
+        "amount": expense.get("amount"),
+        "group_id": expense.get("group_id"),
+        "created_by": expense.get("created_by"),
+        "split_type": expense.get("split_type"),
+        "description": expense.get("description"),
+        "created_at": expense.get("created_at"),
+        "splits": [
+            {"user_id": uid, "should_pay": d.get("should_pay", 0), "paid": d.get("paid", 0),
+             "net_balance": d.get("net_balance", 0)}
+            for uid, d in (expense.get("final_split") or {}).items()
+        ],
+    }, fields)
+
+
+def _expense_page(query, fields):
+    cursor = _cursor()
+    after = None
+    if cursor:
+        try:
+            after = (parse_datetime(cursor["t"]), ObjectId(cursor["i"]))
+        except (KeyError, TypeError, ValueError):
+            _fail(400, "Invalid cursor")
+
+    expenses, has_more = ExpenseModel.get_page(
+        query, _page_size(), after, projection_for(fields, EXPENSE_FIELDS)
+    )
+    last = expenses[-1] if expenses else None
+    return {
+        "data": [expense_resource(e, fields) for e in expenses],
+        "next_cursor": encode_cursor(t=last["created_at"], i=last["_id"]) if has_more else None,
+    }
+
+
+# -------------------------
+# ENDPOINTS
+# -------------------------
+@api_bp.route("/me")
+def me():
+    user = UserModel.get_user_by_ID(g.api_user_id)
+    if not user:
+        _fail(404, "User not found")
+
+    return _conditional(_etag(user.get("version", 0)), lambda: {
+        "id": user["_id"],
+        "username": user.get("username"),
+        "full_name": user.get("full_name"),
+        "email": user.get("email"),
+        "profile_pic": user.get("profile_pic"),
+        "created_at": user.get("created_at"),
+    })
+
+
+@api_bp.route("/groups")
+def groups():
+    fields = _fields(GROUP_FIELDS)
+    size = _page_size()
+    cursor = _cursor()
+    after_id = cursor.get("i") if cursor else None
+    if after_id is not None and not ObjectId.is_valid(str(after_id)):
+        _fail(400, "Invalid cursor")
+
+    # Membership and every group's version, no group bodies
+    versions = GroupModel.get_user_group_versions(g.api_user_id)
+
+    def build():
+        projection = projection_for(fields, GROUP_FIELDS) or GROUP_SUMMARY
+        rows, has_more = GroupModel.get_user_groups_page(g.api_user_id, size, after_id, projection)
+        return {
+            "data": [group_resource(row, fields) for row in rows],
+            "next_cursor": encode_cursor(i=rows[-1]["_id"]) if has_more else None,
+        }
+
+    return _conditional(_etag(sorted(versions)), build)
+
+
+@api_bp.route("/groups/<group_id>")
+def group(group_id):
+    fields = _fields(GROUP_FIELDS)
+    found = _member_group(group_id, projection_for(fields, GROUP_FIELDS) or GROUP_SUMMARY)
+    return _conditional(_etag(found.get("version", 0)), lambda: group_resource(found, fields))
+
+
+@api_bp.route("/groups/<group_id>/balances")
+def group_balances(group_id):
+    from .dashboard.groupRoute import cached_member_balances
+
+    found = _member_group(group_id, {"version": 1})
+
+    def build():
+        balances = cached_member_balances(found)
+        return {
+            "group_id": str(found["_id"]),
+            "version": found.get("version", 0),
+            "balances": [
+                {"user_id": uid, "net_balance": round(net, 2)}
+                for uid, net in sorted(balances.items())
+            ],
+            "transfers": ExpenseModel.settle_debts(balances),
+        }
+
+    return _conditional(_etag(found.get("version", 0)), build)
+
+
+@api_bp.route("/groups/<group_id>/members")
+def group_members(group_id):
+    from .dashboard.groupRoute import cached_member_balances
+
+    found = _member_group(group_id, {"version": 1})
+    size = _page_size()
+    after = _cursor()
+    if after and not (ObjectId.is_valid(str(after.get("u"))) or (isinstance(after.get("o"), int) and after["o"] >= 0)):
+        _fail(400, "Invalid cursor")
+
+    def build():
+        rows, next_after = GroupModel.get_members_page(found["_id"], size, after)
+        users = UserModel.get_users_by_ids(
+            [row["user_id"] for row in rows], {"full_name": 1, "username": 1, "profile_pic": 1}
+        )
+        balances = cached_member_balances(found)
+        data = []
+        for row in rows:
+            user = users.get(str(row["user_id"]), {})
+            data.append({
+                "user_id": row["user_id"],
+                "name": user.get("full_name") or user.get("username"),
+                "profile_pic": user.get("profile_pic"),
+                "role": row.get("role"),
+                "joined_at": row.get("joined_at"),
+                "net_balance": round(balances.get(str(row["user_id"]), 0.0), 2),
+            })
+        return {"data": data, "next_cursor": encode_cursor(**next_after) if next_after else None}
+
+    return _conditional(_etag(found.get("version", 0)), build)
+
+
+@api_bp.route("/groups/<group_id>/expenses")
+def group_expenses(group_id):
+    fields = _fields(EXPENSE_FIELDS)
+    found = _member_group(group_id, {"version": 1})
+    return _conditional(
+        _etag(found.get("version", 0)),
+        lambda: _expense_page(ExpenseModel._group_filter(found["_id"]), fields)
+    )
+
+
+@api_bp.route("/groups/<group_id>/settlements")
+def group_settlements(group_id):
+    found = _member_group(group_id, {"version": 1})
+    limit = _page_size()
+    return _conditional(_etag(found.get("version", 0)), lambda: {
+        "data": SettlementModel.get_for_group(found["_id"], limit)
+    })
+
+
+@api_bp.route("/groups/<group_id>/archive")
+def group_archive(group_id):
+    found = _member_group(group_id, {"version": 1})
+
+    def build():
+        snapshot = ArchiveModel.get_snapshot(found["_id"]) or {}
+        return {
+            "count": snapshot.get("count", 0),
+            "total": round(snapshot.get("total", 0.0), 2),
+            "through": snapshot.get("through"),
+            "months": [
+                {"month": b["month"], "count": b["count"], "total": round(b["total"], 2)}
+                for b in ArchiveModel.get_month_buckets(found["_id"])
+            ],
+        }
+
+    return _conditional(_etag(found.get("version", 0)), build)
+
+
+@api_bp.route("/expenses")
+def expenses():
+    """The caller's hot expenses. Archived ones are under /groups/<id>/archive."""
+    fields = _fields(EXPENSE_FIELDS)
+    user = UserModel.collection().find_one({"_id": ObjectId(g.api_user_id)}, {"version": 1}) or {}
+    # Group expenses bump their group's version, the others the creator's
+    versions = GroupModel.get_user_group_versions(g.api_user_id)
+    return _conditional(
+        _etag(user.get("version", 0), sorted(versions)),
+        lambda: _expense_page(ExpenseModel._user_expenses_filter(g.api_user_id), fields)
+    )
+
+
+@api_bp.route("/expenses/<expense_id>")
+def expense(expense_id):
+    fields = _fields(EXPENSE_FIELDS)
+    expense_oid = _object_id(expense_id)
+
+    # Only what the access check and the ETag need
+    head = None
+    for collection in (ExpenseModel.collection(), ArchiveModel.cold()):
+        head = collection.find_one({"_id": expense_oid}, {"group_id": 1, "created_by": 1})
+        if head:
+            break
+    if head is None:
+        _fail(404, "Expense not found")
+
+    if head.get("group_id"):
+        version = _member_group(head["group_id"], {"version": 1}).get("version", 0)
+    elif str(head.get("created_by")) == g.api_user_id:
+        version = (UserModel.get_user_by_ID(g.api_user_id) or {}).get("version", 0)
+    else:
+        _fail(404, "Expense not found")
+
+    return _conditional(_etag(version), lambda: expense_resource(ExpenseModel.get_by_id(expense_id), fields))
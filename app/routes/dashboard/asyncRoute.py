@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from flask import render_template, request, flash, redirect, url_for
+from ...models.asyncDB import AsyncReads
+from ..userAuth import get_session_user
+from .homeRoute import build_dashboard_context
+from .reportRoute import summarize_user_expenses
+
+logger = logging.getLogger(__name__)
+
+# Async twins of the heaviest read views. They are not registered on a
+# blueprint, create_app swaps them in for the sync endpoints when
+# ASYNC_VIEWS is on (needs flask[async]).
+ASYNC_VIEWS = {}
+
+
+def async_view(endpoint):
+    def decorator(fn):
+        ASYNC_VIEWS[endpoint] = fn
+        return fn
+    return decorator
+
+
+def init_async_views(app):
+    try:
+        import asgiref  # noqa: F401  flask needs it to run coroutine views
+    except ImportError:
+        logger.warning("ASYNC_VIEWS is on but asgiref is not installed, keeping sync views")
+        return
+
+    for endpoint, view in ASYNC_VIEWS.items():
+        if endpoint in app.view_functions:
+            app.view_functions[endpoint] = view
+    logger.info("Async views enabled for: %s", ", ".join(sorted(ASYNC_VIEWS)))
+
+
+# --------------------------------------------------------
+# DASHBOARD
+# --------------------------------------------------------
+async def _safe_total(coro):
+    try:
+        return float(await coro or 0)
+    except Exception:
+        return 0
+
+
+@async_view("home.dashboard")
+async def dashboard():
+    user_session = get_session_user()
+    if not user_session:
+        return render_template(
+            "user_auth/login.html",
+            message="Please login first.",
+            category="error"
+        )
+
+    user_id = str(user_session["user_id"])
+
+    # Everything below only depends on user_id, so it goes out in one wave
+    try:
+        (current_user, users, groups, raw_transactions, raw_active_groups,
+         monthly_data, total_owed, total_owes) = await asyncio.gather(
+            AsyncReads.get_user_by_ID(user_id),
+            AsyncReads.get_all_active_users_except(user_id),
+            AsyncReads.get_user_groups_with_users(user_id),
+            AsyncReads.get_expenses_for_user(user_id),
+            AsyncReads.get_most_active_groups_for_user(user_id, limit=3),
+            AsyncReads.get_monthly_expenses_for_user(user_id),
+            _safe_total(AsyncReads.get_total_owed_to_user(user_id)),
+            _safe_total(AsyncReads.get_total_user_owes(user_id)),
+        )
+    except Exception:
+        logger.exception("Async dashboard load failed for %s", user_id)
+        flash("Unable to load user data.", "error")
+        return redirect(url_for("user_auth.login"))
+
+    # Second wave: balances of the active groups
+    groups_map = {str(g["_id"]): g for g in groups or []}
+    active = [groups_map[str(g["_id"])] for g in raw_active_groups or [] if str(g["_id"]) in groups_map]
+    balances = await asyncio.gather(*[AsyncReads.member_balances(g) for g in active])
+    group_balances = {str(g["_id"]): b for g, b in zip(active, balances)}
+
+    context = build_dashboard_context(
+        user_id, current_user, users or [], groups or [], raw_transactions or [],
+        raw_active_groups or [], monthly_data or [], total_owed, total_owes, group_balances
+    )
+    return render_template("dashboard/dashboard.html", **context)
+
+
+# --------------------------------------------------------
+# EXPENSE SUMMARY REPORT
+# --------------------------------------------------------
+@async_view("reports.report_summary")
+async def report_summary():
+    user_id = request.args.get("user_id")
+
+    if not user_id:
+        return "User not found", 400
+
+    user_id = str(user_id)
+    groups = await AsyncReads.get_user_groups(user_id)
+
+    # One query per group, issued concurrently instead of back to back
+    per_group = await asyncio.gather(*[
+        AsyncReads.get_expenses_for_group(str(g["_id"]), include_archived=True) for g in groups
+    ])
+
+    return summarize_user_expenses(
+        (e for expenses in per_group for e in expenses), user_id
+    )
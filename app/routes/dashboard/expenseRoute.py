@@ -1,8 +1,9 @@
 # expenseRoute.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from ...models.expenseModel import ExpenseModel
 from ...models.userModel import UserModel
 from ...models.groupModel import GroupModel
+from ...models.archiveModel import ArchiveModel
 from ..userAuth import get_session_user
 from datetime import datetime
 
@@ -45,9 +46,14 @@ def expenses():
 
     user_id = str(current_user["_id"])
 
-    expenses = ExpenseModel.get_expenses_for_user(user_id)
-    users = {str(u["_id"]): u for u in UserModel.get_all_users()}
-    groups = {str(g["_id"]): g for g in GroupModel.get_all_groups()}
+    results = current_app.query_executor.gather({
+        "expenses": (ExpenseModel.get_expenses_for_user, user_id),
+        "users": (UserModel.get_all_users,),
+        "groups": (GroupModel.get_all_groups,),
+    })
+    expenses = results["expenses"]
+    users = {str(u["_id"]): u for u in results["users"]}
+    groups = {str(g["_id"]): g for g in results["groups"]}
 
     return render_template("dashboard/expenses.html",
                            expenses=expenses,
@@ -72,50 +78,19 @@ def create_expense():
     current_user_id = str(session_user["user_id"])
     current_user = UserModel.get_user_by_ID(current_user_id)
 
-    # 🔒 Ensure safe Jinja rendering
-    current_user["_id"] = str(current_user["_id"])
-
     # =========================
     # GET REQUEST
     # =========================
     if request.method == "GET":
+        # ObjectIds and datetimes go straight through tojson (see utils/json_provider.py)
         groups = GroupModel.get_user_groups(current_user_id)
-        users = UserModel.get_all_users()
-
-        # ✅ Sanitize groups for Jinja + tojson
-        sanitized_groups = []
-        for g in groups:
-            g["_id"] = str(g["_id"])
-
-            # group_members may contain ObjectId
-            members = []
-            for m in g.get("group_members", []):
-                members.append(str(m))
-
-            g["group_members"] = members
-
-            # OPTIONAL: if you store populated objects
-            if "group_members_objects" in g:
-                clean_objects = []
-                for u in g["group_members_objects"]:
-                    u["_id"] = str(u["_id"])
-                    clean_objects.append(u)
-                g["group_members_objects"] = clean_objects
-
-            sanitized_groups.append(g)
-
-        # ✅ Sanitize users
-        sanitized_users = []
-        for u in users:
-            u["_id"] = str(u["_id"])
-            if u["_id"] != current_user_id:
-                sanitized_users.append(u)
+        users = [u for u in UserModel.get_all_users() if str(u["_id"]) != current_user_id]
 
         return render_template(
             "dashboard/create_expense.html",
             current_user=current_user,
-            groups=sanitized_groups,
-            users=sanitized_users,
+            groups=groups,
+            users=users,
             form_step=1
         )
 
@@ -309,7 +284,6 @@ def view_expense(expense_id):
 
     # Fetch expense
     exp = ExpenseModel.get_by_id(expense_id)
-    print(exp)
     if not exp:
         flash("Expense not found.", "error")
         return redirect(url_for("expense.expenses"))
@@ -332,40 +306,8 @@ def view_expense(expense_id):
     # -----------------------------
     # 2️⃣ BUILD ACTUAL WHO-OWES-WHOM
     # -----------------------------
-    split_details = []
-
-    # list of (uid, net) pairs
     nets = {uid: float(data["net_balance"]) for uid, data in exp["final_split"].items()}
-
-    # creditors = +ve balance  
-    # debtors = -ve balance  
-    creditors = [(uid, amt) for uid, amt in nets.items() if amt > 0]
-    debtors   = [(uid, amt) for uid, amt in nets.items() if amt < 0]
-
-    # Match debtors → creditors
-    ci = 0
-    di = 0
-
-    while di < len(debtors) and ci < len(creditors):
-        debtor, d_amt = debtors[di]
-        creditor, c_amt = creditors[ci]
-
-        pay_amount = min(-d_amt, c_amt)
-
-        split_details.append({
-            "from_user": debtor,
-            "to_user": creditor,
-            "amount": pay_amount
-        })
-
-        # update balances
-        nets[debtor] += pay_amount
-        nets[creditor] -= pay_amount
-
-        if nets[debtor] == 0:
-            di += 1
-        if nets[creditor] == 0:
-            ci += 1
+    split_details = ExpenseModel.settle_debts(nets)
 
     # -----------------------------
     # 3️⃣ SUMMARY FOR CURRENT USER
@@ -401,6 +343,11 @@ def view_expense(expense_id):
 # ---------------------------------------------------------
 @expense_bp.route("/expense/delete/<expense_id>", methods=["POST"])
 def delete_expense(expense_id):
-    ExpenseModel.delete_expense(expense_id)
-    flash("Expense deleted!", "success")
+    if ExpenseModel.delete_expense(expense_id):
+        flash("Expense deleted!", "success")
+    elif ArchiveModel.is_archived(expense_id):
+        # Already summed into the archive totals (see archiveModel.py)
+        flash("Archived expenses can't be deleted.", "error")
+    else:
+        flash("Expense not found.", "error")
     return redirect(url_for("expense.expenses"))
@@ -1,15 +1,24 @@
-from flask import Blueprint, request, render_template, redirect, url_for, flash
+from flask import Blueprint, request, render_template, redirect, url_for, flash, current_app, Response
 from ...models.groupModel import GroupModel
 from ..userAuth import get_session_user
 from ...models.userModel import UserModel
 from ...models.expenseModel import ExpenseModel
+from ...models.archiveModel import ArchiveModel
+from ...models.settlementModel import SettlementModel
 from ...utils.mailer import send_email
 import urllib.parse
-from ...utils.save_photo import save_group_photo
+from ...utils.save_photo import save_group_photo, thumbnail_url
+from ...utils.cache import fragment_cache, fragment_key
+from ...utils.live import live_broker, sse_frame
+from ...utils.serialize import encode_cursor, decode_cursor, parse_datetime
+from bson import ObjectId
 from datetime import datetime
+import logging
 
 group_bp = Blueprint("group", __name__, template_folder="templates/dashboard/groups")
 
+logger = logging.getLogger(__name__)
+
 
 # ------------- CREATE GROUP (now sends invites) -------------
 @group_bp.route('/groups/create', methods=['GET', 'POST'])
@@ -77,7 +86,7 @@ def create_group():
             ok, err = send_email(user.get("email"), subject, html_body=html_body, plain_body=plain_body)
             if not ok:
                 # Log or flash — do not break group creation
-                print(f"Failed to send invite to {user.get('email')}: {err}")
+                logger.warning("Failed to send invite to %s: %s", user.get('email'), err)
 
         flash("Group created and invites sent (if emails available).", "success")
         return redirect(url_for("group.list_groups"))
@@ -96,39 +105,157 @@ def list_groups():
     try:
         current_user = UserModel.get_user_by_ID(user_session["user_id"])
     except Exception as e:
-        print(e)
+        logger.exception(e)
         flash("Unable to load user data.", "error")
         return redirect(url_for("user_auth.login"))
 
-    groups = GroupModel.get_user_groups_with_users(user_session["user_id"])
     current_user_id = str(user_session["user_id"])
+    next_cursor = None
+    if current_app.config["MEMBERSHIP_READS"]:
+        # One page at a time, most recently active first, no member arrays
+        groups, after = GroupModel.get_user_groups_recent(
+            current_user_id, current_app.config["GROUPS_PAGE_SIZE"], _groups_cursor(request.args.get("cursor")),
+            with_users=False
+        )
+        if after:
+            next_cursor = encode_cursor(a=after[0].isoformat(), g=str(after[1]))
+    else:
+        groups = GroupModel.get_user_groups_with_users(current_user_id, with_users=False)
+
+    # Member avatars are only read for the cards that aren't cached
+    uncached = [
+        group for group in groups
+        if fragment_key("group-card", group["_id"], group.get("version", ""), current_user_id) not in fragment_cache
+    ]
+    if uncached:
+        GroupModel.attach_preview_users(uncached, 5, {"username": 1, "profile_pic": 1})
 
     # Compute total_balance for each group for current user
     for group in groups:
-        member_balances = compute_member_balances(group['_id'])
+        member_balances = cached_member_balances(group)
         group['total_balance'] = member_balances.get(current_user_id, 0.0)
 
     return render_template(
         "dashboard/groups.html",
         groups=groups,
         current_user=current_user,
-        current_user_id=current_user_id
+        current_user_id=current_user_id,
+        next_cursor=next_cursor
     )
 
+
+def _groups_cursor(token):
+    """(last_activity, group_id) from ?cursor=, None (first page) when missing or tampered with."""
+    if not token:
+        return None
+    try:
+        values = decode_cursor(token)
+        if not ObjectId.is_valid(str(values.get("g"))):
+            return None
+        return parse_datetime(values["a"]), ObjectId(values["g"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
 # Helper function to compute net balance per member in a group
 def compute_member_balances(group_id):
-    balances = {}
-    expenses = list(
-        ExpenseModel.collection().find({"group_id": str(group_id)})
+    # Latest balance checkpoint + what was written after it
+    return SettlementModel.compute_balances(group_id)
+
+
+def cached_member_balances(group):
+    """Balances only change when an expense write bumps the group's version."""
+    return fragment_cache.get_or_set(
+        ("balances", str(group["_id"]), group.get("version", 0)),
+        lambda: compute_member_balances(group["_id"])
+    )
+
+
+def cached_group_page(group):
+    """
+    The parts of the group page that are the same for every member. A hit
+    skips the expense, archive, settlement and user reads, not just the
+    rendering of the fragments built from them.
+    """
+    return fragment_cache.get_or_set(
+        ("group-page", str(group["_id"]), group.get("version", 0)),
+        lambda: _group_page_data(group)
     )
+
+
+def _group_page_data(group):
+    group_id = group["_id"]
+    preview_ids = [str(uid) for uid in group.get("member_preview", [])]
+
+    # Recent expenses; older ones are pre-summed in the archive snapshot
+    expenses = ExpenseModel.get_expenses_for_group(group_id)
+    snapshot = ArchiveModel.get_snapshot(group_id) or {}
+    archived = ArchiveModel.snapshot_users(snapshot)
+    archived_months = ArchiveModel.get_month_buckets(group_id) if snapshot else []
+    settlements = SettlementModel.get_for_group(group_id)
+
+    # Totals start from the archived ones; net balances also include settlements
+    member_balances = cached_member_balances(group)  # net balance per member
+    payment_tracker = {uid: s["paid"] for uid, s in archived.items()}  # total paid per member
+    total_expenses = round(snapshot.get("total", 0.0), 2)
+
+    # Store share holding per user
+    share_holding_map = {}
+
     for expense in expenses:
+        amount = float(expense.get("amount", 0))
+        total_expenses += amount
         fs = expense.get("final_split", {})
+
         for uid, data in fs.items():
             uid = str(uid)
-            balances[uid] = balances.get(uid, 0.0) + float(data.get("net_balance", 0.0))
-    return balances
+            paid = float(data.get("paid", 0))
+            should_pay = float(data.get("should_pay", 0))
+
+            payment_tracker[uid] = payment_tracker.get(uid, 0.0) + paid
+
+            # share holding
+            if amount > 0:
+                share_holding_map[uid] = round((should_pay / amount) * 100, 0)
+
+    # Users map: the members shown, the creator and everyone in a settlement
+    named = set(preview_ids) | {str(group["created_by"])}
+    named |= {str(s.get(k)) for s in settlements for k in ("from_user", "to_user")}
+    users_map = UserModel.get_users_by_ids(named)
+
+    # Build members list for UI
+    members = []
+    for uid in preview_ids:
+        if uid in users_map:
+            u = users_map[uid]
+            members.append({
+                "id": uid,
+                "name": u.get("full_name") or u.get("username") or "Unknown",
+                "email": u.get("email"),
+                "profile_pic": u.get("profile_pic"),
+                "joined_at": u.get("created_at"),
+                "role": "Creator" if uid == str(group["created_by"]) else "Member",
+            })
+
+    return {
+        "preview_ids": preview_ids,
+        "expenses": expenses,
+        "expenses_count": snapshot.get("count", 0) + len(expenses),
+        "archived_months": archived_months,
+        "settlements": settlements,
+        "member_balances": member_balances,
+        "payment_tracker": payment_tracker,
+        "share_holding_map": share_holding_map,
+        "total_expenses": total_expenses,
+        "users_map": users_map,
+        "members": members,
+    }
+
 
 
+@group_bp.app_template_filter('thumbnail')
+def thumbnail_filter(photo, size=64):
+    return thumbnail_url(photo, size)
+
 
 @group_bp.app_template_filter('datetimeformat')
 def datetimeformat(value, format="%d %b"):
@@ -165,114 +292,99 @@ def group_details(group_id):
         flash("Unable to load user data.", "error")
         return redirect(url_for("user_auth.login"))
 
-    # Load group
-    group = GroupModel.find_by_id(group_id)
+    # Load group: its counts and a preview of the members, not the member array
+    group = GroupModel.find_summary(group_id)
     if not group:
         return "Group not found", 404
 
-    # Users map
-    users_map = {str(u["_id"]): u for u in UserModel.get_all_users()}
     current_user_id = str(user_session["user_id"])
+    page = cached_group_page(group)
+    preview_ids = page["preview_ids"]
+    member_count = GroupModel.member_count(group)
+    more_members = max(0, member_count - len(preview_ids))
+    member_balances = page["member_balances"]
+    payment_tracker = page["payment_tracker"]
+    share_holding_map = page["share_holding_map"]
 
-    # Build members list for UI
-    members = []
-    for uid in group.get("group_members", []):
-        uid = str(uid)
-        if uid in users_map:
-            u = users_map[uid]
-            members.append({
-                "id": uid,
-                "name": u.get("full_name") or u.get("username"),
-                "email": u.get("email"),
-                "profile_pic": u.get("profile_pic"),
-                "joined_at": u.get("created_at"),
-                "role": "Creator" if uid == str(group["created_by"]) else "Member",
-            })
+    final_split_current_user = member_balances.get(current_user_id, 0.0)
 
+    # Who owes whom, largest amounts first; only the first MEMBER_PREVIEW_SIZE get a name
+    shown = current_app.config["MEMBER_PREVIEW_SIZE"]
+    owes_you_ids, you_owe_ids = [], []
+    for uid, balance in member_balances.items():
+        if uid == current_user_id:
+            continue
+        if balance < 0 and final_split_current_user > 0:
+            owes_you_ids.append(uid)
+        elif balance > 0 and final_split_current_user < 0:
+            you_owe_ids.append(uid)
+    owes_you_ids.sort(key=lambda uid: member_balances[uid])
+    you_owe_ids.sort(key=lambda uid: -member_balances[uid])
+
+    # Users map: the cached one covers the members shown; only the people
+    # this user owes or is owed by may still need reading
+    users_map = dict(page["users_map"])
+    if current_user:
+        users_map.setdefault(current_user_id, current_user)
+    missing = (set(owes_you_ids[:shown]) | set(you_owe_ids[:shown])) - users_map.keys()
+    if missing:
+        users_map.update(UserModel.get_users_by_ids(missing))
+
+    def name_of(uid):
+        u = users_map.get(uid) or {}
+        return u.get("full_name") or u.get("username") or "Unknown"
+
+    members = page["members"]
     creator = users_map.get(str(group["created_by"]))
 
-    # Load all expenses
-    expenses = list(
-        ExpenseModel.collection()
-        .find({"group_id": str(group_id)})
-        .sort("created_at", -1)
-    )
-
-    # Compute balances
-    member_balances = {}  # net balance per member
-    payment_tracker = {}  # total paid per member
-    total_expenses = 0.0
-
-    # Store share holding per user
-    share_holding_map = {}
-
-    for expense in expenses:
-        amount = float(expense.get("amount", 0))
-        total_expenses += amount
-        fs = expense.get("final_split", {})
-        custom_shares = expense.get("custom_shares", {})
-
-        for uid, data in fs.items():
-            uid = str(uid)
-            paid = float(data.get("paid", 0))
-            net_balance = float(data.get("net_balance", 0))
-            should_pay = float(data.get("should_pay", 0))
-
-            payment_tracker[uid] = payment_tracker.get(uid, 0.0) + paid
-            member_balances[uid] = member_balances.get(uid, 0.0) + net_balance
-
-            # share holding
-            if amount > 0:
-                share_holding_map[uid] = round((should_pay / amount) * 100, 0)
-
-    final_split_current_user = member_balances.get(current_user_id, 0.0)
-
     # -----------------------------------------------------------
     # PAYMENT BREAKDOWN
     # -----------------------------------------------------------
     payment_breakdown = []
-    for uid in group.get("group_members", []):
-        uid = str(uid)
-        name = "You" if uid == current_user_id else users_map[uid].get("full_name") or users_map[uid].get("username")
+    for uid in preview_ids:
+        name = "You" if uid == current_user_id else name_of(uid)
         payment_breakdown.append(f"{name} paid ₹{payment_tracker.get(uid, 0.0):.2f}")
+    if more_members:
+        payment_breakdown.append(f"…and {more_members} more members")
 
     # -----------------------------------------------------------
     # SHARE HOLDING
     # -----------------------------------------------------------
     share_holding = []
-    for uid in group.get("group_members", []):
-        uid = str(uid)
-        name = "You" if uid == current_user_id else users_map[uid].get("full_name") or users_map[uid].get("username")
+    for uid in preview_ids:
+        name = "You" if uid == current_user_id else name_of(uid)
         share = share_holding_map.get(uid, 0)
         share_holding.append(f"{name} {share:.0f}%")
+    if more_members:
+        share_holding.append(f"…and {more_members} more members")
 
     # -----------------------------------------------------------
     # WHO OWES WHOM
     # -----------------------------------------------------------
-    owes_you = []
-    you_owe = []
-
-    for uid, balance in member_balances.items():
-        if uid == current_user_id:
-            continue
-        name = users_map[uid].get("full_name") or users_map[uid].get("username")
-        if balance < 0 and final_split_current_user > 0:
-            owes_you.append({"name": name, "amount": abs(balance)})
-        elif balance > 0 and final_split_current_user < 0:
-            you_owe.append({"name": name, "amount": balance})
+    owes_you = [{"id": uid, "name": name_of(uid), "amount": abs(member_balances[uid])} for uid in owes_you_ids[:shown]]
+    you_owe = [{"id": uid, "name": name_of(uid), "amount": member_balances[uid]} for uid in you_owe_ids[:shown]]
+    owes_you_more = len(owes_you_ids) - len(owes_you)
+    you_owe_more = len(you_owe_ids) - len(you_owe)
 
     # -----------------------------------------------------------
     # FINAL SETTLEMENT MESSAGE
     # -----------------------------------------------------------
     if final_split_current_user > 0:
         settlement_message = f"You will RECEIVE ₹{final_split_current_user:.2f} from " + \
-                             ", ".join([o["name"] for o in owes_you])
+                             ", ".join([o["name"] for o in owes_you]) + \
+                             (f" and {owes_you_more} others" if owes_you_more else "")
     elif final_split_current_user < 0:
         settlement_message = f"You need to PAY ₹{abs(final_split_current_user):.2f} to " + \
-                             ", ".join([o["name"] for o in you_owe])
+                             ", ".join([o["name"] for o in you_owe]) + \
+                             (f" and {you_owe_more} others" if you_owe_more else "")
     else:
         settlement_message = "You are all settled up!"
 
+    # Settle-up choices: the members shown plus whoever the user owes or is owed by
+    settle_members = [{"id": m["id"], "name": m["name"]} for m in members]
+    listed = {m["id"] for m in members}
+    settle_members += [{"id": o["id"], "name": o["name"]} for o in owes_you + you_owe if o["id"] not in listed]
+
     # -----------------------------------------------------------
     # RENDER TEMPLATE
     # -----------------------------------------------------------
@@ -280,10 +392,15 @@ def group_details(group_id):
         "dashboard/group_detail.html",
         group=group,
         members=members,
+        member_count=member_count,
+        more_members=more_members,
+        settle_members=settle_members,
         creator=creator,
-        total_expenses=total_expenses,
-        expenses_count=len(expenses),
-        expenses=expenses,
+        total_expenses=page["total_expenses"],
+        expenses_count=page["expenses_count"],
+        expenses=page["expenses"],
+        archived_months=page["archived_months"],
+        settlements=page["settlements"],
         users_map=users_map,
         current_user=current_user,
         current_user_id=current_user_id,
@@ -293,10 +410,98 @@ def group_details(group_id):
         share_holding=share_holding,
         owes_you=owes_you,
         you_owe=you_owe,
+        owes_you_more=owes_you_more,
+        you_owe_more=you_owe_more,
         final_split=final_split_current_user,
         settlement_message=settlement_message
     )
 
+# ------------- SETTLE UP -------------
+@group_bp.route("/groups/<group_id>/settle", methods=["POST"])
+def settle_up(group_id):
+    user_session = get_session_user()
+    if not user_session:
+        flash("Please login first.", "error")
+        return redirect(url_for("user_auth.login"))
+
+    if not ObjectId.is_valid(group_id) or not GroupModel.collection().find_one({"_id": ObjectId(group_id)}, {"_id": 1}):
+        return "Group not found", 404
+
+    current_user_id = str(user_session["user_id"])
+    from_user = request.form.get("from_user") or current_user_id
+    to_user = request.form.get("to_user")
+
+    try:
+        amount = round(float(request.form.get("amount", 0)), 2)
+    except ValueError:
+        amount = 0
+
+    # Matched against the member array in the query, never loaded
+    parties = (current_user_id, from_user, to_user)
+    if not all(ObjectId.is_valid(str(p)) for p in parties) or not GroupModel.is_member(group_id, *parties):
+        flash("Both people must be members of the group.", "error")
+    elif from_user == to_user:
+        flash("Pick two different members.", "error")
+    elif amount <= 0:
+        flash("Enter an amount greater than zero.", "error")
+    else:
+        SettlementModel.record_settlement(
+            group_id, from_user, to_user, amount,
+            created_by=current_user_id,
+            note=(request.form.get("note") or "").strip()
+        )
+        flash("Settlement recorded.", "success")
+
+    return redirect(url_for("group.group_details", group_id=group_id))
+
+
+# ------------- LIVE BALANCES (Server-Sent Events) -------------
+@group_bp.route("/groups/<group_id>/live")
+def group_live(group_id):
+    user_session = get_session_user()
+    if not user_session:
+        return "Login required", 401
+
+    if current_app.config["LIVE_UPDATES"] == "off":
+        return "", 204  # tells EventSource not to reconnect
+
+    group = None
+    if ObjectId.is_valid(group_id):
+        group = GroupModel.is_member(group_id, user_session["user_id"], projection={"version": 1})
+    if not group:
+        return "Group not found", 404
+
+    version = group.get("version", 0)
+    balances = cached_member_balances(group)
+    subscription = live_broker.subscribe(group["_id"], version, balances)
+    heartbeat = current_app.config["LIVE_HEARTBEAT_SECONDS"]
+    encoder = current_app.json
+
+    def snapshot_frame(version, balances):
+        data = encoder.dumps_bytes({"version": version, "balances": balances, "removed": []})
+        return sse_frame(data, "snapshot", version)
+
+    def stream():
+        # Runs after the request is gone: no database, only the broker's frames
+        try:
+            yield b"retry: 5000\n" + snapshot_frame(version, balances)
+            while True:
+                frame = subscription.next(heartbeat)
+                if subscription.overflowed:
+                    # Fell behind: skip the missed deltas, send where things are now
+                    subscription.overflowed = False
+                    subscription.drain()
+                    frame = snapshot_frame(*live_broker.snapshot(subscription.group_id))
+                yield frame or b": keep-alive\n\n"
+        finally:
+            live_broker.unsubscribe(subscription)
+
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # nginx would otherwise hold frames back
+    })
+
+
 # ------------- JOIN WITH TOKEN (email invite link) -------------
 @group_bp.route("/group/join/<token>")
 def join_with_token(token):
@@ -371,16 +576,12 @@ def update_group(group_id):
         updated_title = request.form.get("group_title")
         updated_desc = request.form.get("group_description")
         photo_file = request.files.get("group_photo")
-        print("PHOTO_FILE---------------", photo_file)
 
         if photo_file and photo_file.filename != "":
             group_photo = save_group_photo(photo_file)
         else:
             group_photo = group.get("group_photo")
 
-        print("GROUP_PHOTOS---------------------", group_photo)
-
-
         update_data = {
             "group_title": updated_title,
             "group_description": updated_desc,
@@ -423,7 +624,7 @@ def update_group(group_id):
             plain_body = f"Join {group['group_title']}: {join_url}"
             ok, err = send_email(user.get("email"), subject, html_body=html_body, plain_body=plain_body)
             if not ok:
-                print("Invite send failed:", err)
+                logger.warning("Invite send failed: %s", err)
 
         flash("Group updated and invites (if any) sent.", "success")
         return redirect(url_for("group.list_groups"))
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, render_template, redirect, make_response, url_for, flash
+from flask import Blueprint, request, render_template, redirect, make_response, url_for, flash, current_app
 from ...models.userModel import UserModel
 from ...models.expenseModel import ExpenseModel
 from ...models.groupModel import GroupModel
@@ -7,7 +7,8 @@ from datetime import datetime, timedelta, timezone
 from ..userAuth import get_session_user
 import logging
 from ...utils.detact_device import get_readable_device
-from .groupRoute import compute_member_balances
+from .groupRoute import cached_member_balances
+from ...utils.query_executor import QueryTimeout
 
 home_bp = Blueprint("home", __name__, template_folder="templates")
 
@@ -62,14 +63,59 @@ def dashboard():
         flash("Unable to load user data.", "error")
         return redirect(url_for("user_auth.login"))
 
-    # Fetch all active users and groups
-    users = UserModel.get_all_active_users_except(user_id) or []
-    users_map = { str(u["_id"]): u for u in users }
-    groups = GroupModel.get_user_groups_with_users(user_id) or []
+    # The reads below don't depend on each other, run them side by side
+    executor = current_app.query_executor
+    try:
+        results = executor.gather({
+            "users": (UserModel.get_all_active_users_except, user_id),
+            "groups": (GroupModel.get_user_groups_with_users, user_id),
+            "transactions": (ExpenseModel.get_expenses_for_user, user_id),
+            "active_groups": (ExpenseModel.get_most_active_groups_for_user, user_id, 3),
+            "monthly": (ExpenseModel.get_monthly_expenses_for_user, user_id),
+            "total_owed": (_total_or_zero, ExpenseModel.get_total_owed_to_user, user_id),
+            "total_owes": (_total_or_zero, ExpenseModel.get_total_user_owes, user_id),
+        })
+    except QueryTimeout:
+        return "Dashboard is taking too long to load, please try again.", 503
+
+    users = results["users"] or []
+    groups = results["groups"] or []
+    raw_transactions = results["transactions"] or []
+    raw_active_groups = results["active_groups"] or []
+    monthly_data = results["monthly"] or []
+    total_owed = results["total_owed"]
+    total_owes = results["total_owes"]
+
+    # Second wave: balances of the active groups
+    groups_map = {str(g["_id"]): g for g in groups}
+    active = [groups_map[str(g["_id"])] for g in raw_active_groups if str(g["_id"]) in groups_map]
+    try:
+        group_balances = executor.gather({
+            str(g["_id"]): (cached_member_balances, g) for g in active
+        })
+    except QueryTimeout:
+        return "Dashboard is taking too long to load, please try again.", 503
+
+    context = build_dashboard_context(
+        user_id, current_user, users, groups, raw_transactions,
+        raw_active_groups, monthly_data, total_owed, total_owes, group_balances
+    )
+    return render_template("dashboard/dashboard.html", **context)
+
+
+def _total_or_zero(fn, user_id):
+    try:
+        return float(fn(user_id) or 0)
+    except Exception:
+        return 0
+
+
+def build_dashboard_context(user_id, current_user, users, groups, raw_transactions,
+                            raw_active_groups, monthly_data, total_owed, total_owes, group_balances):
+    """Shared by the sync dashboard and the async one in asyncRoute."""
     groups_map = { str(g["_id"]): g for g in groups }
 
     # Recent transactions (last 10)
-    raw_transactions = ExpenseModel.get_expenses_for_user(user_id) or []
     transactions = []
     for tx in raw_transactions:
         group_name = None
@@ -86,10 +132,9 @@ def dashboard():
             "payer_id": str(tx.get("created_by")) if tx.get("created_by") else None
         })
 
-    # Recent expenses (for sidebar)
-    raw_recent_expenses = ExpenseModel.get_expenses_for_user(user_id) or []
+    # Recent expenses (for sidebar), same query as the transactions
     recent_expenses = []
-    for exp in raw_recent_expenses:
+    for exp in raw_transactions:
         group_details = None
         if exp.get("group_id"):
             g = groups_map.get(str(exp["group_id"]))
@@ -104,7 +149,6 @@ def dashboard():
         })
 
     # Most active groups
-    raw_active_groups = ExpenseModel.get_most_active_groups_for_user(user_id, limit=3) or []
     active_groups = []
 
     for g in raw_active_groups:
@@ -113,40 +157,27 @@ def dashboard():
         if not group_obj:
             continue
 
-        # compute current user's balance in this group
-        member_balances = compute_member_balances(g["_id"])
+        # current user's balance in this group
+        member_balances = group_balances.get(str(g["_id"]), {})
         balance = member_balances.get(str(user_id), 0.0)
 
         active_groups.append({
             "group_name": group_obj["group_title"],
-            "members": len(group_obj.get("group_members", [])),
+            "members": GroupModel.member_count(group_obj),
             "expense_count": g.get("expense_count") or 0,
             "balance": balance
         })
 
 
-    # Monthly aggregated expenses
-    monthly_data = ExpenseModel.get_monthly_expenses_for_user(user_id) or []
-
     # Extract actual month from "_id.month"
     months = [m["_id"].get("month", "") for m in monthly_data]
 
     # Extract correct amount
     monthly_expenses = [float(m.get("total_amount", 0)) for m in monthly_data]
 
-
-    # Total balances
-    try:
-        total_owed = float(ExpenseModel.get_total_owed_to_user(user_id) or 0)
-    except Exception:
-        total_owed = 0
-    try:
-        total_owes = float(ExpenseModel.get_total_user_owes(user_id) or 0)
-    except Exception:
-        total_owes = 0
     total_balance = total_owed - total_owes
 
-    context = {
+    return {
         "current_user": current_user,
         "current_user_id": user_id,
         "transactions": transactions,
@@ -161,5 +192,3 @@ def dashboard():
         "total_owes": total_owes,
         "active_page": "dashboard"
     }
-
-    return render_template("dashboard/dashboard.html", **context)
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, send_file, request
+from flask import Blueprint, render_template, request, flash, redirect, url_for, send_file, request, g, current_app
 from datetime import datetime
 from ...models.expenseModel import ExpenseModel
 from ...models.groupModel import GroupModel
@@ -12,6 +12,12 @@ from openpyxl.chart import BarChart, Reference, PieChart
 report_bp = Blueprint("reports", __name__, template_folder="templates")
 
 
+@report_bp.before_request
+def route_reads_to_secondaries():
+    # Reports scan a lot and tolerate slightly stale data
+    g.read_policy = "analytics"
+
+
 # --------------------------------------------------------
 # REPORTS HOME PAGE
 # --------------------------------------------------------
@@ -34,7 +40,7 @@ def reports_home():
         return redirect(url_for("user_auth.login"))
 
     # Get all user's expenses to determine year range
-    user_expenses = ExpenseModel.get_expenses_for_user(user_id)
+    user_expenses = ExpenseModel.get_expenses_for_user(user_id, include_archived=True)
     if user_expenses:
         years = [e["created_at"].year for e in user_expenses if e.get("created_at")]
         min_year = min(years)
@@ -71,37 +77,40 @@ def report_summary():
     user_id = str(user_id)
     groups = GroupModel.get_user_groups(user_id)
 
+    expenses = (
+        e
+        for g in groups
+        for e in ExpenseModel.get_expenses_for_group(str(g["_id"]), include_archived=True)
+    )
+    return summarize_user_expenses(expenses, user_id)
+
+
+def summarize_user_expenses(expenses, user_id):
     total_expense = 0
     total_paid = 0
     total_owe = 0
     total_owed = 0
 
-    # Loop through each group
-    for g in groups:
-
-        group_id = str(g["_id"])
-        expenses = ExpenseModel.get_expenses_for_group(group_id)
-
-        for e in expenses:
+    for e in expenses:
 
-            amount = float(e.get("amount", 0))
-            total_expense += amount
+        amount = float(e.get("amount", 0))
+        total_expense += amount
 
-            fs = e.get("final_split", {}) or {}
-            user_data = fs.get(user_id, {"paid": 0, "net_balance": 0})
+        fs = e.get("final_split", {}) or {}
+        user_data = fs.get(user_id, {"paid": 0, "net_balance": 0})
 
-            paid = float(user_data.get("paid", 0))
-            net_balance = float(user_data.get("net_balance", 0))
+        paid = float(user_data.get("paid", 0))
+        net_balance = float(user_data.get("net_balance", 0))
 
-            total_paid += paid
+        total_paid += paid
 
-            # Negative means YOU NEED TO PAY
-            if net_balance < 0:
-                total_owe += abs(net_balance)
+        # Negative means YOU NEED TO PAY
+        if net_balance < 0:
+            total_owe += abs(net_balance)
 
-            # Positive means YOU SHOULD RECEIVE
-            elif net_balance > 0:
-                total_owed += net_balance
+        # Positive means YOU SHOULD RECEIVE
+        elif net_balance > 0:
+            total_owed += net_balance
 
     return {
         "total_expenses": round(total_expense, 2),
@@ -124,30 +133,30 @@ def report_monthly():
     end = datetime(year, month + 1, 1) if month < 12 else datetime(year + 1, 1, 1)
 
     groups = GroupModel.get_user_groups(user_id)
-    expenses_list = []
 
-    for g in groups:
-        group_id = str(g["_id"])
-        expenses = ExpenseModel.get_expenses_for_group(group_id)
+    def expenses_list():
+        for group in groups:
+            group_id = str(group["_id"])
 
-        for e in expenses:
-            created_at = e.get("created_at")
-            if not created_at:
-                continue
+            for e in ExpenseModel.iter_expenses_for_group(group_id, include_archived=True):
+                created_at = e.get("created_at")
+                if not created_at:
+                    continue
 
-            if isinstance(created_at, str):
-                created_at = datetime.fromisoformat(created_at)
+                if isinstance(created_at, str):
+                    created_at = datetime.fromisoformat(created_at)
 
-            # Filter by month AND user
-            if start <= created_at < end and (user_id in e.get("split_with", []) or user_id == e.get("created_by")):
-                expenses_list.append({
-                    "group": g["group_title"],
-                    "title": e.get("title", "Untitled"),
-                    "amount": float(e.get("amount", 0)),
-                    "date": created_at.strftime("%d %b %Y")
-                })
+                # Filter by month AND user
+                if start <= created_at < end and (user_id in e.get("split_with", []) or user_id == e.get("created_by")):
+                    yield {
+                        "group": group["group_title"],
+                        "title": e.get("title", "Untitled"),
+                        "amount": float(e.get("amount", 0)),
+                        "date": created_at.strftime("%d %b %Y")
+                    }
 
-    return {"monthly_expenses": expenses_list}
+    # Encoded row by row as the cursors are read
+    return current_app.json.stream(expenses_list(), key="monthly_expenses")
 
 
 
@@ -169,44 +178,41 @@ def report_group(group_id):
     start = datetime(year, month, 1)
     end = datetime(year, month + 1, 1) if month < 12 else datetime(year + 1, 1, 1)
 
-    expenses = ExpenseModel.get_expenses_for_group(group_id)
-    formatted = []
+    def formatted():
+        for e in ExpenseModel.iter_expenses_for_group(group_id, include_archived=True):
+            created_at = e.get("created_at")
+            if not created_at:
+                continue
 
-    for e in expenses:
-        created_at = e.get("created_at")
-        if not created_at:
-            continue
+            if isinstance(created_at, str):
+                created_at = datetime.fromisoformat(created_at)
 
-        if isinstance(created_at, str):
-            created_at = datetime.fromisoformat(created_at)
+            # Filter by month
+            if not (start <= created_at < end):
+                continue
 
-        # Filter by month
-        if not (start <= created_at < end):
-            continue
+            # Calculate what the current user owes/should receive
+            fs = e.get("final_split", {}) or {}
+            user_data = fs.get(user_id, {"should_pay": 0, "paid": 0, "net_balance": 0})
+            owes = user_data["should_pay"] - user_data["paid"] if user_data["should_pay"] - user_data["paid"] > 0 else 0
+            owed = abs(user_data["should_pay"] - user_data["paid"]) if user_data["should_pay"] - user_data["paid"] < 0 else 0
 
-        # Calculate what the current user owes/should receive
-        fs = e.get("final_split", {}) or {}
-        user_data = fs.get(user_id, {"should_pay": 0, "paid": 0, "net_balance": 0})
-        owes = user_data["should_pay"] - user_data["paid"] if user_data["should_pay"] - user_data["paid"] > 0 else 0
-        owed = abs(user_data["should_pay"] - user_data["paid"]) if user_data["should_pay"] - user_data["paid"] < 0 else 0
-
-        formatted.append({
-            "title": e.get("title", "Untitled"),
-            "description": e.get("description", ""),
-            "amount": float(e.get("amount", 0)),
-            "created_at": created_at.strftime("%d %b %Y"),
-            "created_by": e.get("created_by"),
-            "split_with": e.get("split_with", []),
-            "custom_payments": e.get("custom_payments", {}),
-            "custom_shares": e.get("custom_shares", {}),
-            "you_owe": owes,
-            "you_are_owed": owed
-        })
+            yield {
+                "title": e.get("title", "Untitled"),
+                "description": e.get("description", ""),
+                "amount": float(e.get("amount", 0)),
+                "created_at": created_at.strftime("%d %b %Y"),
+                "created_by": e.get("created_by"),
+                "split_with": e.get("split_with", []),
+                "custom_payments": e.get("custom_payments", {}),
+                "custom_shares": e.get("custom_shares", {}),
+                "you_owe": owes,
+                "you_are_owed": owed
+            }
 
-    return {
-        "group_title": group["group_title"],
-        "expenses": formatted
-    }
+    return current_app.json.stream(
+        formatted(), key="expenses", envelope={"group_title": group["group_title"]}
+    )
 
 # -------------------------
 # HELPER FUNCTION TO CREATE EXCEL
@@ -282,8 +288,8 @@ def monthly_excel_report():
     expenses_data = []
     groups = GroupModel.get_user_groups(user_id)
 
-    for g in groups:
-        expenses = ExpenseModel.get_expenses_for_group(g["_id"])
+    for group in groups:
+        expenses = ExpenseModel.get_expenses_for_group(group["_id"], include_archived=True)
 
         for e in expenses:
             created_at = e.get("created_at")
@@ -308,7 +314,7 @@ def monthly_excel_report():
             owed = max(user_data.get("paid", 0) - user_data.get("should_pay", 0), 0)
 
             expenses_data.append({
-                "group": g["group_title"],
+                "group": group["group_title"],
                 "title": e.get("title", "Untitled"),
                 "amount": e.get("amount", 0),
                 "you_owe": owes,
@@ -351,8 +357,8 @@ def yearly_excel_report():
     expenses_data = []
     groups = GroupModel.get_user_groups(user_id)
 
-    for g in groups:
-        expenses = ExpenseModel.get_expenses_for_group(g["_id"])
+    for group in groups:
+        expenses = ExpenseModel.get_expenses_for_group(group["_id"], include_archived=True)
 
         for e in expenses:
             created_at = e.get("created_at")
@@ -376,7 +382,7 @@ def yearly_excel_report():
             owed = max(user_data.get("paid", 0) - user_data.get("should_pay", 0), 0)
 
             expenses_data.append({
-                "group": g["group_title"],
+                "group": group["group_title"],
                 "title": e.get("title", "Untitled"),
                 "amount": e.get("amount", 0),
                 "you_owe": owes,
@@ -7,6 +7,7 @@ from datetime import datetime, timedelta, timezone
 from ..userAuth import get_session_user
 import logging
 from ...utils.detact_device import get_readable_device
+from ...utils.save_photo import save_profile_photo
 
 settings_bp = Blueprint("settings", __name__, template_folder="templates")
 
@@ -73,27 +74,17 @@ def settings_profile():
             updates['full_name'] = full_name
 
         if profile_pic:
-            import os
-            upload_folder = "static/uploads/users_profile_pic"
-            os.makedirs(upload_folder, exist_ok=True)
-
-            filename = f"profile_{user_id}.png"
-            file_path = os.path.join(upload_folder, filename)
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            profile_pic.save(file_path)
-
-            updates['profile_pic'] = f"/{file_path.replace(os.sep, '/')}"
+            profile_pic_url = save_profile_photo(profile_pic)
+            if profile_pic_url:
+                updates['profile_pic'] = profile_pic_url
 
         if phone_no:
             updates['phone_no'] = phone_no
 
         if updates:
             try:
-                UserModel.collection().update_one(
-                    {"_id": current_user["_id"]},
-                    {"$set": updates}
-                )
+                UserModel.update_user(current_user["_id"], updates)
+                GroupModel.touch_user_groups(current_user["_id"])
                 flash("Profile updated successfully!", "success")
                 return redirect(url_for("settings.settings"))
             except Exception:
@@ -153,10 +144,8 @@ def settings_account():
         # Apply updates
         if updates:
             try:
-                UserModel.collection().update_one(
-                    {"_id": current_user["_id"]},
-                    {"$set": updates}
-                )
+                UserModel.update_user(current_user["_id"], updates)
+                GroupModel.touch_user_groups(current_user["_id"])
                 flash("Account updated successfully!", "success")
                 return redirect(url_for("settings.settings"))
             except Exception as e:
@@ -208,13 +197,13 @@ def settings_security():
                 flash("New passwords do not match.", "error")
                 return redirect(url_for("settings.settings"))
 
-            from werkzeug.security import check_password_hash, generate_password_hash
+            from ...utils.passwords import verify_password, hash_password
 
-            if not check_password_hash(current_user['password'], current_password):
+            if not verify_password(current_user['password'], current_password):
                 flash("Current password is incorrect.", "error")
                 return redirect(url_for("settings.settings"))
 
-            hashed_new_password = generate_password_hash(new_password)
+            hashed_new_password = hash_password(new_password)
 
             UserModel.collection().update_one(
                 {"_id": current_user["_id"]},
@@ -254,7 +243,7 @@ def settings_security():
         # 4️⃣ UPDATE SECURITY QUESTIONS
         # ------------------------------
         if action == "update_security_questions":
-            from werkzeug.security import generate_password_hash
+            from ...utils.passwords import hash_password
 
             security_questions = []
 
@@ -265,7 +254,7 @@ def settings_security():
                 if q and a:
                     security_questions.append({
                         "question": q,
-                        "answer_hash": generate_password_hash(a)
+                        "answer_hash": hash_password(a)
                     })
 
             UserModel.collection().update_one(
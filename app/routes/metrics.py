@@ -0,0 +1,52 @@
+from flask import Blueprint, Response, request, abort, jsonify
+from config import Config
+import time
+from ..models import GetDB
+from ..utils.instrumentation import metrics, pool_monitor
+from ..utils.cache import fragment_cache
+from ..utils.compression import compression_stats
+from ..utils.live import live_broker
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route('/metrics')
+def prometheus_metrics():
+    if Config.METRICS_TOKEN:
+        if request.headers.get("Authorization") != f"Bearer {Config.METRICS_TOKEN}":
+            abort(403)
+
+    for key, value in fragment_cache.stats().items():
+        metrics.set_gauge("splitwith_fragment_cache", value, {"stat": key})
+    for fragment, stats in fragment_cache.stats_by_fragment().items():
+        for key, value in stats.items():
+            metrics.set_gauge("splitwith_fragment_cache_by_fragment", value, {"fragment": fragment, "stat": key})
+    for key, value in compression_stats.items():
+        metrics.set_gauge("splitwith_compression", value, {"stat": key})
+    for key, value in live_broker.stats().items():
+        metrics.set_gauge("splitwith_live", value, {"stat": key})
+
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@metrics_bp.route('/healthz')
+def healthz():
+    started = time.perf_counter()
+    try:
+        GetDB._get_db().command("ping")
+        mongo_ok, error = True, None
+    except Exception as e:
+        mongo_ok, error = False, type(e).__name__
+    ping_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    pool = pool_monitor.snapshot()
+    body = {
+        "status": "ok" if mongo_ok else "unavailable",
+        "mongo": {"ok": mongo_ok, "ping_ms": ping_ms, "error": error},
+        "pool": {
+            **pool,
+            "max_size": Config.MONGO_MAX_POOL_SIZE,
+            "saturation": round(pool["in_use"] / Config.MONGO_MAX_POOL_SIZE, 3) if Config.MONGO_MAX_POOL_SIZE else None,
+        },
+    }
+    return jsonify(body), 200 if mongo_ok else 503
@@ -1,12 +1,17 @@
 from flask import Blueprint, request, render_template, flash, redirect, url_for, make_response, session
+from config import Config
 from ..models.userModel import UserModel
 from ..models.otpModel import OTPModel
+from ..models.pendingSignupModel import PendingSignupModel
 from .userAuth import SetAndGetSession
+from ..utils.rate_limit import rate_limit, form_field
 
 otp_bp = Blueprint("otp", __name__, template_folder="templates")
 
 
 @otp_bp.route('/verify-login-2FA', methods=["POST"])
+@rate_limit("otp_verify", "RATE_LIMIT_OTP_VERIFY")
+@rate_limit("otp_verify_account", "RATE_LIMIT_OTP_VERIFY_ACCOUNT", key=form_field("email"))
 def verify_login_2FA():
     email = request.form.get('email')
     otp = request.form.get('otp')
@@ -15,10 +20,9 @@ def verify_login_2FA():
         flash("Please enter the OTP.", "error")
         return render_template("user_auth/verify_login_2FA.html", email=email)
 
-    # Ensure OTP is number
-    try:
-        otp = int(otp)
-    except ValueError:
+    # Ensure OTP is a code of digits (kept as a string: codes can start with 0)
+    otp = otp.strip()
+    if not otp.isdigit() or len(otp) != Config.OTP_LENGTH:
         flash("Invalid OTP format.", "error")
         return render_template("user_auth/verify_login.html", email=email)
 
@@ -65,6 +69,8 @@ def verify_login_2FA():
 
 # ----------------------- VERIFY OTP -----------------------
 @otp_bp.route('/verify-otp', methods=["POST"])
+@rate_limit("otp_verify", "RATE_LIMIT_OTP_VERIFY")
+@rate_limit("otp_verify_account", "RATE_LIMIT_OTP_VERIFY_ACCOUNT", key=form_field("email"))
 def verify_otp():
     email = request.form.get('email')
     otp = request.form.get('otp')
@@ -73,37 +79,30 @@ def verify_otp():
         flash("Please enter the OTP.", "error")
         return render_template("user_auth/verify_otp.html", email=email)
 
-    try:
-        otp = int(otp)
-    except:
+    otp = otp.strip()
+    if not otp.isdigit() or len(otp) != Config.OTP_LENGTH:
         flash("Invalid OTP format.", "error")
         return render_template("user_auth/verify_otp.html", email=email)
 
     # Get stored signup data
-    pending_data = session.get("pending_signup")
-    if not pending_data:
+    pending = PendingSignupModel.get(session.get("pending_signup_token"))
+    if not pending or pending["email"] != (email or "").lower().strip():
         flash("Signup session expired. Please register again.", "error")
         return redirect(url_for("userAuth.signup"))
 
     # Verify OTP
-    success, message = OTPModel.verify_otp(email, otp)
+    success, message = OTPModel.verify_otp(pending["email"], otp)
     if not success:
         flash(message, "error")
         return render_template("user_auth/verify_otp.html", email=email)
 
-    # Create user only after OTP verification
-    UserModel.create_user(
-        email=pending_data["email"],
-        username=pending_data["username"],
-        full_name=pending_data["full_name"],
-        phone_no=pending_data["phone_no"],
-        password=pending_data["password"],
-    )
-
-    UserModel.set_verified(email)
+    # Create the verified user only after OTP verification (one insert)
+    user_id = PendingSignupModel.finalize(pending)
+    session.pop("pending_signup_token", None)
 
-    # Cleanup
-    session.pop("pending_signup", None)
+    if user_id is None:
+        flash("Username or Email already exists!", "error")
+        return redirect(url_for("userAuth.signup"))
 
     flash("Signup successful! You can now log in.", "success")
     return redirect(url_for("userAuth.login"))
@@ -112,6 +111,8 @@ def verify_otp():
 
 # ----------------------- RESEND OTP -----------------------
 @otp_bp.route('/resend-otp', methods=["POST"])
+@rate_limit("otp_resend", "RATE_LIMIT_OTP_RESEND")
+@rate_limit("otp_resend_account", "RATE_LIMIT_OTP_RESEND_ACCOUNT", key=form_field("email"))
 def resend_otp():
     email = request.form.get('email')
 
@@ -122,17 +123,13 @@ def resend_otp():
     # Resend OTP
     OTPModel.resend_otp(email)
 
-    # Carry hidden fields again
-    user_data = {
-        key: request.form.get(key)
-        for key in ['username', 'full_name', 'phone_no', 'password']
-    }
-
     flash("OTP resent successfully! Check your email.", "success")
-    return render_template("user_auth/verify_otp.html", email=email, **user_data)
+    return render_template("user_auth/verify_otp.html", email=email)
 
 # ----------------------- RESEND OTP -----------------------
 @otp_bp.route('/resend-otp/login_verification', methods=["POST"])
+@rate_limit("otp_resend", "RATE_LIMIT_OTP_RESEND")
+@rate_limit("otp_resend_account", "RATE_LIMIT_OTP_RESEND_ACCOUNT", key=form_field("email"))
 def resend_otp_verification():
     email = request.form.get('email')
 
@@ -0,0 +1,20 @@
+from flask import Blueprint, request, abort, jsonify
+from config import Config
+from ..utils.profiling import settings
+
+profiling_bp = Blueprint("profiling", __name__)
+
+
+@profiling_bp.route('/debug/profiling', methods=["GET", "POST"])
+def profiling_settings():
+    # Hidden entirely unless an admin token is configured
+    if not Config.PROFILING_ADMIN_TOKEN:
+        abort(404)
+    if request.headers.get("Authorization") != f"Bearer {Config.PROFILING_ADMIN_TOKEN}":
+        abort(403)
+
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        return jsonify(settings.update(data))
+
+    return jsonify(settings.as_dict())
@@ -1,17 +1,26 @@
 from flask import Blueprint, request, render_template, redirect, make_response, url_for, flash, session
 from ..models.userModel import UserModel
 from ..models.otpModel import OTPModel
+from ..models.pendingSignupModel import PendingSignupModel
 import jwt
 from config import Config
 from datetime import datetime, timedelta, timezone
-from werkzeug.security import check_password_hash
 from ..utils.detact_device import get_readable_device
+from ..utils.rate_limit import rate_limit, form_field
+from ..utils.passwords import hash_password, verify_password, needs_rehash
+from ..utils.background import submit_in_app
+from ..utils.instrumentation import metrics
+import logging
+import math
+
+logger = logging.getLogger(__name__)
 
 user_bp = Blueprint("userAuth", __name__, template_folder="templates")
 
 
 # ----------------------- SIGNUP -----------------------
 @user_bp.route('/auth/signup', methods=["POST", "GET"])
+@rate_limit("signup", "RATE_LIMIT_SIGNUP")
 def signup():
     if request.method == "POST":
 
@@ -36,24 +45,18 @@ def signup():
             return response
 
         # ❌ Duplicate check
-        if (
-            UserModel.find_by_email_or_username(email) or
-            UserModel.find_by_email_or_username(username)
-        ):
+        if UserModel.find_signup_conflict(email, username):
             flash("Username or Email already exists!", "error")
 
             response = make_response(render_template("user_auth/signup.html"))
             response.set_cookie("loading", "false", samesite="Lax")
             return response
 
-        # 🗃️ Store pending signup
-        session['pending_signup'] = {
-            "email": email,
-            "username": username,
-            "full_name": full_name,
-            "phone_no": phone_no,
-            "password": password
-        }
+        # 🗃️ Store pending signup server-side, the cookie only carries its token
+        session['pending_signup_token'] = PendingSignupModel.create(
+            email, username, full_name, phone_no, hash_password(password)
+        )
+        session.pop('pending_signup', None)  # payloads from before the server-side store
 
         # 🔐 Generate OTP
         otp = OTPModel.generate_otp(email)
@@ -121,6 +124,8 @@ def get_session_user():
 
 # ----------------------- LOGIN -----------------------
 @user_bp.route('/auth/login', methods=['GET', 'POST'])
+@rate_limit("login", "RATE_LIMIT_LOGIN")
+@rate_limit("login_account", "RATE_LIMIT_LOGIN_ACCOUNT", key=form_field("user_name_or_email"))
 def login():
 
     if get_session_user():
@@ -145,13 +150,38 @@ def login():
 
         user = UserModel.find_by_email_or_username(identifier)
 
-        if not user or not check_password_hash(user["password"], password):
+        # 🔒 Locked accounts are refused before any password hashing
+        locked_until = user.get("account_locked_until") if user else None
+        if locked_until and locked_until > datetime.utcnow():
+            minutes = math.ceil((locked_until - datetime.utcnow()).total_seconds() / 60)
+            flash(f"Too many failed attempts. Try again in {minutes} minute{'s' if minutes != 1 else ''}.", "error")
+
+            response = make_response(render_template("user_auth/login.html"))
+            response.set_cookie("loading", "false", samesite="Lax")
+            return response
+
+        if not user or not verify_password(user["password"], password):
+            if user:
+                counters = UserModel.record_failed_login(
+                    user["_id"], Config.LOGIN_MAX_FAILURES, Config.LOGIN_LOCKOUT_SECONDS
+                )
+                if counters and counters.get("account_locked_until") and counters["failed_login_attempts"] == 0:
+                    metrics.inc("splitwith_account_lockouts_total")
+                    logger.warning("Locked account %s after %d failed logins", user["_id"], Config.LOGIN_MAX_FAILURES)
             flash("Incorrect credentials!", "error")
 
             response = make_response(render_template("user_auth/login.html"))
             response.set_cookie("loading", "false", samesite="Lax")
             return response
 
+        UserModel.clear_failed_logins(user)
+
+        # 🔁 Hashed with an older method or cost: store it the current way,
+        # off the request (this is the only time the plain password is known)
+        if needs_rehash(user["password"]):
+            submit_in_app(UserModel.rehash_password, user["_id"], user["password"], password)
+            metrics.inc("splitwith_password_rehash_total")
+
         # 📱 Device tracking
         user_agent_string = request.headers.get("User-Agent")
         readable_device = get_readable_device(user_agent_string)
@@ -0,0 +1,174 @@
+import click
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+from flask import abort, current_app, request, send_file
+from werkzeug.security import safe_join
+from config import Config
+from .save_photo import is_content_addressed
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".html", ".json", ".txt", ".xml", ".ico", ".map"}
+PRECOMPRESS_MIN_BYTES = 1024
+
+# { absolute path: (mtime_ns, size, digest) }
+_fingerprints = {}
+
+
+def fingerprint(path):
+    """Content hash of a file, recomputed only when its mtime or size change."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    cached = _fingerprints.get(path)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(65536), b""):
+            h.update(chunk)
+    digest = h.hexdigest()[:20]
+
+    _fingerprints[path] = (st.st_mtime_ns, st.st_size, digest)
+    return digest
+
+
+def _static_path(filename):
+    path = safe_join(current_app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        return None
+    return path
+
+
+def add_static_fingerprint(endpoint, values):
+    """url_defaults hook: url_for('static', ...) gets ?v=<content hash>."""
+    if endpoint != "static" or "v" in values or not values.get("filename"):
+        return
+
+    path = _static_path(values["filename"])
+    if path:
+        values["v"] = fingerprint(path)
+
+
+def _accepted_encodings():
+    accepted = request.accept_encodings
+    encodings = []
+    if brotli is not None and accepted["br"]:
+        encodings.append(("br", ".br"))
+    if accepted["gzip"]:
+        encodings.append(("gzip", ".gz"))
+    return encodings
+
+
+def _fresh_variant(path, suffix):
+    """
+    A pre-compressed sibling written after the original was last changed;
+    one left over from before an edit would serve the old bytes under the
+    new digest's ETag (until precompress-assets runs again).
+    """
+    try:
+        return os.stat(path + suffix).st_mtime_ns >= os.stat(path).st_mtime_ns
+    except OSError:
+        return False
+
+
+def send_static(filename):
+    """
+    Replacement for Flask's static view. Fingerprinted and content-addressed
+    files are immutable; everything else revalidates through the strong ETag.
+    Conditional and Range requests are handled by send_file.
+    """
+    path = _static_path(filename)
+    if not path:
+        abort(404)
+
+    digest = fingerprint(path)
+    immutable = request.args.get("v") == digest or is_content_addressed(filename)
+    mimetype = None
+
+    send_path, etag, content_encoding = path, digest, None
+    for encoding, suffix in _accepted_encodings():
+        if _fresh_variant(path, suffix):
+            send_path = path + suffix
+            etag = f"{digest}-{encoding}"
+            content_encoding = encoding
+            mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            break
+
+    response = send_file(
+        send_path,
+        mimetype=mimetype,
+        conditional=True,
+        etag=etag,
+        max_age=Config.STATIC_IMMUTABLE_MAX_AGE if immutable else 0,
+    )
+
+    if content_encoding:
+        response.headers["Content-Encoding"] = content_encoding
+    response.vary.add("Accept-Encoding")
+
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+
+    return response
+
+
+def precompress_static(static_folder):
+    """
+    Write .gz (and .br when brotli is installed) siblings for compressible
+    assets. Returns (original_bytes, compressed_bytes) over the files touched.
+    """
+    original_total = compressed_total = 0
+
+    for root, _dirs, files in os.walk(static_folder):
+        for name in files:
+            ext = os.path.splitext(name)[1].lower()
+            if ext not in COMPRESSIBLE_EXTENSIONS:
+                continue
+
+            path = os.path.join(root, name)
+            with open(path, "rb") as fh:
+                data = fh.read()
+            if len(data) < PRECOMPRESS_MIN_BYTES:
+                continue
+
+            variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants[".br"] = brotli.compress(data)
+
+            for suffix, payload in variants.items():
+                # Only keep a variant that actually saves bytes
+                if len(payload) >= len(data):
+                    continue
+                with open(path + suffix, "wb") as fh:
+                    fh.write(payload)
+                original_total += len(data)
+                compressed_total += len(payload)
+
+    return original_total, compressed_total
+
+
+def init_assets(app):
+    app.url_defaults(add_static_fingerprint)
+    app.view_functions["static"] = send_static
+
+    @app.cli.command("precompress-assets")
+    def precompress_assets_command():
+        """Pre-compress static assets next to the originals."""
+        original, compressed = precompress_static(app.static_folder)
+        saved = original - compressed
+        click.echo(f"✅ Pre-compressed assets: {original} → {compressed} bytes ({saved} saved)")
@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    """
+    Shared worker pool for work that should not block the request thread.
+    Created lazily so every gunicorn worker gets its own pool after fork.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=Config.BACKGROUND_WORKERS,
+            thread_name_prefix="splitwith-bg"
+        )
+    return _executor
+
+
+def _log_failure(future):
+    exc = future.exception()
+    if exc is not None:
+        logger.error("Background task failed: %s", exc, exc_info=exc)
+
+
+def submit(fn, *args, **kwargs):
+    future = get_executor().submit(fn, *args, **kwargs)
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def submit_in_app(fn, *args, **kwargs):
+    """submit() for tasks that talk to the database: runs fn inside an app context."""
+    from flask import current_app
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            return fn(*args, **kwargs)
+
+    return submit(run)
@@ -0,0 +1,121 @@
+from collections import OrderedDict, defaultdict
+from markupsafe import Markup
+from config import Config
+import threading
+import time
+
+
+class FragmentCache:
+    """
+    Small in-process LRU keyed by tuples that embed data version stamps.
+    A write bumps the version on the group/user document, so stale entries
+    are never read again and simply age out of the LRU.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self.bytes_served = 0
+        # The same counters per fragment name (the first part of the key)
+        self._by_fragment = defaultdict(lambda: {"hits": 0, "misses": 0, "seconds_saved": 0.0, "bytes_served": 0})
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at, cost = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            served = len(value) if isinstance(value, str) else 0
+            fragment = self._by_fragment[_fragment_name(key)]
+            self.hits += 1
+            self.seconds_saved += cost
+            self.bytes_served += served
+            fragment["hits"] += 1
+            fragment["seconds_saved"] += cost
+            fragment["bytes_served"] += served
+            return value
+
+    def __contains__(self, key):
+        """A live entry for key; unlike get(), not counted as a hit."""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[1] >= time.monotonic()
+
+    def set(self, key, value, cost=0.0, ttl=None):
+        expires_at = time.monotonic() + (ttl or self.ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at, cost)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get_or_set(self, key, fn, ttl=None):
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        started = time.perf_counter()
+        value = fn()
+        with self._lock:
+            self.misses += 1
+            self._by_fragment[_fragment_name(key)]["misses"] += 1
+        self.set(key, value, cost=time.perf_counter() - started, ttl=ttl)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "seconds_saved": round(self.seconds_saved, 4),
+            "bytes_served": self.bytes_served,
+        }
+
+    def stats_by_fragment(self):
+        """{ fragment name: {hits, misses, seconds_saved, bytes_served} }"""
+        with self._lock:
+            return {
+                name: {**counts, "seconds_saved": round(counts["seconds_saved"], 4)}
+                for name, counts in self._by_fragment.items()
+            }
+
+
+def _fragment_name(key):
+    return str(key[0]) if isinstance(key, tuple) and key else str(key)
+
+
+fragment_cache = FragmentCache(
+    max_entries=Config.FRAGMENT_CACHE_SIZE,
+    ttl=Config.FRAGMENT_CACHE_TTL
+)
+
+
+def cached_fragment(*key_parts, caller=None):
+    """
+    Jinja helper, used as:
+
+        {% call cached("group-card", group._id, group.version, current_user_id) %}
+            ...expensive markup...
+        {% endcall %}
+    """
+    return Markup(fragment_cache.get_or_set(fragment_key(*key_parts), lambda: str(caller())))
+
+
+def fragment_key(*key_parts):
+    """The key cached() stores a fragment under, for checking it from a route."""
+    return tuple(str(part) for part in key_parts)
@@ -0,0 +1,66 @@
+import gzip
+from flask import request
+from config import Config
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "text/html", "text/css", "text/plain", "text/csv", "text/javascript",
+    "application/javascript", "application/json", "image/svg+xml",
+}
+
+# Running totals, exported by the metrics endpoint
+compression_stats = {"responses": 0, "bytes_in": 0, "bytes_out": 0}
+
+
+def _negotiate():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress_response(response):
+    """after_request hook: gzip/brotli per Accept-Encoding for text responses."""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+
+    encoding = _negotiate()
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < Config.COMPRESS_MIN_BYTES:
+        return response
+
+    if encoding == "br":
+        compressed = brotli.compress(data, quality=Config.COMPRESS_LEVEL)
+    else:
+        compressed = gzip.compress(data, compresslevel=Config.COMPRESS_LEVEL)
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+
+    # The compressed body is a different representation of the same entity
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+    compression_stats["responses"] += 1
+    compression_stats["bytes_in"] += len(data)
+    compression_stats["bytes_out"] += len(compressed)
+    return response
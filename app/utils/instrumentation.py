@@ -0,0 +1,378 @@
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+from flask import g, request
+from pymongo import monitoring
+from bson import encode
+from config import Config
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+
+# -------------------------
+# METRICS REGISTRY
+# -------------------------
+class Metrics:
+    """Minimal Prometheus text-format registry (counters, gauges, histograms)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._histograms = {}
+        self._help = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((labels or {}).items()))
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, labels=None, value=1.0):
+        with self._lock:
+            self._counters[self._key(name, labels)] += value
+
+    def set_gauge(self, name, value, labels=None):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def observe(self, name, value, labels=None, buckets=DURATION_BUCKETS):
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = {
+                    "buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0
+                }
+            for i, bound in enumerate(hist["buckets"]):
+                if value <= bound:
+                    hist["counts"][i] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    @staticmethod
+    def _labels(pairs, extra=None):
+        pairs = list(pairs) + list(extra or [])
+        if not pairs:
+            return ""
+        body = ",".join(
+            '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+            for k, v in pairs
+        )
+        return "{" + body + "}"
+
+    def render(self):
+        lines = []
+        seen = set()
+
+        def header(name):
+            if name in seen or name not in self._help:
+                return
+            seen.add(name)
+            kind, text = self._help[name]
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                header(name)
+                lines.append(f"{name}{self._labels(labels)} {value}")
+
+            for (name, labels), value in sorted(self._gauges.items()):
+                header(name)
+                lines.append(f"{name}{self._labels(labels)} {value}")
+
+            for (name, labels), hist in sorted(self._histograms.items()):
+                header(name)
+                for bound, count in zip(hist["buckets"], hist["counts"]):
+                    lines.append(f"{name}_bucket{self._labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{self._labels(labels, [('le', '+Inf')])} {hist['count']}")
+                lines.append(f"{name}_sum{self._labels(labels)} {hist['sum']}")
+                lines.append(f"{name}_count{self._labels(labels)} {hist['count']}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.describe("splitwith_http_requests_total", "counter", "HTTP requests by endpoint and status.")
+metrics.describe("splitwith_http_request_duration_seconds", "histogram", "Time spent in each endpoint.")
+metrics.describe("splitwith_request_mongo_queries", "histogram", "Mongo commands issued per request.")
+metrics.describe("splitwith_mongo_commands_total", "counter", "Mongo commands by name.")
+metrics.describe("splitwith_mongo_command_duration_seconds", "histogram", "Mongo command latency.")
+metrics.describe("splitwith_mongo_reply_bytes_total", "counter", "BSON bytes returned by Mongo.")
+metrics.describe("splitwith_mongo_command_failures_total", "counter", "Failed Mongo commands.")
+metrics.describe("splitwith_n_plus_one_total", "counter", "Requests repeating one command shape past the threshold.")
+metrics.describe("splitwith_fragment_cache", "gauge", "Fragment cache counters.")
+metrics.describe("splitwith_fragment_cache_by_fragment", "gauge", "Fragment cache counters per fragment (group-page, group-card, balances, ...).")
+metrics.describe("splitwith_compression", "gauge", "Response compression totals.")
+metrics.describe("splitwith_live", "gauge", "Live update subscribers, events published and delivered, queue overflows.")
+metrics.describe("splitwith_mongo_pool_checkouts_total", "counter", "Connections checked out of the pool.")
+metrics.describe("splitwith_mongo_pool_checkout_failures_total", "counter", "Pool checkouts that failed, by reason.")
+metrics.describe("splitwith_mongo_pool_wait_seconds", "histogram", "Time spent waiting for a pooled connection.")
+metrics.describe("splitwith_mongo_pool_connections", "gauge", "Open and checked-out pool connections.")
+
+
+# -------------------------
+# PER-REQUEST STATS
+# -------------------------
+class RequestStats:
+
+    def __init__(self, endpoint=None):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.reply_bytes = 0
+        self.writes = 0
+        self.shapes = Counter()
+        # Fanned-out queries report from several threads at once
+        self.lock = threading.Lock()
+
+
+_current_stats = ContextVar("splitwith_request_stats", default=None)
+
+
+def current_stats():
+    return _current_stats.get()
+
+
+def query_shape(value):
+    """Replace literal values with '?' so filters that differ only by ids compare equal."""
+    if isinstance(value, dict):
+        return "{" + ",".join(f"{k}:{query_shape(v)}" for k, v in sorted(value.items())) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + (query_shape(value[0]) if value else "") + "]"
+    return "?"
+
+
+def command_shape(command_name, command):
+    collection = command.get(command_name)
+    if command_name == "find":
+        spec = command.get("filter", {})
+    elif command_name == "aggregate":
+        pipeline = command.get("pipeline") or []
+        spec = next((stage["$match"] for stage in pipeline if "$match" in stage), {})
+    elif command_name in ("update", "delete"):
+        ops = command.get("updates") or command.get("deletes") or [{}]
+        spec = ops[0].get("q", {})
+    elif command_name in ("findAndModify", "count", "distinct"):
+        spec = command.get("query", {})
+    else:
+        spec = {}
+    return f"{command_name} {collection} {query_shape(spec)}"
+
+
+WRITE_COMMANDS = frozenset(("insert", "update", "delete", "findAndModify"))
+
+# Callables taking (command_name, shape, seconds, endpoint), e.g. the slow-query log
+command_observers = []
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Attributes every command to the request that issued it. pymongo fires
+    these callbacks on the calling thread, so the context variable set in
+    before_request is visible here.
+    """
+
+    def __init__(self):
+        # Shapes of in-flight commands; only started() carries the command
+        self._shapes = {}
+
+    def started(self, event):
+        key = (event.connection_id, event.request_id)
+        self._shapes[key] = command_shape(event.command_name, event.command)
+
+    def succeeded(self, event):
+        seconds = event.duration_micros / 1e6
+        reply_bytes = len(encode(event.reply)) if Config.INSTRUMENT_REPLY_BYTES else 0
+        self._record(event, seconds, reply_bytes)
+
+    def failed(self, event):
+        metrics.inc("splitwith_mongo_command_failures_total", {"command": event.command_name})
+        self._record(event, event.duration_micros / 1e6, 0)
+
+    def _record(self, event, seconds, reply_bytes):
+        labels = {"command": event.command_name}
+        metrics.inc("splitwith_mongo_commands_total", labels)
+        metrics.observe("splitwith_mongo_command_duration_seconds", seconds, labels)
+        if reply_bytes:
+            metrics.inc("splitwith_mongo_reply_bytes_total", labels, reply_bytes)
+
+        shape = self._shapes.pop((event.connection_id, event.request_id), None)
+        stats = _current_stats.get()
+
+        for observer in command_observers:
+            observer(event.command_name, shape, seconds, stats.endpoint if stats else None)
+
+        if stats is None:
+            return
+        with stats.lock:
+            stats.queries += 1
+            stats.db_seconds += seconds
+            stats.reply_bytes += reply_bytes
+            if event.command_name in WRITE_COMMANDS:
+                stats.writes += 1
+            if shape:
+                stats.shapes[shape] += 1
+
+
+command_listener = MongoCommandListener()
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection pool counters for /metrics and /healthz."""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.in_use = 0
+        self.checkouts = 0
+        self.failures = Counter()
+        self.clears = 0
+        # Recent checkout waits (seconds) for percentile reporting
+        self.waits = deque(maxlen=window)
+
+    def _gauges(self):
+        metrics.set_gauge("splitwith_mongo_pool_connections", self.open, {"state": "open"})
+        metrics.set_gauge("splitwith_mongo_pool_connections", self.in_use, {"state": "in_use"})
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+            self._gauges()
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open = max(self.open - 1, 0)
+            self._gauges()
+
+    def connection_checked_out(self, event):
+        wait = getattr(event, "duration", None) or 0.0
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.waits.append(wait)
+            self._gauges()
+        metrics.inc("splitwith_mongo_pool_checkouts_total")
+        metrics.observe("splitwith_mongo_pool_wait_seconds", wait)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+            self._gauges()
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.failures[event.reason] += 1
+            if getattr(event, "duration", None) is not None:
+                self.waits.append(event.duration)
+        metrics.inc("splitwith_mongo_pool_checkout_failures_total", {"reason": event.reason})
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.clears += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def snapshot(self):
+        with self._lock:
+            waits = sorted(self.waits)
+            return {
+                "open": self.open,
+                "in_use": self.in_use,
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.failures),
+                "clears": self.clears,
+                "wait_ms": {
+                    "p50": round(_pick(waits, 50) * 1000, 2),
+                    "p95": round(_pick(waits, 95) * 1000, 2),
+                    "p99": round(_pick(waits, 99) * 1000, 2),
+                    "max": round((waits[-1] if waits else 0.0) * 1000, 2),
+                },
+            }
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.failures.clear()
+            self.waits.clear()
+
+
+def _pick(ordered, pct):
+    if not ordered:
+        return 0.0
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+pool_monitor = PoolMonitor()
+
+
+# -------------------------
+# FLASK HOOKS
+# -------------------------
+def _start_request():
+    stats = RequestStats(request.endpoint)
+    g._stats_token = _current_stats.set(stats)
+    g.request_stats = stats
+
+
+def _finish_request(response):
+    stats = g.get("request_stats")
+    if stats is None:
+        return response
+
+    elapsed = time.perf_counter() - stats.started
+    endpoint = request.endpoint or "unmatched"
+
+    metrics.inc("splitwith_http_requests_total", {
+        "endpoint": endpoint, "method": request.method, "status": response.status_code
+    })
+    metrics.observe("splitwith_http_request_duration_seconds", elapsed, {"endpoint": endpoint})
+    metrics.observe("splitwith_request_mongo_queries", stats.queries, {"endpoint": endpoint},
+                    buckets=QUERY_COUNT_BUCKETS)
+
+    repeated = {s: n for s, n in stats.shapes.items() if n > Config.N_PLUS_ONE_THRESHOLD}
+    if repeated:
+        metrics.inc("splitwith_n_plus_one_total", {"endpoint": endpoint})
+        for shape, count in repeated.items():
+            logger.warning("N+1 on %s: %dx %s", endpoint, count, shape)
+
+    if Config.SERVER_TIMING_ENABLED:
+        response.headers["Server-Timing"] = (
+            f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries", '
+            f'app;dur={elapsed * 1000:.1f}'
+        )
+
+    return response
+
+
+def _reset_request(exc=None):
+    token = g.pop("_stats_token", None)
+    if token is not None:
+        _current_stats.reset(token)
+
+
+def init_instrumentation(app):
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_reset_request)
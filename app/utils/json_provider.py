@@ -0,0 +1,122 @@
+import datetime
+import decimal
+import uuid
+from flask import stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from bson.decimal128 import Decimal128
+from bson.objectid import ObjectId
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib encoder handles the same types
+    orjson = None
+
+
+def bson_default(obj):
+    """Types neither encoder knows: ObjectId as hex, decimals as exact strings."""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return str(obj.to_decimal())
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return _isoformat(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _isoformat(value):
+    # Same output as orjson with OPT_NAIVE_UTC | OPT_UTC_Z: Mongo datetimes are naive UTC
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value.isoformat() + "Z"
+    return value.isoformat()
+
+
+class BSONJSONProvider(DefaultJSONProvider):
+    """
+    app.json for every jsonify / dict return value and the `tojson` filter.
+    Encodes with orjson when it is installed, the stdlib json otherwise;
+    both produce the same text for BSON documents.
+    """
+
+    default = staticmethod(bson_default)
+
+    def _orjson_option(self, sort_keys, indent):
+        option = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps_bytes(self, obj, sort_keys=None, indent=None):
+        sort_keys = self.sort_keys if sort_keys is None else sort_keys
+        if orjson is not None:
+            return orjson.dumps(obj, default=bson_default, option=self._orjson_option(sort_keys, indent))
+        return super().dumps(
+            obj, sort_keys=sort_keys, indent=indent,
+            separators=None if indent else (",", ":")
+        ).encode()
+
+    def dumps(self, obj, **kwargs):
+        # The tojson filter passes sort_keys; anything orjson can't honour
+        # (cls, ensure_ascii=True, ...) goes to the stdlib encoder.
+        sort_keys = kwargs.pop("sort_keys", None)
+        indent = kwargs.pop("indent", None)
+        kwargs.pop("separators", None)
+        if kwargs or orjson is None:
+            kwargs.setdefault("default", bson_default)
+            kwargs.setdefault("separators", None if indent else (",", ":"))
+            return super().dumps(obj, sort_keys=self.sort_keys if sort_keys is None else sort_keys,
+                                 indent=indent, **kwargs)
+        return self.dumps_bytes(obj, sort_keys, indent).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def _indent(self):
+        return 2 if (self.compact is None and self._app.debug) or self.compact is False else None
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Straight to bytes, no str round trip
+        return self._app.response_class(
+            self.dumps_bytes(obj, indent=self._indent()) + b"\n", mimetype=self.mimetype
+        )
+
+    def stream(self, rows, key=None, envelope=None):
+        """
+        Response that encodes `rows` (e.g. a cursor) one item at a time, so a
+        large report is never held as one list or one string. A bare array,
+        or with `key` an object: { **envelope, key: [...] }.
+        """
+        def generate():
+            if key is None:
+                yield b"["
+            else:
+                head = self.dumps_bytes({**(envelope or {}), key: []}, sort_keys=False)
+                # '{..., "key": []}' -> '{..., "key": ['
+                yield head[:-2]
+            first = True
+            for row in rows:
+                yield (b"" if first else b",") + self.dumps_bytes(row)
+                first = False
+            yield b"]" if key is None else b"]}"
+            yield b"\n"
+
+        return self._app.response_class(stream_with_context(generate()), mimetype=self.mimetype)
+
+
+def init_json(app):
+    app.json_provider_class = BSONJSONProvider
+    app.json = BSONJSONProvider(app)
+    # Jinja's tojson uses app.json.dumps, pick up the new provider
+    app.jinja_env.policies["json.dumps_function"] = app.json.dumps
@@ -0,0 +1,308 @@
+from pymongo.errors import OperationFailure, PyMongoError
+import json
+import os
+import queue
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Change stream over the collections whose writes move balances. Expense and
+# settlement writes also bump their group's version, the group event alone
+# is enough; the others only save a round of debounce on inserts.
+WATCH_COLLECTIONS = ("groups", "expenses", "settlements")
+WATCH_PIPELINE = [
+    {"$match": {"ns.coll": {"$in": list(WATCH_COLLECTIONS)},
+                "operationType": {"$in": ["insert", "update", "replace"]}}},
+    {"$project": {"ns": 1, "documentKey": 1, "fullDocument.group_id": 1}},
+]
+# Server answers for "no change streams here": standalone mongod, or no oplog
+CHANGE_STREAMS_UNSUPPORTED = {40573, 40324, 303}
+
+
+def sse_frame(data, event=None, event_id=None):
+    """One text/event-stream message, `data` already encoded to bytes."""
+    head = b""
+    if event_id is not None:
+        head += b"id: %s\n" % str(event_id).encode()
+    if event:
+        head += b"event: %s\n" % event.encode()
+    return head + b"data: " + data + b"\n\n"
+
+
+def _load_group(group_id):
+    """(version, { user_id: net }) through the same cache the group page reads."""
+    from ..models.groupModel import GroupModel, to_object_id
+    from ..routes.dashboard.groupRoute import cached_member_balances
+
+    group = GroupModel.collection().find_one({"_id": to_object_id(group_id)}, {"version": 1})
+    if group is None:
+        return None, {}
+    return group.get("version", 0), cached_member_balances(group)
+
+
+class Subscription:
+    """One connected client: a bounded queue of ready-to-send frames."""
+
+    def __init__(self, group_id, maxsize):
+        self.group_id = group_id
+        self.queue = queue.Queue(maxsize)
+        # Set when the client fell behind and frames were dropped;
+        # the stream sends a full snapshot instead of the missed deltas.
+        self.overflowed = False
+
+    def push(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except queue.Full:
+            self.overflowed = True
+            return False
+
+    def next(self, timeout):
+        """The next frame, or None when nothing came within `timeout`."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self):
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                return
+
+
+class LiveBroker:
+    """
+    Per-worker fan-out of group balance changes to SSE clients.
+
+    Writes call notify(group_id), locally through GroupModel.on_change and
+    from other workers through one shared change-stream watcher thread.
+    A dispatcher thread coalesces the notifications, recomputes each
+    watched group's balances once, and pushes the same encoded delta
+    (only the members whose net changed) onto every subscriber's queue.
+    """
+
+    def __init__(self, queue_size=32, debounce=0.25, load=_load_group):
+        self.queue_size = queue_size
+        self.debounce = debounce
+        self.load = load
+        self.source = "local"
+        self._app = None
+        self._watch_enabled = False
+        self._pid = None
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._subscribers = {}   # group_id -> set(Subscription)
+        self._state = {}         # group_id -> (version, { user_id: net }) last sent
+        self._pending = set()
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._pid = os.getpid()
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+
+    def configure(self, app):
+        self._app = app
+        self.queue_size = app.config["LIVE_QUEUE_SIZE"]
+        self.debounce = app.config["LIVE_DEBOUNCE_MS"] / 1000
+        self._watch_enabled = app.config["LIVE_UPDATES"] == "auto"
+
+    # -------------------------
+    # THREADS
+    # -------------------------
+    def _ensure_started(self):
+        # Started on the first subscriber and again after fork, threads do not survive one
+        if self._threads and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if self._threads:
+                return
+            targets = [self._dispatch]
+            if self._watch_enabled and self._app is not None:
+                targets.append(self._watch)
+            for target in targets:
+                name = "splitwith-live" + target.__name__.replace("_", "-")
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _dispatch(self):
+        while True:
+            self._wakeup.wait()
+            # Let a burst of writes (expense + total + touch) settle into one update
+            time.sleep(self.debounce)
+            with self._lock:
+                self._wakeup.clear()
+                pending, self._pending = self._pending, set()
+            for group_id in pending:
+                try:
+                    self.refresh(group_id)
+                except Exception:
+                    logger.exception("Live update for group %s failed", group_id)
+
+    def _watch(self):
+        from ..models import GetDB
+
+        resume_token, backoff = None, 1
+        while True:
+            try:
+                with self._app.app_context():
+                    db = GetDB._get_db()
+                    with db.watch(WATCH_PIPELINE, full_document="updateLookup",
+                                  resume_after=resume_token) as stream:
+                        self.source = "changestream"
+                        backoff = 1
+                        for change in stream:
+                            resume_token = stream.resume_token
+                            group_id = self._group_of(change)
+                            if group_id:
+                                self.notify(group_id)
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAMS_UNSUPPORTED:
+                    return self._watch_unavailable(e.code)
+                logger.warning("Change stream failed, retrying in %ss: %s", backoff, e)
+            except PyMongoError as e:
+                logger.warning("Change stream failed, retrying in %ss: %s", backoff, e)
+            except (NotImplementedError, TypeError) as e:
+                # mongomock and other stand-ins have no watch() at all
+                return self._watch_unavailable(type(e).__name__)
+            self.source = "local"
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _watch_unavailable(self, reason):
+        logger.info("Change streams unavailable (%s), live updates stay per worker", reason)
+        self.source = "local"
+
+    @staticmethod
+    def _group_of(change):
+        if change["ns"]["coll"] == "groups":
+            return str(change["documentKey"]["_id"])
+        group_id = (change.get("fullDocument") or {}).get("group_id")
+        return str(group_id) if group_id else None
+
+    # -------------------------
+    # SUBSCRIBERS
+    # -------------------------
+    def subscribe(self, group_id, version, balances):
+        """Register a client; version/balances are what its snapshot showed."""
+        self._ensure_started()
+        group_id = str(group_id)
+        subscription = Subscription(group_id, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(group_id, set()).add(subscription)
+            current = self._state.get(group_id)
+            if current is None or current[0] < version:
+                self._state[group_id] = (version, dict(balances))
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.group_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.group_id]
+                self._state.pop(subscription.group_id, None)
+
+    def subscriber_count(self, group_id=None):
+        with self._lock:
+            if group_id is not None:
+                return len(self._subscribers.get(str(group_id), ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+    # -------------------------
+    # PUBLISHING
+    # -------------------------
+    def notify(self, group_id):
+        """Cheap, any thread: mark a group for a refresh if someone here watches it."""
+        group_id = str(group_id)
+        with self._lock:
+            if group_id not in self._subscribers:
+                return
+            self._pending.add(group_id)
+        self._wakeup.set()
+
+    def refresh(self, group_id):
+        if self._app is not None:
+            with self._app.app_context():
+                version, balances = self.load(group_id)
+        else:
+            version, balances = self.load(group_id)
+        if version is None:
+            return None
+        delta = self.diff(group_id, version, balances)
+        if delta is not None:
+            self.publish(group_id, delta)
+        return delta
+
+    def diff(self, group_id, version, balances):
+        """The members whose net changed since the last send, None when nothing did."""
+        balances = {uid: round(float(net), 2) for uid, net in balances.items()}
+        with self._lock:
+            last_version, last = self._state.get(group_id, (-1, {}))
+            if version < last_version:
+                return None
+            self._state[group_id] = (version, balances)
+
+        changed = {uid: net for uid, net in balances.items() if last.get(uid) != net}
+        removed = [uid for uid in last if uid not in balances]
+        if not changed and not removed:
+            return None
+        return {"version": version, "balances": changed, "removed": removed}
+
+    def publish(self, group_id, delta, event="balances"):
+        """Encode once, then one non-blocking put per subscriber."""
+        if self._app is not None:
+            data = self._app.json.dumps_bytes(delta)
+        else:
+            data = json.dumps(delta, separators=(",", ":")).encode()
+        frame = sse_frame(data, event, delta.get("version"))
+
+        with self._lock:
+            subscribers = list(self._subscribers.get(str(group_id), ()))
+        delivered = 0
+        for subscription in subscribers:
+            if subscription.push(frame):
+                delivered += 1
+        self.published += 1
+        self.delivered += delivered
+        self.overflows += len(subscribers) - delivered
+        return delivered
+
+    def snapshot(self, group_id):
+        """(version, balances) last sent for the group, for clients that fell behind."""
+        with self._lock:
+            version, balances = self._state.get(str(group_id), (0, {}))
+            return version, dict(balances)
+
+    def stats(self):
+        return {
+            "groups": len(self._subscribers),
+            "subscribers": self.subscriber_count(),
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+            "changestream": int(self.source == "changestream"),
+        }
+
+
+live_broker = LiveBroker()
+
+
+def init_live(app):
+    live_broker.configure(app)
+    if app.config["LIVE_UPDATES"] == "off":
+        return
+    from ..models.groupModel import GroupModel
+    GroupModel.on_change(live_broker.notify)
@@ -0,0 +1,211 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+from .instrumentation import metrics
+import multiprocessing
+import os
+import threading
+import time
+import logging
+
+try:
+    import argon2
+except ImportError:  # optional: pip install argon2-cffi
+    argon2 = None
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("splitwith_password_hash_seconds", "histogram", "Password hash and check latency, queueing included.")
+metrics.describe("splitwith_password_hash_busy_total", "counter", "Password hashes refused because every worker stayed busy.")
+metrics.describe("splitwith_password_rehash_total", "counter", "Stored hashes upgraded to the configured method on login.")
+
+# Stored hashes look like
+#   scrypt:32768:8:1$salt$hash         werkzeug (scrypt or pbkdf2:sha256:N)
+#   $argon2id$v=19$m=65536,t=3,p=4$..  argon2-cffi
+# so every user keeps working whatever the method was when they last set
+# a password, and login moves them to the configured one (needs_rehash).
+
+
+class PasswordHashBusy(RuntimeError):
+    """Every hashing worker stayed busy for PASSWORD_HASH_TIMEOUT_SECONDS."""
+
+
+def _argon2_hasher(params):
+    if params is None:
+        return argon2.PasswordHasher()
+    time_cost, memory_cost, parallelism = params
+    return argon2.PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+
+
+def parse_method(method):
+    """ "argon2:t:m:p" -> ("argon2", (t, m, p)), anything else is a werkzeug method string."""
+    if not method.startswith("argon2"):
+        return method, None
+    parts = method.split(":")
+    if len(parts) == 1:
+        return "argon2", None  # argon2-cffi's defaults
+    if len(parts) != 4:
+        raise ValueError(f"Expected argon2:time_cost:memory_kib:parallelism, got {method!r}")
+    return "argon2", tuple(int(p) for p in parts[1:])
+
+
+def canonical_method(method):
+    """The method as stored hashes spell it, e.g. "scrypt" -> "scrypt:32768:8:1"."""
+    parts = method.split(":")
+    if parts[0].startswith("argon2") or (parts[0], len(parts)) in (("scrypt", 4), ("pbkdf2", 3)):
+        return method
+    # A shorthand: let werkzeug fill in its defaults once
+    return generate_password_hash("", method=method).split("$", 1)[0]
+
+
+# -------------------------
+# WORK (runs in the pool; module-level so it pickles)
+# -------------------------
+def _hash(password, method):
+    name, params = parse_method(method)
+    if name == "argon2":
+        return _argon2_hasher(params).hash(password)
+    return generate_password_hash(password, method=method)
+
+
+def _verify(stored, password):
+    if stored.startswith("$argon2"):
+        if argon2 is None:
+            logger.error("Stored argon2 hash but argon2-cffi is not installed")
+            return False
+        try:
+            return argon2.PasswordHasher().verify(stored, password)
+        except argon2.exceptions.VerificationError:
+            return False
+        except argon2.exceptions.InvalidHashError:
+            return False
+    return check_password_hash(stored, password)
+
+
+class PasswordHasher:
+    """
+    Key stretching is CPU and memory work by design (scrypt:32768:8:1 is
+    32 MiB and tens of ms per check). Inline, every request thread of a
+    worker can be hashing at once, and a burst of logins takes the
+    worker's cores and memory from its other requests. This runs it on a
+    small per-worker process pool instead: `workers` hashes at a time, up
+    to `max_pending` more waiting, and past that a 503 rather than yet
+    another request thread parked behind the pool.
+    """
+
+    def __init__(self, method="scrypt:32768:8:1", workers=0, max_pending=None, timeout=10.0):
+        self.configure(method, workers, max_pending, timeout)
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def configure(self, method, workers, max_pending=None, timeout=10.0):
+        name, _ = parse_method(method)
+        if name == "argon2" and argon2 is None:
+            raise RuntimeError("PASSWORD_HASH_METHOD is argon2 but argon2-cffi is not installed")
+        self.method = canonical_method(method)
+        self.workers = workers
+        self.timeout = timeout
+        self.max_pending = max_pending or max(1, workers) * 4
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    # -------------------------
+    # POOL
+    # -------------------------
+    @property
+    def pool(self):
+        # Built lazily and rebuilt after fork, like the query executor
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    # spawn, not fork: gunicorn workers run threads (Mongo
+                    # monitors, the live broker) a forked child would inherit
+                    # mid-flight
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                    self._pid = os.getpid()
+        return self._pool
+
+    def _run(self, operation, fn, *args):
+        started = time.perf_counter()
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            if not self._slots.acquire(timeout=self.timeout):
+                metrics.inc("splitwith_password_hash_busy_total", {"op": operation})
+                raise PasswordHashBusy(f"No password hashing worker free within {self.timeout}s")
+            try:
+                return self.pool.submit(fn, *args).result(timeout=self.timeout)
+            except FutureTimeout:
+                metrics.inc("splitwith_password_hash_busy_total", {"op": operation})
+                raise PasswordHashBusy(f"Password hashing took longer than {self.timeout}s")
+            except BrokenProcessPool:
+                # A worker died (OOM killer, ...): start a fresh pool next time, do this one inline
+                logger.warning("Password hashing pool broke, rebuilding it")
+                with self._lock:
+                    self._pool = None
+                return fn(*args)
+            finally:
+                self._slots.release()
+        finally:
+            metrics.observe("splitwith_password_hash_seconds", time.perf_counter() - started, {"op": operation})
+
+    # -------------------------
+    # API
+    # -------------------------
+    def hash(self, password):
+        return self._run("hash", _hash, password, self.method)
+
+    def verify(self, stored, password):
+        if not stored or password is None:
+            return False
+        return self._run("verify", _verify, stored, password)
+
+    def needs_rehash(self, stored):
+        """True when `stored` was made with another method or cost than the configured one."""
+        if not stored:
+            return False
+        name, params = parse_method(self.method)
+        if stored.startswith("$argon2"):
+            return name != "argon2" or _argon2_hasher(params).check_needs_rehash(stored)
+        return name == "argon2" or stored.split("$", 1)[0] != self.method
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+hasher = PasswordHasher()
+
+
+def hash_password(password):
+    return hasher.hash(password)
+
+
+def verify_password(stored, password):
+    return hasher.verify(stored, password)
+
+
+def needs_rehash(stored):
+    return hasher.needs_rehash(stored)
+
+
+def init_passwords(app):
+    hasher.configure(
+        app.config["PASSWORD_HASH_METHOD"],
+        app.config["PASSWORD_HASH_WORKERS"],
+        app.config["PASSWORD_HASH_MAX_PENDING"],
+        app.config["PASSWORD_HASH_TIMEOUT_SECONDS"]
+    )
+
+    @app.errorhandler(PasswordHashBusy)
+    def password_hash_busy(e):
+        logger.warning("%s", e)
+        response = app.make_response(("Server busy, please try again in a moment.", 503))
+        response.headers["Retry-After"] = "1"
+        return response
+
+    return hasher
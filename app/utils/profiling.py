@@ -0,0 +1,180 @@
+from flask import g, request
+from config import Config
+from .background import submit
+import cProfile
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:  # pyinstrument is optional, cProfile is always available
+    PyinstrumentProfiler = None
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("splitwith.slowquery")
+
+# Only one request is profiled at a time. Profilers are process-wide on
+# newer Pythons, and this also bounds the overhead under load.
+_profile_lock = threading.Lock()
+
+
+def _flag(value):
+    # JSON booleans as well as the strings a form or env var would send
+    return str(value).strip().lower() in ("1", "true", "on")
+
+
+class ProfilerSettings:
+    """Runtime-mutable knobs, seeded from Config and changed via /debug/profiling."""
+
+    def __init__(self):
+        self.enabled = Config.PROFILING_ENABLED
+        self.sample_rate = Config.PROFILING_SAMPLE_RATE
+        self.engine = Config.PROFILING_ENGINE
+        self.min_duration_ms = Config.PROFILING_MIN_DURATION_MS
+        self.slow_query_ms = Config.SLOW_QUERY_MS
+        self.dump_dir = Config.PROFILING_DUMP_DIR
+        self.max_dumps = Config.PROFILING_MAX_DUMPS
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def update(self, data):
+        for key, cast in (
+            ("enabled", _flag), ("sample_rate", float), ("engine", str),
+            ("min_duration_ms", float), ("slow_query_ms", float), ("max_dumps", int),
+        ):
+            if key in data:
+                setattr(self, key, cast(data[key]))
+
+        self.sample_rate = min(max(self.sample_rate, 0.0), 1.0)
+        if self.engine == "pyinstrument" and PyinstrumentProfiler is None:
+            self.engine = "cprofile"
+        if self.enabled:
+            _attach_slow_query_file(self.dump_dir)
+        else:
+            _detach_slow_query_file()
+        return self.as_dict()
+
+
+settings = ProfilerSettings()
+
+
+# -------------------------
+# SAMPLING PROFILER
+# -------------------------
+def _start_profile():
+    if not settings.enabled or random.random() >= settings.sample_rate:
+        return
+    if not _profile_lock.acquire(blocking=False):
+        return
+
+    try:
+        if settings.engine == "pyinstrument" and PyinstrumentProfiler is not None:
+            profiler = PyinstrumentProfiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+    except Exception:
+        _profile_lock.release()
+        logger.exception("Could not start profiler")
+        return
+
+    g._profiler = profiler
+    g._profile_started = time.perf_counter()
+
+
+def _stop_profile(exc=None):
+    profiler = g.pop("_profiler", None)
+    if profiler is None:
+        return
+
+    try:
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+        else:
+            profiler.stop()
+    finally:
+        _profile_lock.release()
+
+    elapsed_ms = (time.perf_counter() - g.pop("_profile_started")) * 1000
+    if elapsed_ms < settings.min_duration_ms:
+        return
+
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or 'unmatched'}-{elapsed_ms:.0f}ms"
+    submit(_write_profile, profiler, name, settings.dump_dir, settings.max_dumps)
+
+
+def _write_profile(profiler, name, dump_dir, max_dumps):
+    os.makedirs(dump_dir, exist_ok=True)
+
+    if isinstance(profiler, cProfile.Profile):
+        path = os.path.join(dump_dir, f"{name}.prof")
+        pstats.Stats(profiler).dump_stats(path)
+    else:
+        path = os.path.join(dump_dir, f"{name}.html")
+        with open(path, "w") as fh:
+            fh.write(profiler.output_html())
+
+    _prune_dumps(dump_dir, max_dumps)
+    logger.info("Profile written to %s", path)
+
+
+def _prune_dumps(dump_dir, max_dumps):
+    dumps = sorted(
+        (os.path.join(dump_dir, f) for f in os.listdir(dump_dir) if f.endswith((".prof", ".html"))),
+        key=os.path.getmtime
+    )
+    for path in dumps[:-max_dumps]:
+        os.remove(path)
+
+
+# -------------------------
+# SLOW QUERY LOG
+# -------------------------
+def record_slow_query(command_name, shape, seconds, endpoint=None):
+    """Command observer: logs any command slower than settings.slow_query_ms."""
+    duration_ms = seconds * 1000
+    if not settings.slow_query_ms or duration_ms < settings.slow_query_ms:
+        return
+
+    slow_query_logger.warning(json.dumps({
+        "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "command": command_name,
+        "shape": shape,
+        "duration_ms": round(duration_ms, 2),
+        "endpoint": endpoint,
+    }))
+
+
+def _attach_slow_query_file(dump_dir):
+    """Also write the slow query log under dump_dir, once profiling is on."""
+    if not dump_dir or any(isinstance(h, logging.FileHandler) for h in slow_query_logger.handlers):
+        return
+    os.makedirs(dump_dir, exist_ok=True)
+    handler = logging.FileHandler(os.path.join(dump_dir, "slow_queries.log"))
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    slow_query_logger.addHandler(handler)
+
+
+def _detach_slow_query_file():
+    for handler in [h for h in slow_query_logger.handlers if isinstance(h, logging.FileHandler)]:
+        slow_query_logger.removeHandler(handler)
+        handler.close()
+
+
+def init_profiling(app):
+    from .instrumentation import command_observers
+
+    if record_slow_query not in command_observers:
+        command_observers.append(record_slow_query)
+    if settings.enabled:
+        _attach_slow_query_file(settings.dump_dir)
+
+    app.before_request(_start_profile)
+    app.teardown_request(_stop_profile)
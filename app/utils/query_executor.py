@@ -0,0 +1,91 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from contextvars import copy_context
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+THREAD_PREFIX = "splitwith-query"
+
+
+class QueryTimeout(RuntimeError):
+    pass
+
+
+class QueryExecutor:
+    """
+    Runs independent reads side by side on a shared thread pool.
+
+    Every call runs inside a copy of the caller's context, so current_app,
+    request, the session user and the per-request query stats all work in
+    the worker thread exactly like they do in the view.
+    """
+
+    def __init__(self, max_workers=8, timeout=5.0):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        # Built lazily and rebuilt after fork, threads do not survive a fork
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=THREAD_PREFIX
+                    )
+                    self._pid = os.getpid()
+        return self._pool
+
+    def submit(self, fn, *args, **kwargs):
+        ctx = copy_context()
+        return self.pool.submit(ctx.run, fn, *args, **kwargs)
+
+    def gather(self, calls, timeout=None):
+        """
+        calls: { name: (fn, *args) }  ->  { name: result }
+
+        Raises the first error any call raised, or QueryTimeout when the
+        calls are not done in time. Either way the calls that have not
+        started yet are cancelled; ones already talking to Mongo can't be
+        interrupted and finish in the background.
+        """
+        # Already on a pool thread: fanning out again could starve the pool
+        if threading.current_thread().name.startswith(THREAD_PREFIX):
+            return {name: call[0](*call[1:]) for name, call in calls.items()}
+
+        futures = {name: self.submit(*call) for name, call in calls.items()}
+        timeout = self.timeout if timeout is None else timeout
+        done, pending = wait(futures.values(), timeout=timeout, return_when=FIRST_EXCEPTION)
+
+        failed = next((f for f in done if f.exception() is not None), None)
+        if pending:
+            for f in pending:
+                f.cancel()
+            if failed is None:
+                names = [name for name, f in futures.items() if f in pending]
+                logger.warning("Query fan-out timed out after %ss: %s", timeout, ", ".join(names))
+                raise QueryTimeout(f"Queries did not finish within {timeout}s: {', '.join(names)}")
+
+        if failed is not None:
+            raise failed.exception()
+
+        return {name: f.result() for name, f in futures.items()}
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def init_query_executor(app):
+    app.query_executor = QueryExecutor(
+        max_workers=app.config["QUERY_EXECUTOR_WORKERS"],
+        timeout=app.config["QUERY_TIMEOUT_SECONDS"]
+    )
+    return app.query_executor
@@ -0,0 +1,196 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, request, render_template
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from .instrumentation import metrics
+import hashlib
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("splitwith_rate_limit_total", "counter", "Rate-limited requests by rule and result.")
+metrics.describe("splitwith_account_lockouts_total", "counter", "Accounts locked after repeated failed logins.")
+
+
+# -------------------------
+# SLIDING WINDOW COUNTERS
+# -------------------------
+# Each key keeps the hit count of the current fixed window and of the one
+# before it. The estimate for the last `window` seconds weighs the previous
+# count by how much of it still overlaps:
+#
+#     previous * (1 - elapsed / window) + current
+#
+# Two numbers per key instead of a timestamp per hit, and no burst of
+# 2x the limit at a window boundary like plain fixed windows allow.
+def sliding_count(previous, current, window, now):
+    elapsed = (now % window) / window
+    return previous * (1 - elapsed) + current
+
+
+class MemoryStore:
+    """Per-process counters. Good for one worker, or as a fallback."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._data = OrderedDict()  # key -> [window index, previous, current]
+        self._lock = threading.Lock()
+
+    def hit(self, key, window, now):
+        index = int(now // window)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < index - 1:
+                entry = [index, 0, 0]
+            elif entry[0] == index - 1:
+                entry = [index, entry[2], 0]
+            entry[2] += 1
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_keys:
+                self._data.popitem(last=False)
+            return entry[1], entry[2]
+
+    def reset(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class MongoStore:
+    """
+    Counters shared by every worker: one document per key, moved to the
+    current window and incremented by a single pipeline update.
+
+        rate_limits - { _id: key, w: window index, prev, cur, expires_at }
+                      TTL on expires_at (see migrations.py)
+    """
+
+    def __init__(self, collection_name="rate_limits"):
+        self.collection_name = collection_name
+
+    def collection(self):
+        from ..models import GetDB
+        return GetDB._get_db()[self.collection_name]
+
+    def hit(self, key, window, now):
+        index = int(now // window)
+        doc = self.collection().find_one_and_update(
+            {"_id": key},
+            [{"$set": {
+                "prev": {"$switch": {
+                    "branches": [
+                        {"case": {"$eq": ["$w", index]}, "then": "$prev"},
+                        {"case": {"$eq": ["$w", index - 1]}, "then": "$cur"},
+                    ],
+                    "default": 0
+                }},
+                "cur": {"$cond": [{"$eq": ["$w", index]}, {"$add": ["$cur", 1]}, 1]},
+                "w": index,
+                "expires_at": datetime.utcnow() + timedelta(seconds=2 * window),
+            }}],
+            projection={"prev": 1, "cur": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc["prev"], doc["cur"]
+
+    def reset(self, key):
+        self.collection().delete_one({"_id": key})
+
+
+class RateLimiter:
+
+    def __init__(self):
+        self._stores = {}
+        self._fallback = MemoryStore()
+
+    def store(self):
+        kind = current_app.config["RATE_LIMIT_STORAGE"]
+        if kind not in self._stores:
+            self._stores[kind] = MongoStore() if kind == "mongo" else MemoryStore()
+        return self._stores[kind]
+
+    def hit(self, rule, key, limit, window):
+        """(allowed, seconds until the estimate drops under the limit)"""
+        now = time.time()
+        full_key = f"{rule}:{key}"
+        try:
+            previous, current = self.store().hit(full_key, window, now)
+        except PyMongoError as e:
+            # Never lock everyone out because the counter store is down
+            logger.warning("Rate limit store unavailable, counting in memory: %s", e)
+            previous, current = self._fallback.hit(full_key, window, now)
+
+        allowed = sliding_count(previous, current, window, now) <= limit
+        metrics.inc("splitwith_rate_limit_total", {"rule": rule, "result": "allowed" if allowed else "limited"})
+        if allowed:
+            return True, 0
+
+        # The current window's hits alone already exceed it: wait for the next one
+        left = window - now % window
+        if current > limit:
+            return False, math.ceil(left)
+        # Otherwise until enough of the previous window has slid out
+        needed = 1 - (limit - current) / previous
+        return False, max(1, math.ceil(needed * window - now % window))
+
+    def reset(self, rule, key):
+        try:
+            self.store().reset(f"{rule}:{key}")
+        except PyMongoError:
+            pass
+        self._fallback.reset(f"{rule}:{key}")
+
+
+limiter = RateLimiter()
+
+
+# -------------------------
+# DECORATOR
+# -------------------------
+def client_ip():
+    return request.remote_addr or "unknown"
+
+
+def form_field(name):
+    """Key function: a normalised form value (email, username), hashed so no PII is stored."""
+    def key():
+        value = (request.form.get(name) or "").strip().lower()
+        return hashlib.sha256(value.encode()).hexdigest()[:32] if value else None
+    return key
+
+
+def too_many_requests(retry_after):
+    response = current_app.make_response((
+        render_template("user_auth/rate_limited.html", retry_after=retry_after),
+        429
+    ))
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def rate_limit(rule, limit_setting, key=client_ip, methods=("POST",)):
+    """
+    Counts each matching request under `rule` and `key()` and answers 429
+    once the sliding-window estimate passes the (limit, window seconds)
+    pair in config[limit_setting]. A key function returning None skips it.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method in methods and current_app.config["RATE_LIMIT_ENABLED"]:
+                value = key()
+                if value is not None:
+                    limit, window = current_app.config[limit_setting]
+                    allowed, retry_after = limiter.hit(rule, value, limit, window)
+                    if not allowed:
+                        logger.info("Rate limited %s for %s (retry in %ss)", rule, value, retry_after)
+                        return too_many_requests(retry_after)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
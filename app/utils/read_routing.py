@@ -0,0 +1,37 @@
+from flask import g, request
+from config import Config
+import time
+
+PIN_COOKIE = "rw_pin"
+
+
+def _pin_reads():
+    """Keep a client on the primary for a while after it wrote something."""
+    try:
+        pinned_until = float(request.cookies.get(PIN_COOKIE, 0))
+    except ValueError:
+        pinned_until = 0
+    g.pin_primary = pinned_until > time.time()
+
+
+def _remember_writes(response):
+    stats = g.get("request_stats")
+    if stats is None or not stats.writes:
+        return response
+
+    # Covers the redirect after e.g. create_expense: the next page load
+    # reads its analytics from the primary and sees the new expense.
+    pinned_until = time.time() + Config.READ_YOUR_WRITES_SECONDS
+    response.set_cookie(
+        PIN_COOKIE, f"{pinned_until:.0f}",
+        max_age=Config.READ_YOUR_WRITES_SECONDS,
+        httponly=True,
+        samesite="Lax"
+    )
+    return response
+
+
+def init_read_routing(app):
+    # Needs the per-request stats, so register after init_instrumentation
+    app.before_request(_pin_reads)
+    app.after_request(_remember_writes)
@@ -1,15 +1,127 @@
+import hashlib
 import os
+import re
+import tempfile
+from flask import url_for
 from werkzeug.utils import secure_filename
+from config import Config
+from .background import submit
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional, originals are still stored
+    Image = None
 
 UPLOAD_FOLDER = "static/uploads/groups"
+PROFILE_UPLOAD_FOLDER = "static/uploads/users_profile_pic"
+THUMB_FOLDER = "thumbs"
+THUMB_FORMAT = "webp"
+
+# Content-addressed uploads are named after the sha256 of their bytes
+HASHED_UPLOAD_RE = re.compile(r"^uploads/.+/[0-9a-f]{64}\.\w+$")
+
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp_path, path)
+
+
+def _store_original(file, folder):
+    """
+    Store the upload under the sha256 of its content and queue thumbnails.
+    Identical uploads share one file and different uploads never collide.
+    """
+    data = file.read()
+    if not data:
+        return None
+
+    ext = os.path.splitext(secure_filename(file.filename))[1].lower() or ".png"
+    filename = f"{hashlib.sha256(data).hexdigest()}{ext}"
+
+    os.makedirs(folder, exist_ok=True)
+    file_path = os.path.join(folder, filename)
+    if not os.path.exists(file_path):
+        _write_atomic(file_path, data)
+
+    submit(generate_thumbnails, file_path)
+    return filename
+
+
+def _thumb_path(original_path, size):
+    folder, filename = os.path.split(original_path)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(folder, THUMB_FOLDER, str(size), f"{stem}.{THUMB_FORMAT}")
+
+
+def generate_thumbnails(original_path, sizes=None):
+    """Render the configured thumbnail sizes for a stored original."""
+    if Image is None:
+        return []
+
+    created = []
+    with Image.open(original_path) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA")
+
+        for size in sizes or Config.UPLOAD_THUMBNAIL_SIZES:
+            dest = _thumb_path(original_path, size)
+            if os.path.exists(dest):
+                continue
+
+            thumb = img.copy()
+            thumb.thumbnail((size, size))
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+            with os.fdopen(fd, "wb") as fh:
+                thumb.save(fh, format=THUMB_FORMAT, quality=80, method=4)
+            os.replace(tmp_path, dest)
+            created.append(dest)
+
+    return created
+
 
 def save_group_photo(file):
     if not file or file.filename == "":
         return None
 
-    filename = secure_filename(file.filename)
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    file_path = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(file_path)
-    return filename
+    return _store_original(file, UPLOAD_FOLDER)
+
+
+def save_profile_photo(file):
+    """Returns the public URL path stored on the user document."""
+    if not file or file.filename == "":
+        return None
+
+    filename = _store_original(file, PROFILE_UPLOAD_FOLDER)
+    if not filename:
+        return None
+    return f"/{PROFILE_UPLOAD_FOLDER}/{filename}"
+
+
+def thumbnail_url(photo, size):
+    """
+    Accepts a path relative to static/ ("uploads/groups/<file>") or a stored
+    URL path ("/static/uploads/..."). Falls back to the original until the
+    worker has produced the thumbnail.
+    """
+    if not photo:
+        return None
+
+    relative = photo.lstrip("/")
+    if relative.startswith("static/"):
+        relative = relative[len("static/"):]
+
+    thumb = _thumb_path(os.path.join("static", relative), size)
+    if os.path.exists(thumb):
+        relative = os.path.relpath(thumb, "static").replace(os.sep, "/")
+
+    return url_for("static", filename=relative)
+
 
+def is_content_addressed(filename):
+    """True for upload paths (relative to static/) that can never change."""
+    return bool(HASHED_UPLOAD_RE.match(filename))
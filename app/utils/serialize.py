@@ -0,0 +1,59 @@
+import base64
+import json
+from datetime import datetime
+from .json_provider import bson_default
+
+
+def parse_datetime(value):
+    return datetime.fromisoformat(value.rstrip("Z"))
+
+
+# -------------------------
+# FIELD SELECTION
+# -------------------------
+def parse_fields(arg, allowed):
+    """?fields=a,b -> {"a", "b"}; None when not given. Unknown names raise ValueError."""
+    if not arg:
+        return None
+    fields = {f.strip() for f in arg.split(",") if f.strip()}
+    unknown = fields - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def select_fields(resource, fields):
+    if fields is None:
+        return resource
+    return {k: v for k, v in resource.items() if k == "id" or k in fields}
+
+
+def projection_for(fields, sources):
+    """Mongo projection covering the requested fields, None for everything."""
+    if fields is None:
+        return None
+    projection = {}
+    for field in fields:
+        projection.update(dict.fromkeys(sources.get(field, (field,)), 1))
+    return projection
+
+
+# -------------------------
+# CURSORS
+# -------------------------
+def encode_cursor(**values):
+    # Same encoding of ObjectIds and datetimes as the responses (app.json)
+    raw = json.dumps(values, default=bson_default, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Opaque cursor -> dict, ValueError when it was tampered with."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, dict):
+        raise ValueError("Invalid cursor")
+    return values
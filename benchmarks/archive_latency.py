@@ -0,0 +1,107 @@
+"""
+Group balance latency vs group age, with and without the expense archive.
+
+For each age one group is seeded with --per-month expenses for every
+month it has existed. Balances are timed on the hot collection alone,
+then again after `archive-expenses` moved everything older than
+--archive-after-days into the month buckets and snapshot:
+
+    python -m benchmarks.archive_latency --ages 1,2,4,8 --per-month 300
+    python -m benchmarks.archive_latency --mongomock --ages 1,2 --per-month 50
+
+Without the archive latency grows with age; with it, it should stay flat.
+The scratch users, groups and expenses are removed afterwards.
+"""
+import argparse
+import random
+import time
+
+from .common import create_bench_app, percentile, save_json
+from . import seed as seeder
+
+
+def _time_balances(group_id, rounds):
+    from app.routes.dashboard.groupRoute import compute_member_balances
+
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        compute_member_balances(group_id)
+        samples.append(time.perf_counter() - started)
+    return round(percentile(samples, 50) * 1000, 2), round(percentile(samples, 95) * 1000, 2)
+
+
+def _run_age(db, rng, years, args):
+    from app.models.archiveModel import ArchiveModel
+    from app.routes.dashboard.groupRoute import compute_member_balances
+
+    users = list(seeder.generate_users(rng, args.members))
+    db.users.insert_many(users)
+    group = next(seeder.generate_groups(rng, [u["_id"] for u in users], 1, args.members))
+    db.groups.insert_one(group)
+
+    days = int(years * 365)
+    count = int(years * 12 * args.per_month)
+    db.expenses.insert_many(list(seeder.generate_expenses(rng, [group], count, days)))
+
+    hot_p50, hot_p95 = _time_balances(group["_id"], args.rounds)
+    before = compute_member_balances(group["_id"])
+
+    started = time.perf_counter()
+    moved = ArchiveModel.archive_group(group["_id"], ArchiveModel.cutoff(args.archive_after_days))
+    archive_s = round(time.perf_counter() - started, 2)
+
+    cold_p50, cold_p95 = _time_balances(group["_id"], args.rounds)
+    after = compute_member_balances(group["_id"])
+    drift = max((abs(before.get(uid, 0) - after.get(uid, 0)) for uid in set(before) | set(after)), default=0)
+
+    for name in ("expenses", "expenses_archive", "expense_buckets"):
+        db[name].delete_many({"group_id": group["_id"]})
+    db.archive_snapshots.delete_one({"_id": group["_id"]})
+    db.groups.delete_one({"_id": group["_id"]})
+    db.users.delete_many({"_id": {"$in": [u["_id"] for u in users]}})
+
+    return {
+        "years": years, "expenses": count, "archived": moved, "archive_s": archive_s,
+        "hot_p50_ms": hot_p50, "hot_p95_ms": hot_p95,
+        "archived_p50_ms": cold_p50, "archived_p95_ms": cold_p95,
+        "max_balance_drift": round(drift, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ages", default="1,2,4,8", help="comma separated group ages in years")
+    parser.add_argument("--per-month", type=int, default=300, help="expenses per month of group age")
+    parser.add_argument("--members", type=int, default=8)
+    parser.add_argument("--archive-after-days", type=int, default=90)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongomock", action="store_true")
+    parser.add_argument("--save")
+    args = parser.parse_args(argv)
+
+    application = create_bench_app(mongomock=args.mongomock)
+    rng = random.Random(args.seed)
+
+    with application.app_context():
+        from app.models import GetDB
+        db = GetDB._get_db()
+        rows = [_run_age(db, rng, float(age), args) for age in args.ages.split(",")]
+
+    header = f"{'years':>6}{'expenses':>10}{'hot p50':>10}{'hot p95':>10}{'arch p50':>10}{'arch p95':>10}{'drift':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(
+            f"{r['years']:>6}{r['expenses']:>10}{r['hot_p50_ms']:>10}{r['hot_p95_ms']:>10}"
+            f"{r['archived_p50_ms']:>10}{r['archived_p95_ms']:>10}{r['max_balance_drift']:>8}"
+        )
+
+    if args.save:
+        save_json(args.save, rows)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
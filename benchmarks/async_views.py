@@ -0,0 +1,78 @@
+"""
+Sync vs async views on the heavy read routes, at a fixed worker count.
+
+Each virtual user is one worker thread, so --workers pins the concurrency
+the same way a fixed gunicorn/waitress thread count would. The sync run
+goes first, then the async views are swapped in (as ASYNC_VIEWS=true
+does) and the same seeded dashboard/report scenario is replayed.
+
+    python -m benchmarks.async_views --workers 4 --duration 20
+    python -m benchmarks.async_views --workers 4 --duration 20 --save async.json
+
+Needs flask[async] (asgiref); motor is used when installed, otherwise the
+async views bridge to the sync models through the app's query executor.
+"""
+import argparse
+import random
+
+from .common import create_bench_app, print_summary, save_json
+from .load_test import FlaskDriver, pick_users, run, seed_in_memory
+
+SCENARIO = [
+    ("dashboard", 3),
+    ("reports_summary", 1),
+]
+
+
+def _run_mode(application, users, args):
+    return run(
+        FlaskDriver(application), users, args.duration,
+        seed_value=args.seed, max_requests=args.max_requests, scenario=SCENARIO
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per mode")
+    parser.add_argument("--max-requests", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--mongomock", action="store_true")
+    parser.add_argument("--save", help="write both summaries to JSON")
+    args = parser.parse_args(argv)
+
+    # One app for both runs (same data, same pool); the async twins are
+    # swapped in between them exactly like ASYNC_VIEWS=true does at startup.
+    application = create_bench_app(mongomock=args.mongomock)
+    if args.mongomock:
+        seed_in_memory(application, args.seed)
+    with application.app_context():
+        from app.models import GetDB
+        users = pick_users(GetDB._get_db(), args.workers, random.Random(args.seed))
+
+    results = {}
+    for label in ("sync", "async"):
+        if label == "async":
+            from app.routes.dashboard.asyncRoute import init_async_views
+            init_async_views(application)
+        print(f"\n---- {label} views, {args.workers} workers ----")
+        results[label] = _run_mode(application, users, args)
+        print_summary(results[label])
+
+    print("\n---- async vs sync ----")
+    for name in [task for task, _ in SCENARIO] + ["_total"]:
+        before, after = results["sync"].get(name), results["async"].get(name)
+        if not before or not after:
+            continue
+        if name == "_total":
+            print(f"{'throughput':<18} {before['rps']:>8} rps → {after['rps']:>8} rps")
+        else:
+            print(f"{name:<18} p95 {before['p95_ms']:>8}ms → {after['p95_ms']:>8}ms")
+
+    if args.save:
+        save_json(args.save, results)
+    return results
+
+
+if __name__ == "__main__":
+    main()
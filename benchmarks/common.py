@@ -0,0 +1,113 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Run everything from the repository root, e.g.
+
+    python -m benchmarks.seed --expenses 1000000
+    python -m benchmarks.load_test --driver flask --duration 30
+"""
+import json
+import os
+import statistics
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+BENCH_PASSWORD = "benchmark-password"
+MOCK_MONGO_URI = "mongodb://localhost:27017"
+
+
+def create_bench_app(mongomock=False):
+    """
+    Build the real app. With mongomock=True the driver class used by the
+    lazy client factory is swapped for mongomock's in-memory stand-in, so
+    the suite can run without a mongod (latencies are then only indicative;
+    the database starts empty in every process, see seed_in_memory).
+    MONGO_URI is replaced by a plain one: mongomock parses it like the
+    driver does, and a mongodb+srv:// URI would need a DNS lookup.
+    """
+    if mongomock:
+        import mongomock as _mongomock
+        import app.models as models_package
+        models_package.MongoClient = _mongomock.MongoClient
+        # Before config is imported; load_dotenv doesn't override it
+        os.environ["MONGO_URI"] = MOCK_MONGO_URI
+
+    from app import create_app
+    application = create_app()
+    application.testing = True
+    # Past the auth limits (RATE_LIMIT_LOGIN) every login would be a 429,
+    # and the login task would time the rate limiter instead
+    application.config["RATE_LIMIT_ENABLED"] = False
+    if mongomock:
+        # In case config was already imported with the real URI
+        application.config["MONGO_URI"] = MOCK_MONGO_URI
+    return application
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(samples, elapsed):
+    """
+    samples: { name: [(seconds, ok, queries), ...] }
+    Returns { name: {count, errors, p50_ms, p95_ms, p99_ms, rps, queries_per_request} }
+    """
+    summary = {}
+    for name, rows in samples.items():
+        latencies = [r[0] for r in rows]
+        queries = [r[2] for r in rows if r[2] is not None]
+        summary[name] = {
+            "count": len(rows),
+            "errors": sum(1 for r in rows if not r[1]),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "rps": round(len(rows) / elapsed, 2) if elapsed else 0.0,
+            "queries_per_request": round(statistics.mean(queries), 2) if queries else None,
+        }
+    return summary
+
+
+def print_summary(summary):
+    header = f"{'endpoint':<22}{'count':>8}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>9}{'q/req':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, row in sorted(summary.items()):
+        qpr = "-" if row.get("queries_per_request") is None else row["queries_per_request"]
+        print(
+            f"{name:<22}{row['count']:>8}{row['errors']:>6}{row['p50_ms']:>10}"
+            f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['rps']:>9}{qpr:>8}"
+        )
+
+
+def save_json(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as fh:
+        json.dump(data, fh, indent=2, sort_keys=True)
+
+
+def load_json(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def compare(current, baseline, tolerance_pct, metric="p95_ms"):
+    """Returns a list of (name, baseline, current) rows that regressed past the tolerance."""
+    regressions = []
+    for name, row in current.items():
+        base = baseline.get(name)
+        if not base or not base.get(metric):
+            continue
+        if row[metric] > base[metric] * (1 + tolerance_pct / 100):
+            regressions.append((name, base[metric], row[metric]))
+    return regressions
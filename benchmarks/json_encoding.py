@@ -0,0 +1,117 @@
+"""
+Encoding cost of large report payloads.
+
+Builds a group report the size of a busy year (--rows expenses, hydrated
+like the report routes see them, with ObjectIds and datetimes) and times:
+
+    stdlib     Flask's default provider after converting ids by hand
+    provider   BSONJSONProvider.dumps_bytes (orjson when installed)
+    stream     BSONJSONProvider.stream, item by item
+
+plus the peak memory each needs while encoding.
+
+    python -m benchmarks.json_encoding --rows 50000
+    python -m benchmarks.json_encoding --rows 200000 --save json_encoding.json
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from .common import create_bench_app, save_json
+
+
+def _rows(rng, count, members):
+    user_ids = [ObjectId() for _ in range(members)]
+    now = datetime.utcnow()
+    for i in range(count):
+        split = rng.sample(user_ids, min(4, members))
+        amount = round(rng.uniform(10, 5000), 2)
+        yield {
+            "_id": ObjectId(),
+            "title": f"Expense {i}",
+            "description": "",
+            "amount": amount,
+            "group_id": user_ids[0],
+            "created_by": split[0],
+            "created_at": now - timedelta(minutes=i),
+            "split_with": split,
+            "final_split": {
+                str(u): {"should_pay": round(amount / len(split), 2), "paid": amount if u == split[0] else 0.0,
+                         "net_balance": 0.0}
+                for u in split
+            },
+        }
+
+
+def _stringify(row):
+    # What routes had to do before the provider knew BSON types
+    row = dict(row)
+    for key in ("_id", "group_id", "created_by"):
+        row[key] = str(row[key])
+    row["split_with"] = [str(u) for u in row["split_with"]]
+    row["created_at"] = row["created_at"].isoformat()
+    return row
+
+
+def _measure(fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms": round(elapsed * 1000, 1), "peak_mb": round(peak / 2 ** 20, 1), "bytes": size}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--members", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save")
+    args = parser.parse_args(argv)
+
+    from flask.json.provider import DefaultJSONProvider
+    from app.utils import json_provider
+
+    application = create_bench_app(mongomock=True)
+    rows = list(_rows(random.Random(args.seed), args.rows, args.members))
+    stdlib = DefaultJSONProvider(application)
+
+    def run_stdlib():
+        body = stdlib.dumps({"expenses": [_stringify(r) for r in rows]}, separators=(",", ":"))
+        return len(body.encode())
+
+    def run_provider():
+        return len(application.json.dumps_bytes({"expenses": rows}))
+
+    def run_stream():
+        with application.test_request_context():
+            response = application.json.stream(iter(rows), key="expenses")
+            return sum(len(chunk) for chunk in response.response)
+
+    results = {
+        "encoder": "orjson" if json_provider.orjson is not None else "json",
+        "rows": args.rows,
+        "stdlib": _measure(run_stdlib),
+        "provider": _measure(run_provider),
+        "stream": _measure(run_stream),
+    }
+
+    print(f"{args.rows} rows, provider encoder: {results['encoder']}")
+    print(f"{'':<10}{'ms':>10}{'peak MB':>10}{'MB out':>10}")
+    for name in ("stdlib", "provider", "stream"):
+        r = results[name]
+        print(f"{name:<10}{r['ms']:>10}{r['peak_mb']:>10}{round(r['bytes'] / 2 ** 20, 1):>10}")
+
+    if args.save:
+        save_json(args.save, results)
+    return results
+
+
+if __name__ == "__main__":
+    main()
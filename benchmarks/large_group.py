@@ -0,0 +1,189 @@
+"""
+Pages of one very large group (--members, 10k by default).
+
+    legacy    the reads the group page used to start with: the whole group
+              document (every member id) and every user in the database
+    detail    GET /groups/<id>, which now loads member_count and the
+              member_preview only, and just the users it names
+    list      GET /groups as a member of the big group
+    members   walks /api/v1/groups/<id>/members to the end, from the member
+              array and again from memberships (MEMBERSHIP_READS), and
+              checks each member came back exactly once (also covered
+              by tests/test_large_group.py)
+
+    python -m benchmarks.large_group
+    python -m benchmarks.large_group --mongomock --members 10000 --expenses 200
+    python -m benchmarks.large_group --members 50000 --page-size 200 --save large_group.json
+
+The scratch users, group, memberships and expenses are removed afterwards.
+"""
+import argparse
+import random
+import re
+import time
+
+from bson import ObjectId
+
+from .common import create_bench_app, percentile, save_json
+from . import seed as seeder
+
+
+def _timed(fn, rounds):
+    samples, result = [], None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return result, {
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+    }
+
+
+def _seed(db, rng, args):
+    from app.models.groupModel import GroupModel
+    from app.models.membershipModel import OWNER, MEMBER
+
+    users = list(seeder.generate_users(rng, args.members))
+    for user in users:
+        # Clear of anything `benchmarks.seed` left behind (emails are unique)
+        user["email"] = f"large-{user['_id']}@bench.local"
+        user["username"] = f"large-{user['_id']}"
+    db.users.insert_many(users)
+    ids = [u["_id"] for u in users]
+
+    group = GroupModel.build_group(
+        created_by=ids[0], title="Bench Large Group", description="Synthetic large group",
+        members=[str(i) for i in ids]
+    )
+    group["_id"] = ObjectId()
+    db.groups.insert_one(group)
+
+    joined = group["created_at"]
+    db.memberships.insert_many([
+        {"user_id": uid, "group_id": group["_id"], "role": OWNER if uid == ids[0] else MEMBER,
+         "joined_at": joined, "last_activity": joined}
+        for uid in ids
+    ])
+
+    # Expenses are split among a few members each, as they would be in a big group
+    for _ in range(args.expenses):
+        party = {"_id": group["_id"], "group_members": rng.sample(ids, 8)}
+        db.expenses.insert_many(list(seeder.generate_expenses(rng, [party], 1, 90)))
+    return group, ids
+
+
+def _cleanup(db, group, ids):
+    db.expenses.delete_many({"group_id": {"$in": [group["_id"], str(group["_id"])]}})
+    db.memberships.delete_many({"group_id": group["_id"]})
+    db.groups.delete_one({"_id": group["_id"]})
+    db.users.delete_many({"_id": {"$in": ids}})
+
+
+def _walk_members(client, group_id, page_size):
+    """(user ids in the order served, pages)"""
+    seen, pages, cursor = [], 0, None
+    while True:
+        url = f"/api/v1/groups/{group_id}/members?limit={page_size}"
+        if cursor:
+            url += f"&cursor={cursor}"
+        body = client.get(url).get_json()
+        pages += 1
+        seen += [row["user_id"] for row in body["data"]]
+        cursor = body["next_cursor"]
+        if not cursor:
+            return seen, pages
+
+
+def _set_membership_reads(application, on):
+    from config import Config
+    Config.MEMBERSHIP_READS = on
+    application.config["MEMBERSHIP_READS"] = on
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=10000)
+    parser.add_argument("--expenses", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongomock", action="store_true")
+    parser.add_argument("--save")
+    args = parser.parse_args(argv)
+
+    application = create_bench_app(mongomock=args.mongomock)
+    rng = random.Random(args.seed)
+    membership_reads = application.config["MEMBERSHIP_READS"]
+
+    with application.app_context():
+        from app.models import GetDB
+        from app.models.groupModel import GroupModel
+        from app.models.userModel import UserModel
+        from app.routes.userAuth import SetAndGetSession
+
+        db = GetDB._get_db()
+        group, ids = _seed(db, rng, args)
+        group_id = str(group["_id"])
+        token = SetAndGetSession({"user_id": str(ids[0]), "username": "large", "email": "large@bench.local"})["token"]
+
+    client = application.test_client()
+    client.set_cookie("session_token", token)
+    results = {"members": args.members, "expenses": args.expenses}
+    try:
+        with application.app_context():
+            _, results["legacy"] = _timed(
+                lambda: (GroupModel.find_by_id(group_id), UserModel.get_all_users()), args.rounds
+            )
+
+        response, results["detail"] = _timed(lambda: client.get(f"/groups/{group_id}"), args.rounds)
+        html = response.get_data(as_text=True)
+        results["detail"].update({
+            "status": response.status_code,
+            "kb": round(len(html) / 1024, 1),
+            "count_shown": f"Members ({args.members})" in html,
+        })
+
+        response, results["list"] = _timed(lambda: client.get("/groups"), args.rounds)
+        results["list"].update({
+            "status": response.status_code,
+            "kb": round(len(response.get_data()) / 1024, 1),
+            "count_shown": bool(re.search(rf"\b{args.members} members", response.get_data(as_text=True))),
+        })
+
+        expected = {str(i) for i in ids}
+        for name, on in (("members_array", False), ("members_memberships", True)):
+            _set_membership_reads(application, on)
+            (seen, pages), timing = _timed(lambda: _walk_members(client, group_id, args.page_size), 1)
+            results[name] = {
+                "pages": pages,
+                "walk_ms": timing["p50_ms"],
+                "ok": len(seen) == len(expected) and set(seen) == expected,
+            }
+    finally:
+        _set_membership_reads(application, membership_reads)
+        with application.app_context():
+            _cleanup(db, group, ids)
+
+    print(f"{args.members} members, {args.expenses} expenses")
+    for name in ("legacy", "detail", "list"):
+        r = results[name]
+        extra = f"  {r['kb']} KB  status {r['status']}" if "kb" in r else ""
+        print(f"{name:<20} p50 {r['p50_ms']:>9} ms  p95 {r['p95_ms']:>9} ms{extra}")
+    for name in ("members_array", "members_memberships"):
+        r = results[name]
+        print(f"{name:<20} {r['pages']} pages in {r['walk_ms']} ms  {'ok' if r['ok'] else 'MISMATCH'}")
+
+    failed = [name for name in ("members_array", "members_memberships") if not results[name]["ok"]]
+    failed += [name for name in ("detail", "list")
+               if results[name]["status"] != 200 or not results[name]["count_shown"]]
+    if args.save:
+        save_json(args.save, results)
+    if failed:
+        raise SystemExit(f"FAILED: {', '.join(failed)}")
+    print("ok: every member served once, pages show the full count")
+    return results
+
+
+if __name__ == "__main__":
+    main()
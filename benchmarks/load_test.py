@@ -0,0 +1,271 @@
+"""
+End-to-end load test for the key endpoints.
+
+Two drivers share one weighted scenario:
+
+  * flask - in-process through app.test_client(); queries per request are
+            counted by the Mongo command observer.
+  * http  - Locust-style virtual users hitting a running server over HTTP;
+            queries per request are read from the Server-Timing header
+            (set SERVER_TIMING_ENABLED=true on the server).
+
+    python -m benchmarks.load_test --driver flask --users 8 --duration 30 --save results.json
+    python -m benchmarks.load_test --driver http --base-url http://127.0.0.1:8000 --compare results.json
+"""
+import argparse
+import http.cookiejar
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+from .common import (
+    BENCH_PASSWORD, compare, create_bench_app, load_json, print_summary, save_json, summarize
+)
+
+# (task name, weight)
+SCENARIO = [
+    ("dashboard", 6),
+    ("groups", 4),
+    ("group_detail", 4),
+    ("expenses", 4),
+    ("reports_summary", 2),
+    ("reports_monthly", 2),
+    ("expense_create", 2),
+    ("login", 1),
+]
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def _task_request(task, user, rng):
+    """Returns (method, path, form) for a task and virtual user."""
+    user_id = user["user_id"]
+    group_id = rng.choice(user["group_ids"]) if user["group_ids"] else None
+    today = time.gmtime()
+
+    if task == "dashboard":
+        return "GET", "/dashboard", None
+    if task == "groups":
+        return "GET", "/groups", None
+    if task == "group_detail":
+        return "GET", f"/groups/{group_id}" if group_id else "/groups", None
+    if task == "expenses":
+        return "GET", "/expenses", None
+    if task == "reports_summary":
+        return "GET", f"/reports/summary?user_id={user_id}", None
+    if task == "reports_monthly":
+        return "GET", f"/reports/monthly?user_id={user_id}&month={today.tm_mon}&year={today.tm_year}", None
+    if task == "expense_create":
+        return "POST", "/expense/create", {
+            "title": "Load test", "amount": str(rng.randint(10, 5000)),
+            "group_id": group_id or "", "split_type": "equal"
+        }
+    if task == "login":
+        return "POST", "/auth/login", {
+            "user_name_or_email": user["username"], "user_password": BENCH_PASSWORD
+        }
+    raise ValueError(task)
+
+
+# --mongomock starts from an empty database that `benchmarks.seed`, running
+# in another process, can't reach; a small one is seeded in process instead
+MOCK_SEED = {"users": 200, "groups": 60, "expenses": 5000, "max_group_size": 12}
+
+
+def seed_in_memory(application, seed_value):
+    from .seed import seed
+
+    with application.app_context():
+        from app.models import GetDB
+        result = seed(GetDB._get_db(), seed_value=seed_value, **MOCK_SEED)
+    print(f"Seeded mongomock {result}")
+    return result
+
+
+def pick_users(db, count, rng):
+    users = list(db.users.find({"email": {"$regex": "@bench.local$"}}, {"username": 1}).limit(count * 20))
+    if not users:
+        raise SystemExit("No benchmark users found, run `python -m benchmarks.seed` first.")
+
+    picked = []
+    for u in rng.sample(users, min(count, len(users))):
+        group_ids = [str(g["_id"]) for g in db.groups.find({"group_members": u["_id"]}, {"_id": 1}).limit(50)]
+        picked.append({"user_id": str(u["_id"]), "username": u["username"], "group_ids": group_ids})
+    return picked
+
+
+# -------------------------
+# DRIVERS
+# -------------------------
+def _queries_from(headers):
+    match = SERVER_TIMING_QUERIES.search(headers.get("Server-Timing", ""))
+    return int(match.group(1)) if match else None
+
+
+class FlaskDriver:
+
+    def __init__(self, application):
+        from app.routes.userAuth import SetAndGetSession
+        from config import Config
+
+        self.app = application
+        self._mint = SetAndGetSession
+        # Per-request query counts come back in the Server-Timing header
+        Config.SERVER_TIMING_ENABLED = True
+
+    def session(self, user):
+        client = self.app.test_client()
+        token = self._mint({"user_id": user["user_id"], "username": user["username"], "email": ""})["token"]
+        client.set_cookie("session_token", token)
+        return client
+
+    def request(self, client, task, method, path, form):
+        if task == "login":
+            client = self.app.test_client()
+
+        started = time.perf_counter()
+        if method == "GET":
+            response = client.get(path)
+        else:
+            response = client.post(path, data=form)
+        elapsed = time.perf_counter() - started
+        return elapsed, response.status_code < 400, _queries_from(response.headers)
+
+
+class HttpDriver:
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        # The server's auth limits apply here (run it with RATE_LIMIT_ENABLED=false);
+        # 429s count as errors and are reported after the run
+        self.rate_limited = 0
+
+    def _opener(self):
+        return urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def session(self, user):
+        opener = self._opener()
+        method, path, form = _task_request("login", user, random.Random())
+        opener.open(self.base_url + path, urllib.parse.urlencode(form).encode(), timeout=30).read()
+        return opener
+
+    def request(self, opener, task, method, path, form):
+        if task == "login":
+            opener = self._opener()
+
+        data = urllib.parse.urlencode(form).encode() if form is not None else None
+        started = time.perf_counter()
+        try:
+            with opener.open(self.base_url + path, data, timeout=30) as response:
+                response.read()
+                ok, headers = response.status < 400, response.headers
+        except urllib.error.HTTPError as e:
+            ok, headers = False, e.headers
+            if e.code == 429:
+                self.rate_limited += 1
+        except OSError:
+            ok, headers = False, {}
+        elapsed = time.perf_counter() - started
+        return elapsed, ok, _queries_from(headers)
+
+
+# -------------------------
+# RUNNER
+# -------------------------
+def run(driver, users, duration, seed_value=7, max_requests=None, scenario=SCENARIO):
+    samples = defaultdict(list)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    tasks, weights = zip(*scenario)
+    budget = [max_requests]
+
+    def virtual_user(index, user):
+        rng = random.Random(seed_value + index)
+        session = driver.session(user)
+        while time.perf_counter() < deadline:
+            with lock:
+                if budget[0] is not None:
+                    if budget[0] <= 0:
+                        return
+                    budget[0] -= 1
+            task = rng.choices(tasks, weights=weights)[0]
+            method, path, form = _task_request(task, user, rng)
+            row = driver.request(session, task, method, path, form)
+            with lock:
+                samples[task].append(row)
+
+    threads = [threading.Thread(target=virtual_user, args=(i, u), daemon=True) for i, u in enumerate(users)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    summary = summarize(samples, elapsed)
+    total = sum(len(rows) for rows in samples.values())
+    summary["_total"] = {
+        "count": total,
+        "errors": sum(r["errors"] for r in summary.values()),
+        "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0,
+        "rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "queries_per_request": None,
+    }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--driver", choices=["flask", "http"], default="flask")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=8, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--max-requests", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--mongomock", action="store_true")
+    parser.add_argument("--save", help="write results JSON (use as a baseline later)")
+    parser.add_argument("--compare", help="baseline JSON to compare p95 against")
+    parser.add_argument("--tolerance", type=float, default=15.0, help="allowed p95 regression in %%")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    application = create_bench_app(mongomock=args.mongomock)
+    if args.mongomock:
+        seed_in_memory(application, args.seed)
+    with application.app_context():
+        from app.models import GetDB
+        users = pick_users(GetDB._get_db(), args.users, rng)
+
+    if args.driver == "flask":
+        driver = FlaskDriver(application)
+    else:
+        driver = HttpDriver(args.base_url)
+
+    summary = run(driver, users, args.duration, seed_value=args.seed, max_requests=args.max_requests)
+    print_summary(summary)
+    if getattr(driver, "rate_limited", 0):
+        print(f"⚠️  {driver.rate_limited} requests were rate limited (429), counted as errors")
+
+    if args.save:
+        save_json(args.save, summary)
+
+    if args.compare:
+        regressions = compare(summary, load_json(args.compare), args.tolerance)
+        for name, before, after in regressions:
+            print(f"❌ {name}: p95 {before}ms → {after}ms")
+        if regressions:
+            raise SystemExit(1)
+        print("✅ No p95 regressions against baseline")
+
+    return summary
+
+
+if __name__ == "__main__":
+    main()
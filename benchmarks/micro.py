@@ -0,0 +1,144 @@
+"""
+Microbenchmarks for model hot paths, with regression thresholds.
+
+    python -m benchmarks.micro --save benchmarks/.micro_baseline.json
+    python -m benchmarks.micro --compare benchmarks/.micro_baseline.json --threshold 20
+    python -m benchmarks.micro -k calculate_split
+
+Every case is timed with timeit's autorange and the best of --repeat runs
+is kept, which filters out most scheduler noise on a developer machine.
+"""
+import argparse
+import random
+import timeit
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+from .common import load_json, save_json
+
+SPLIT_TYPES = ("equal", "paid_by_me", "paid_by_other", "custom")
+MEMBER_COUNTS = (2, 10, 100, 1000)
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 14; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Mobile Safari/537.36",
+]
+
+
+def _members(n):
+    return [str(ObjectId()) for _ in range(n)]
+
+
+def _expenses(rng, count, members_per_expense):
+    from app.models.expenseModel import ExpenseModel
+
+    members = _members(members_per_expense * 4)
+    docs = []
+    for _ in range(count):
+        split_members = rng.sample(members, members_per_expense)
+        docs.append({
+            "final_split": ExpenseModel.calculate_split(
+                rng.uniform(10, 5000), split_members, "equal", split_members[0]
+            )
+        })
+    return docs
+
+
+def build_cases():
+    from app.models.expenseModel import ExpenseModel
+    from app.models.groupModel import to_object_id
+    from app.routes.dashboard.reportRoute import create_excel
+    from app.utils.detact_device import get_readable_device
+
+    rng = random.Random(1)
+    cases = {}
+
+    for split_type in SPLIT_TYPES:
+        for n in MEMBER_COUNTS:
+            members = _members(n)
+            shares = {m: float(rng.randint(1, 10)) for m in members}
+            cases[f"calculate_split[{split_type}-{n}]"] = (
+                lambda m=members, st=split_type, sh=shares:
+                ExpenseModel.calculate_split(1234.56, m, st, m[0], custom_shares=sh)
+            )
+
+    for count, per in ((100, 4), (1000, 4), (1000, 50)):
+        docs = _expenses(rng, count, per)
+        cases[f"sum_net_balances[{count}x{per}]"] = lambda d=docs: ExpenseModel.sum_net_balances(d)
+
+    for n in (10, 100, 1000):
+        nets = {m: rng.uniform(-500, 500) for m in _members(n)}
+        drift = sum(nets.values())
+        first = next(iter(nets))
+        nets[first] -= drift  # a real split always nets to zero
+        cases[f"settle_debts[{n}]"] = lambda nt=nets: ExpenseModel.settle_debts(nt)
+
+    rows = [{
+        "group": "Trip", "title": f"Expense {i}", "amount": 100.0 + i,
+        "you_owe": 10.0, "you_are_owed": 0.0,
+        "date": (datetime(2025, 1, 1) + timedelta(days=i % 365)).strftime("%d-%b-%Y"),
+        "created_by": "user", "description": "", "split_with": ["a", "b", "c"],
+    } for i in range(1000)]
+    cases["create_excel[1000]"] = lambda r=rows: create_excel(r, "Bench")
+
+    for i, ua in enumerate(USER_AGENTS):
+        cases[f"get_readable_device[{i}]"] = lambda u=ua: get_readable_device(u)
+
+    oid = ObjectId()
+    cases["to_object_id[str]"] = lambda s=str(oid): to_object_id(s)
+    cases["to_object_id[oid]"] = lambda o=oid: to_object_id(o)
+    cases["to_object_id[dict]"] = lambda d={"_id": oid}: to_object_id(d)
+
+    return cases
+
+
+def time_case(fn, repeat):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="keyword", help="only run cases containing this text")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", help="write results JSON")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=20.0, help="allowed slowdown in %%")
+    args = parser.parse_args(argv)
+
+    baseline = load_json(args.compare) if args.compare else {}
+    results = {}
+    regressions = []
+
+    for name, fn in build_cases().items():
+        if args.keyword and args.keyword not in name:
+            continue
+
+        seconds = time_case(fn, args.repeat)
+        results[name] = {"us_per_call": round(seconds * 1e6, 3)}
+
+        line = f"{name:<40}{seconds * 1e6:>14.3f} µs"
+        before = baseline.get(name, {}).get("us_per_call")
+        if before:
+            change = (seconds * 1e6 - before) / before * 100
+            line += f"   {change:+7.1f}%"
+            if change > args.threshold:
+                regressions.append((name, before, seconds * 1e6))
+                line += "  ❌"
+        print(line)
+
+    if args.save:
+        save_json(args.save, results)
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} case(s) slower than {args.threshold}% over baseline")
+        raise SystemExit(1)
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Image bytes GET /groups makes a browser download, before and after the
+upload thumbnails exist (--groups cards, each with its own photo).
+
+    originals    the thumbnails have not been rendered yet, so every
+                 <img> falls back to the stored upload (what every card
+                 served before the upload pipeline)
+    thumbnails   after generate_thumbnails, as the worker leaves them
+
+    python -m benchmarks.page_weight --mongomock
+    python -m benchmarks.page_weight --groups 50 --photo-size 3024x4032 --save page_weight.json
+    python -m benchmarks.page_weight --image ~/phone-photo.jpg
+
+Photos are synthetic (gradients plus noise, so they compress like a
+photo rather than a flat fill) unless --image is given; --image is reused
+for every group, which content addressing stores and serves only once.
+Needs Pillow. Run from the repository root: uploads live under static/.
+The scratch user and groups, and the files this run wrote, are removed afterwards.
+"""
+import argparse
+import hashlib
+import io
+import os
+import random
+import re
+
+from bson import ObjectId
+
+from .common import create_bench_app, save_json
+from . import seed as seeder
+
+IMG_SRC_RE = re.compile(r'<img[^>]*\ssrc="([^"]+)"')
+
+
+def _synthetic_photo(Image, width, height):
+    # A new noise layer per call, so each group gets distinct bytes
+    r = Image.linear_gradient("L").resize((width, height))
+    g = Image.radial_gradient("L").resize((width, height))
+    b = Image.effect_noise((width, height), 48)
+    buffer = io.BytesIO()
+    Image.merge("RGB", (r, g, b)).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def _store(data, folder, ext, created):
+    # The name _store_original would pick, without queueing the thumbnails
+    os.makedirs(folder, exist_ok=True)
+    filename = f"{hashlib.sha256(data).hexdigest()}{ext}"
+    path = os.path.join(folder, filename)
+    if not os.path.exists(path):
+        with open(path, "wb") as fh:
+            fh.write(data)
+        created.append(path)
+    return filename
+
+
+def _seed(rng, photos, ext, originals):
+    from app.models import GetDB
+    from app.models.groupModel import GroupModel
+    from app.models.membershipModel import OWNER
+    from app.utils.save_photo import UPLOAD_FOLDER, PROFILE_UPLOAD_FOLDER
+
+    db = GetDB._get_db()
+    user = next(seeder.generate_users(rng, 1))
+    user["email"] = f"weight-{user['_id']}@bench.local"
+    user["username"] = f"weight-{user['_id']}"
+    user["profile_pic"] = f"/{PROFILE_UPLOAD_FOLDER}/{_store(photos[0], PROFILE_UPLOAD_FOLDER, ext, originals)}"
+    db.users.insert_one(user)
+
+    groups = []
+    for i, data in enumerate(photos):
+        group = GroupModel.build_group(
+            created_by=user["_id"], title=f"Weight Group {i}", description="Synthetic group with a photo",
+            group_photo=_store(data, UPLOAD_FOLDER, ext, originals), members=[str(user["_id"])]
+        )
+        group["_id"] = ObjectId()
+        groups.append(group)
+    db.groups.insert_many(groups)
+    db.memberships.insert_many([
+        {"user_id": user["_id"], "group_id": g["_id"], "role": OWNER,
+         "joined_at": g["created_at"], "last_activity": g["created_at"]}
+        for g in groups
+    ])
+    return db, user, groups
+
+
+def _cleanup(db, user, groups):
+    ids = [g["_id"] for g in groups]
+    db.memberships.delete_many({"group_id": {"$in": ids}})
+    db.groups.delete_many({"_id": {"$in": ids}})
+    db.users.delete_one({"_id": user["_id"]})
+
+
+def _image_bytes(html):
+    """(img tags, bytes of every src, bytes of each distinct src)"""
+    srcs = IMG_SRC_RE.findall(html)
+    sizes = {}
+    for src in set(srcs):
+        path = src.split("?", 1)[0].lstrip("/")
+        sizes[src] = os.path.getsize(path) if os.path.exists(path) else 0
+    return len(srcs), sum(sizes[src] for src in srcs), sum(sizes.values())
+
+
+def _measure(client):
+    from app.utils.cache import fragment_cache
+
+    # The group cards are cached with the image URLs they were rendered with
+    fragment_cache.clear()
+    response = client.get("/groups")
+    tags, total, unique = _image_bytes(response.get_data(as_text=True))
+    return {
+        "status": response.status_code,
+        "img_tags": tags,
+        "image_kb": round(total / 1024, 1),
+        "unique_image_kb": round(unique / 1024, 1),
+        "html_kb": round(len(response.get_data()) / 1024, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--groups", type=int, default=20)
+    parser.add_argument("--photo-size", default="2000x1500", help="WIDTHxHEIGHT of the synthetic photos")
+    parser.add_argument("--image", help="use this photo for every group instead")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongomock", action="store_true")
+    parser.add_argument("--save")
+    args = parser.parse_args(argv)
+
+    from app.utils.save_photo import Image, generate_thumbnails
+    if Image is None:
+        raise SystemExit("Pillow is required to render the thumbnails (pip install Pillow)")
+
+    if args.image:
+        with open(os.path.expanduser(args.image), "rb") as fh:
+            source = fh.read()
+        ext = os.path.splitext(args.image)[1].lower() or ".jpg"
+        photos = [source] * args.groups
+    else:
+        width, height = (int(v) for v in args.photo_size.lower().split("x"))
+        ext = ".jpg"
+        photos = [_synthetic_photo(Image, width, height) for _ in range(args.groups)]
+
+    application = create_bench_app(mongomock=args.mongomock)
+    rng = random.Random(args.seed)
+    from app.routes.userAuth import SetAndGetSession
+
+    db, user, groups = None, None, []
+    originals, thumbs = [], []
+    results = {"groups": args.groups, "original_kb": round(sum(map(len, photos)) / len(photos) / 1024, 1)}
+    try:
+        with application.app_context():
+            db, user, groups = _seed(rng, photos, ext, originals)
+            token = SetAndGetSession({"user_id": str(user["_id"]), "username": user["username"],
+                                      "email": user["email"]})["token"]
+
+        client = application.test_client()
+        client.set_cookie("session_token", token)
+        results["originals"] = _measure(client)
+        for path in originals:
+            thumbs += generate_thumbnails(path)
+        results["thumbnails"] = _measure(client)
+    finally:
+        if db is not None:
+            with application.app_context():
+                _cleanup(db, user, groups)
+        # Only what this run wrote; an --image already uploaded stays
+        for path in originals + thumbs:
+            os.remove(path)
+
+    before, after = results["originals"], results["thumbnails"]
+    results["reduction_pct"] = round(100 * (1 - after["unique_image_kb"] / before["unique_image_kb"]), 1) \
+        if before["unique_image_kb"] else None
+
+    print(f"{args.groups} groups, photos ~{results['original_kb']} KB each")
+    for name in ("originals", "thumbnails"):
+        r = results[name]
+        print(f"{name:<12} {r['img_tags']:>4} <img>  {r['unique_image_kb']:>10} KB of images "
+              f"({r['image_kb']} KB counting repeats)  html {r['html_kb']} KB  status {r['status']}")
+    print(f"image bytes on /groups down {results['reduction_pct']}%")
+
+    if args.save:
+        save_json(args.save, results)
+    if before["status"] != 200 or after["status"] != 200 or not after["img_tags"]:
+        raise SystemExit("FAILED: /groups did not render the group photos")
+    return results
+
+
+if __name__ == "__main__":
+    main()
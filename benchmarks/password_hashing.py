@@ -0,0 +1,159 @@
+"""
+Login throughput of password checks (app/utils/passwords.py).
+
+    cost      ms per hash for each --methods entry, to pick a cost that
+              lands near the latency budget of a login
+    inline    --threads request threads check passwords themselves
+              (PASSWORD_HASH_WORKERS=0, the old behaviour)
+    pool      the same threads hand the checks to --workers processes
+
+For inline and pool: logins per second, per core, and the latency of a
+small piece of Python work (--probe-ms apart) running next to them in
+the same process, i.e. what every other request of that worker feels
+while logins are being hashed.
+
+    rehash    a hash made with an older method is flagged by needs_rehash,
+              still verifies, and is not flagged once rehashed
+
+    python -m benchmarks.password_hashing
+    python -m benchmarks.password_hashing --threads 16 --workers 4 --seconds 10
+    python -m benchmarks.password_hashing --methods scrypt:16384:8:1 argon2:3:65536:4 --save hashing.json
+"""
+import argparse
+import os
+import threading
+import time
+
+from .common import BENCH_PASSWORD, percentile, save_json
+
+
+def run_cost(methods, rounds):
+    from app.utils.passwords import PasswordHasher, parse_method, argon2
+
+    results = {}
+    for method in methods:
+        if parse_method(method)[0] == "argon2" and argon2 is None:
+            results[method] = {"skipped": "argon2-cffi not installed"}
+            continue
+        hasher = PasswordHasher(method, workers=0)
+        stored = hasher.hash(BENCH_PASSWORD)
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            hasher.verify(stored, BENCH_PASSWORD)
+            timings.append(time.perf_counter() - started)
+        results[method] = {"p50_ms": round(percentile(timings, 50) * 1000, 1), "stored": stored.split("$")[0]}
+    return results
+
+
+def _probe(stop, interval, latencies):
+    # Stands in for the worker's other requests: a little pure-Python work
+    while not stop.is_set():
+        started = time.perf_counter()
+        sum(i * i for i in range(2000))
+        latencies.append(time.perf_counter() - started)
+        time.sleep(interval)
+
+
+def run_logins(method, workers, args):
+    from app.utils.passwords import PasswordHasher
+
+    hasher = PasswordHasher(method, workers=workers, max_pending=args.threads, timeout=60)
+    stored = hasher.hash(BENCH_PASSWORD)
+    if workers:
+        # Start the processes before the clock does
+        for _ in range(workers):
+            hasher.verify(stored, BENCH_PASSWORD)
+
+    stop = threading.Event()
+    counts = [0] * args.threads
+    failures = []
+    probe_latencies = []
+
+    def login(k):
+        while not stop.is_set():
+            if not hasher.verify(stored, BENCH_PASSWORD):
+                failures.append(k)
+            counts[k] += 1
+
+    threads = [threading.Thread(target=login, args=(k,), daemon=True) for k in range(args.threads)]
+    threads.append(threading.Thread(target=_probe, args=(stop, args.probe_ms / 1000, probe_latencies), daemon=True))
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    hasher.shutdown()
+
+    per_second = sum(counts) / elapsed
+    return {
+        "workers": workers,
+        "logins_per_second": round(per_second, 1),
+        "per_core": round(per_second / os.cpu_count(), 1),
+        "probe_p50_ms": round(percentile(probe_latencies, 50) * 1000, 2),
+        "probe_p99_ms": round(percentile(probe_latencies, 99) * 1000, 2),
+        "ok": not failures and sum(counts) > 0,
+    }
+
+
+def run_rehash(old_method, new_method):
+    from app.utils.passwords import PasswordHasher
+
+    old = PasswordHasher(old_method, workers=0).hash(BENCH_PASSWORD)
+    hasher = PasswordHasher(new_method, workers=0)
+    flagged = hasher.needs_rehash(old)
+    verifies = hasher.verify(old, BENCH_PASSWORD)
+    new = hasher.hash(BENCH_PASSWORD)
+    return {
+        "old": old.split("$")[0],
+        "new": new.split("$")[0],
+        "ok": flagged and verifies and not hasher.needs_rehash(new) and hasher.verify(new, BENCH_PASSWORD),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--method", default="scrypt:32768:8:1", help="method for the throughput runs")
+    parser.add_argument("--methods", nargs="+",
+                        default=["pbkdf2:sha256:600000", "scrypt:16384:8:1", "scrypt:32768:8:1",
+                                 "scrypt:65536:8:1", "argon2:3:65536:4"])
+    parser.add_argument("--threads", type=int, default=8, help="request threads logging in")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--probe-ms", type=float, default=5)
+    parser.add_argument("--save")
+    args = parser.parse_args(argv)
+
+    results = {
+        "cores": os.cpu_count(),
+        "cost": run_cost(args.methods, args.rounds),
+        "inline": run_logins(args.method, 0, args),
+        "pool": run_logins(args.method, args.workers, args),
+        "rehash": run_rehash("pbkdf2:sha256:600000", args.method),
+    }
+
+    print(f"{results['cores']} cores, {args.threads} login threads, {args.method}")
+    for method, r in results["cost"].items():
+        print(f"cost     {method:24} " + (r["skipped"] if "skipped" in r else f"{r['p50_ms']} ms"))
+    for name in ("inline", "pool"):
+        r = results[name]
+        print(f"{name:8} {r['logins_per_second']} logins/s  {r['per_core']} per core  "
+              f"other work p50 {r['probe_p50_ms']} ms  p99 {r['probe_p99_ms']} ms"
+              + (f"  ({r['workers']} processes)" if r["workers"] else ""))
+    print(f"rehash   {results['rehash']['old']} -> {results['rehash']['new']}")
+
+    failed = [name for name in ("inline", "pool", "rehash") if not results[name]["ok"]]
+    if args.save:
+        save_json(args.save, results)
+    if failed:
+        raise SystemExit(f"FAILED: {', '.join(failed)}")
+    print("ok: every check verified")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Tail latency under connection pool saturation.
+
+Many threads hammer the dashboard's heaviest read while the pool is capped
+at a few sizes. When threads outnumber connections they queue for a
+checkout, which shows up in the pool wait percentiles and, past
+MONGO_WAIT_QUEUE_TIMEOUT_MS, as errors.
+
+    python -m benchmarks.pool_saturation --pool-sizes 5,20,50 --threads 100 --requests 3000
+
+Needs a real mongod seeded with `python -m benchmarks.seed`; mongomock
+has no connection pool, so the wait columns stay at zero there.
+"""
+import argparse
+import random
+import threading
+import time
+
+from .common import create_bench_app, percentile, save_json
+from .load_test import pick_users
+
+
+def _run_size(pool_size, args, users):
+    application = create_bench_app(mongomock=args.mongomock)
+    # The client is created lazily, so this takes effect on first use
+    application.config["MONGO_MAX_POOL_SIZE"] = pool_size
+    application.config["MONGO_MIN_POOL_SIZE"] = min(application.config["MONGO_MIN_POOL_SIZE"], pool_size)
+    application.config["MONGO_WAIT_QUEUE_TIMEOUT_MS"] = args.wait_queue_timeout_ms
+
+    from app.models.expenseModel import ExpenseModel
+    from app.utils.instrumentation import pool_monitor
+
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    budget = [args.requests]
+
+    def worker(index):
+        rng = random.Random(args.seed + index)
+        with application.app_context():
+            while True:
+                with lock:
+                    if budget[0] <= 0:
+                        return
+                    budget[0] -= 1
+                user = rng.choice(users)
+                started = time.perf_counter()
+                try:
+                    ExpenseModel.get_expenses_for_user(user["user_id"])
+                    ok = True
+                except Exception:
+                    ok = False
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    if not ok:
+                        errors[0] += 1
+
+    # Warm the pool up to minPoolSize so the first requests don't skew it
+    with application.app_context():
+        ExpenseModel.get_expenses_for_user(users[0]["user_id"])
+    pool_monitor.reset()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    pool = pool_monitor.snapshot()
+    return {
+        "pool_size": pool_size,
+        "count": len(latencies),
+        "errors": errors[0],
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "wait_p95_ms": pool["wait_ms"]["p95"],
+        "wait_p99_ms": pool["wait_ms"]["p99"],
+        "checkout_failures": sum(pool["checkout_failures"].values()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pool-sizes", default="5,20,50", help="comma separated maxPoolSize values")
+    parser.add_argument("--threads", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=3000, help="per pool size")
+    parser.add_argument("--users", type=int, default=200, help="distinct benchmark users to query")
+    parser.add_argument("--wait-queue-timeout-ms", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--mongomock", action="store_true")
+    parser.add_argument("--save", help="write results JSON")
+    args = parser.parse_args(argv)
+
+    application = create_bench_app(mongomock=args.mongomock)
+    with application.app_context():
+        from app.models import GetDB
+        users = pick_users(GetDB._get_db(), args.users, random.Random(args.seed))
+
+    rows = [_run_size(int(size), args, users) for size in args.pool_sizes.split(",")]
+
+    header = f"{'pool':>6}{'count':>8}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'wait p95':>10}{'wait p99':>10}"
+    print(f"{args.threads} threads, waitQueueTimeoutMS={args.wait_queue_timeout_ms}")
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(
+            f"{r['pool_size']:>6}{r['count']:>8}{r['errors']:>6}{r['rps']:>9}{r['p50_ms']:>10}"
+            f"{r['p95_ms']:>10}{r['p99_ms']:>10}{r['wait_p95_ms']:>10}{r['wait_p99_ms']:>10}"
+        )
+
+    if args.save:
+        save_json(args.save, rows)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
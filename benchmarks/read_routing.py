@@ -0,0 +1,119 @@
+"""
+Check read routing against a local replica set.
+
+Start a three member set and seed it:
+
+    for p in 27017 27018 27019; do
+        mkdir -p /tmp/rs0-$p && mongod --replSet rs0 --port $p --dbpath /tmp/rs0-$p --fork --logpath /tmp/rs0-$p.log
+    done
+    mongosh --port 27017 --eval 'rs.initiate({_id: "rs0", members: [
+        {_id: 0, host: "localhost:27017"}, {_id: 1, host: "localhost:27018"}, {_id: 2, host: "localhost:27019"}]})'
+    export MONGO_URI="mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0"
+    python -m benchmarks.seed --users 50 --groups 20 --expenses 2000
+
+then run
+
+    python -m benchmarks.read_routing
+
+It records which member served every command and checks that:
+
+  * report and dashboard aggregates go to a secondary,
+  * writes and plain reads stay on the primary,
+  * after create_expense the same client reads its aggregates from the
+    primary until the read-your-writes window runs out.
+"""
+import argparse
+import random
+import threading
+from collections import Counter
+
+from pymongo import monitoring
+
+from .common import create_bench_app
+from .load_test import FlaskDriver, pick_users
+
+
+class ServedBy(monitoring.CommandListener):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows = []
+
+    def started(self, event):
+        with self.lock:
+            self.rows.append((event.command_name, event.connection_id))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def take(self):
+        with self.lock:
+            rows, self.rows = self.rows, []
+        return rows
+
+
+def _tally(rows, primary):
+    tally = Counter()
+    for command_name, address in rows:
+        if command_name in ("ping", "hello", "isMaster", "endSessions"):
+            continue
+        tally[(command_name, "primary" if address == primary else "secondary")] += 1
+    return tally
+
+
+def _check(label, tally, command_name, member):
+    ok = tally[(command_name, member)] > 0
+    print(f"{'✅' if ok else '❌'} {label}: {command_name} on {member}  {dict(tally)}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    # Global listeners apply to clients created afterwards, i.e. the app's lazy one
+    served_by = ServedBy()
+    monitoring.register(served_by)
+
+    application = create_bench_app()
+    with application.app_context():
+        from app.models import GetDB
+        db = GetDB._get_db()
+        primary = db.client.primary
+        if primary is None or not db.client.secondaries:
+            raise SystemExit("MONGO_URI must point at a replica set with at least one secondary.")
+        user = pick_users(db, 1, random.Random(args.seed))[0]
+
+    driver = FlaskDriver(application)
+    client = driver.session(user)
+    results = []
+
+    served_by.take()
+    client.get(f"/reports/summary?user_id={user['user_id']}")
+    results.append(_check("report summary", _tally(served_by.take(), primary), "find", "secondary"))
+
+    client.get("/dashboard")
+    tally = _tally(served_by.take(), primary)
+    results.append(_check("dashboard aggregates", tally, "aggregate", "secondary"))
+    results.append(_check("dashboard user reads", tally, "find", "primary"))
+
+    client.post("/expense/create", data={
+        "title": "Routing check", "amount": "42",
+        "group_id": user["group_ids"][0] if user["group_ids"] else "", "split_type": "equal"
+    })
+    results.append(_check("create expense", _tally(served_by.take(), primary), "insert", "primary"))
+
+    client.get("/dashboard")
+    tally = _tally(served_by.take(), primary)
+    results.append(_check("dashboard after write", tally, "aggregate", "primary"))
+
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Synthetic data generator: users, groups with skewed member counts and
+expenses spread across every split type, inserted in batches.
+
+    python -m benchmarks.seed --users 5000 --groups 2000 --expenses 1000000 --drop
+"""
+import argparse
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from werkzeug.security import generate_password_hash
+
+from .common import BENCH_PASSWORD, create_bench_app
+
+SPLIT_TYPES = ["equal", "paid_by_me", "paid_by_other", "custom"]
+SPLIT_WEIGHTS = [50, 25, 10, 15]
+EXPENSE_TITLES = ["Dinner", "Groceries", "Cab", "Hotel", "Fuel", "Movie", "Rent", "Snacks", "Tickets", "Coffee"]
+
+
+def _group_size(rng, max_size):
+    # Pareto: most groups have 2-6 members, a long tail goes into the hundreds
+    return min(max_size, 2 + int(rng.paretovariate(1.2)))
+
+
+def _insert_batches(collection, docs, batch_size):
+    batch = []
+    inserted = 0
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            collection.insert_many(batch, ordered=False)
+            inserted += len(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+        inserted += len(batch)
+    return inserted
+
+
+def generate_users(rng, count):
+    from app.models.userModel import UserModel
+
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    for i in range(count):
+        yield UserModel.build_user(
+            email=f"user{i}@bench.local",
+            username=f"user{i}",
+            full_name=f"Bench User {i}",
+            phone_no=f"9{rng.randrange(10**9, 10**10)}",
+            password_hash=password_hash,
+            extra_fields={"_id": ObjectId(), "isVerified": True, "2fa_enabled": False}
+        )
+
+
+def generate_groups(rng, user_ids, count, max_size):
+    from app.models.groupModel import GroupModel
+
+    for i in range(count):
+        size = _group_size(rng, max_size)
+        members = rng.sample(user_ids, min(size, len(user_ids)))
+        doc = GroupModel.build_group(
+            created_by=members[0],
+            title=f"Bench Group {i}",
+            description="Synthetic benchmark group",
+            members=[str(m) for m in members]
+        )
+        doc["_id"] = ObjectId()
+        yield doc
+
+
+def generate_expenses(rng, groups, count, days):
+    from app.models.expenseModel import ExpenseModel
+
+    # Activity is skewed as well: a few groups get most of the expenses
+    cum_weights = list(itertools.accumulate(rng.paretovariate(1.1) for _ in groups))
+    now = datetime.utcnow()
+
+    for _ in range(count):
+        group = rng.choices(groups, cum_weights=cum_weights)[0]
+        members = [str(m) for m in group["group_members"]]
+        split_type = rng.choices(SPLIT_TYPES, weights=SPLIT_WEIGHTS)[0]
+        payer = rng.choice(members)
+        amount = round(min(rng.lognormvariate(6, 1.2), 500000), 2)
+
+        custom_shares = {}
+        custom_payments = {m: 0.0 for m in members}
+        if split_type == "custom":
+            custom_shares = {m: float(rng.randint(1, 10)) for m in members}
+        custom_payments[payer] = amount
+
+        final_split = ExpenseModel.calculate_split(
+            amount=amount,
+            members=members,
+            split_type=split_type,
+            payer=payer,
+            custom_shares=custom_shares,
+            custom_payments=custom_payments
+        )
+
+        yield ExpenseModel.build_document({
+            "title": rng.choice(EXPENSE_TITLES),
+            "amount": amount,
+            "group_id": str(group["_id"]),
+            "created_by": payer,
+            "split_type": split_type,
+            "split_with": members,
+            "custom_payments": custom_payments,
+            "custom_shares": custom_shares,
+            "final_split": final_split,
+            "description": "",
+            "created_at": now - timedelta(seconds=rng.uniform(0, days * 86400)),
+        })
+
+
+def seed(db, users=1000, groups=300, expenses=100000, max_group_size=1000,
+         days=730, batch_size=5000, seed_value=42, drop=False):
+    rng = random.Random(seed_value)
+
+    if drop:
+        for name in ("users", "groups", "expenses"):
+            db.drop_collection(name)
+
+    started = time.perf_counter()
+    user_docs = list(generate_users(rng, users))
+    _insert_batches(db.users, user_docs, batch_size)
+    user_ids = [u["_id"] for u in user_docs]
+
+    group_docs = list(generate_groups(rng, user_ids, groups, max_group_size))
+    _insert_batches(db.groups, group_docs, batch_size)
+
+    inserted = _insert_batches(db.expenses, generate_expenses(rng, group_docs, expenses, days), batch_size)
+
+    return {
+        "users": len(user_docs),
+        "groups": len(group_docs),
+        "expenses": inserted,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--groups", type=int, default=300)
+    parser.add_argument("--expenses", type=int, default=100000)
+    parser.add_argument("--max-group-size", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=730, help="spread expenses over this many days")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--drop", action="store_true", help="drop users/groups/expenses first")
+    parser.add_argument("--mongomock", action="store_true")
+    args = parser.parse_args(argv)
+
+    application = create_bench_app(mongomock=args.mongomock)
+    with application.app_context():
+        from app.models import GetDB
+        result = seed(
+            GetDB._get_db(),
+            users=args.users, groups=args.groups, expenses=args.expenses,
+            max_group_size=args.max_group_size, days=args.days,
+            batch_size=args.batch_size, seed_value=args.seed, drop=args.drop
+        )
+    print(f"✅ Seeded {result}")
+    return result
+
+
+if __name__ == "__main__":
+    main()
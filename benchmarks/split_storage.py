@@ -0,0 +1,130 @@
+"""
+Storage and index size of the compact splits array vs the v2 nested maps.
+
+The same synthetic expenses are written twice, once per layout, into
+scratch collections, each with the index its member lookups use:
+
+    v2: split_with + final_split + custom_payments + custom_shares, index { split_with: 1 }
+    v3: splits: [{u, s, p}],                                          index { splits.u: 1 }
+
+    python -m benchmarks.split_storage --expenses 1000000
+    python -m benchmarks.split_storage --expenses 1000000 --save split_storage.json
+
+Needs a real mongod (collStats); the scratch collections are dropped
+afterwards unless --keep is given.
+"""
+import argparse
+import random
+import time
+
+from bson import ObjectId
+
+from .common import create_bench_app, save_json
+from . import seed as seeder
+
+LAYOUTS = {
+    "v2": ("bench_expenses_v2", [("split_with", 1)]),
+    "v3": ("bench_expenses_v3", [("splits.u", 1)]),
+}
+
+
+def as_v2(doc):
+    """Re-encode a current (v3) expense the way schema v2 stored it."""
+    from app.models.expenseModel import ExpenseModel
+
+    doc = ExpenseModel.hydrate(dict(doc))
+    doc["group_id"] = ObjectId(doc["group_id"])
+    doc["created_by"] = ObjectId(doc["created_by"])
+    doc["split_with"] = [ObjectId(u) for u in doc["split_with"]]
+    doc["schema_version"] = 2
+    return doc
+
+
+def _stats(db, name):
+    stats = db.command("collStats", name)
+    return {
+        "count": stats["count"],
+        "avg_obj_bytes": stats.get("avgObjSize", 0),
+        "data_mb": round(stats["size"] / 2 ** 20, 2),
+        "storage_mb": round(stats["storageSize"] / 2 ** 20, 2),
+        "index_mb": {k: round(v / 2 ** 20, 2) for k, v in stats["indexSizes"].items()},
+    }
+
+
+def _time_member_lookups(collection, field, user_ids, rounds):
+    started = time.perf_counter()
+    for uid in user_ids[:rounds]:
+        list(collection.find({field: uid}, {"_id": 1}))
+    return round((time.perf_counter() - started) / max(min(rounds, len(user_ids)), 1) * 1000, 3)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--expenses", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--groups", type=int, default=1500)
+    parser.add_argument("--max-group-size", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=200, help="member lookups to time per layout")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true")
+    parser.add_argument("--save")
+    args = parser.parse_args(argv)
+
+    application = create_bench_app()
+    rng = random.Random(args.seed)
+
+    with application.app_context():
+        from app.models import GetDB
+        db = GetDB._get_db()
+
+        for name, _ in LAYOUTS.values():
+            db.drop_collection(name)
+
+        users = list(seeder.generate_users(rng, args.users))
+        user_ids = [u["_id"] for u in users]
+        groups = list(seeder.generate_groups(rng, user_ids, args.groups, args.max_group_size))
+
+        started = time.perf_counter()
+        batch_v2, batch_v3 = [], []
+        for doc in seeder.generate_expenses(rng, groups, args.expenses, days=730):
+            doc["_id"] = ObjectId()
+            batch_v3.append(doc)
+            batch_v2.append(as_v2(doc))
+            if len(batch_v3) >= args.batch_size:
+                db[LAYOUTS["v3"][0]].insert_many(batch_v3, ordered=False)
+                db[LAYOUTS["v2"][0]].insert_many(batch_v2, ordered=False)
+                batch_v2, batch_v3 = [], []
+        if batch_v3:
+            db[LAYOUTS["v3"][0]].insert_many(batch_v3, ordered=False)
+            db[LAYOUTS["v2"][0]].insert_many(batch_v2, ordered=False)
+        print(f"Wrote {args.expenses} expenses per layout in {time.perf_counter() - started:.1f}s")
+
+        results = {}
+        sample = rng.sample(user_ids, min(args.lookups, len(user_ids)))
+        for layout, (name, keys) in LAYOUTS.items():
+            db[name].create_index(keys)
+            results[layout] = _stats(db, name)
+            results[layout]["member_lookup_ms"] = _time_member_lookups(db[name], keys[0][0], sample, args.lookups)
+
+        if not args.keep:
+            for name, _ in LAYOUTS.values():
+                db.drop_collection(name)
+
+    v2, v3 = results["v2"], results["v3"]
+    print(f"{'':<22}{'v2 maps':>14}{'v3 splits':>14}{'saved':>10}")
+    for label, key in (("avg document (B)", "avg_obj_bytes"), ("data (MB)", "data_mb"), ("storage (MB)", "storage_mb")):
+        saved = 100 * (1 - v3[key] / v2[key]) if v2[key] else 0
+        print(f"{label:<22}{v2[key]:>14}{v3[key]:>14}{saved:>9.1f}%")
+    member_index_v2 = next(v for k, v in v2["index_mb"].items() if k != "_id_")
+    member_index_v3 = next(v for k, v in v3["index_mb"].items() if k != "_id_")
+    print(f"{'member index (MB)':<22}{member_index_v2:>14}{member_index_v3:>14}")
+    print(f"{'member lookup (ms)':<22}{v2['member_lookup_ms']:>14}{v3['member_lookup_ms']:>14}")
+
+    if args.save:
+        save_json(args.save, results)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Fan-out cost of live balance updates (app/utils/live.py).
+
+Subscribes --subscribers clients of one worker to a group and pushes
+--events balance changes through the broker, the way the dispatcher does
+after a write: recompute once, diff, encode once, one put per client.
+
+    fanout      refresh() -> every queue, ms per event and us per subscriber
+    end_to_end  notify() -> dispatcher thread -> the last of --readers
+                reader threads has the frame (debounce excluded)
+    overflow    clients that never read: queues fill, the broker counts the
+                drops and the snapshot still holds the latest balances
+
+Every subscriber must receive every frame exactly once, in order;
+the run fails otherwise.
+
+    python -m benchmarks.sse_fanout --subscribers 10000
+    python -m benchmarks.sse_fanout --subscribers 50000 --events 50 --save sse_fanout.json
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+from .common import percentile, save_json
+
+
+class FakeGroup:
+    """Stands in for the group's balance read: a few members move per write."""
+
+    def __init__(self, rng, members):
+        self.rng = rng
+        self.version = 1
+        self.balances = {f"user{i}": 0.0 for i in range(members)}
+
+    def write(self):
+        payer, other = self.rng.sample(sorted(self.balances), 2)
+        amount = round(self.rng.uniform(1, 500), 2)
+        self.balances[payer] = round(self.balances[payer] + amount, 2)
+        self.balances[other] = round(self.balances[other] - amount, 2)
+        self.version += 1
+
+    def load(self, group_id):
+        return self.version, dict(self.balances)
+
+
+def _check(frames, versions):
+    seen = [json.loads(f.split(b"data: ", 1)[1])["version"] for f in frames]
+    return seen == versions
+
+
+def run_fanout(args, rng):
+    from app.utils.live import LiveBroker
+
+    group = FakeGroup(rng, args.members)
+    broker = LiveBroker(queue_size=args.events + 1, debounce=0, load=group.load)
+
+    started = time.perf_counter()
+    subscriptions = [broker.subscribe("g1", group.version, group.balances) for _ in range(args.subscribers)]
+    subscribe_ms = (time.perf_counter() - started) * 1000
+
+    timings, sizes, versions = [], [], []
+    for _ in range(args.events):
+        group.write()
+        versions.append(group.version)
+        started = time.perf_counter()
+        delta = broker.refresh("g1")
+        timings.append(time.perf_counter() - started)
+        sizes.append(len(json.dumps(delta, separators=(",", ":"))))
+
+    ok = all(_check([s.queue.get_nowait() for _ in range(s.queue.qsize())], versions) for s in subscriptions)
+    per_event = percentile(timings, 50)
+    return {
+        "subscribers": args.subscribers,
+        "subscribe_ms": round(subscribe_ms, 1),
+        "p50_ms": round(per_event * 1000, 2),
+        "p95_ms": round(percentile(timings, 95) * 1000, 2),
+        "us_per_subscriber": round(per_event * 1e6 / args.subscribers, 3),
+        "delta_bytes": round(sum(sizes) / len(sizes)),
+        "full_bytes": len(json.dumps(group.balances, separators=(",", ":"))),
+        "delivered": broker.delivered,
+        "expected": args.subscribers * args.events,
+        "ok": ok and broker.delivered == args.subscribers * args.events,
+    }
+
+
+def run_end_to_end(args, rng):
+    from app.utils.live import LiveBroker
+
+    group = FakeGroup(rng, args.members)
+    broker = LiveBroker(queue_size=args.events + 1, debounce=0, load=group.load)
+    subscriptions = [broker.subscribe("g1", group.version, group.balances) for _ in range(args.subscribers)]
+
+    # Each reader thread owns a slice of the clients, like request threads would
+    received = [[] for _ in subscriptions]
+    done = threading.Barrier(args.readers + 1)
+
+    def reader(indexes):
+        for _ in range(args.events):
+            for i in indexes:
+                received[i].append(subscriptions[i].next(timeout=10))
+            done.wait()
+
+    readers = [
+        threading.Thread(target=reader, args=(range(k, args.subscribers, args.readers),), daemon=True)
+        for k in range(args.readers)
+    ]
+    for t in readers:
+        t.start()
+
+    latencies, versions = [], []
+    for _ in range(args.events):
+        group.write()
+        versions.append(group.version)
+        started = time.perf_counter()
+        broker.notify("g1")
+        done.wait()
+        latencies.append(time.perf_counter() - started)
+
+    ok = all(None not in frames and _check(frames, versions) for frames in received)
+    return {
+        "readers": args.readers,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "ok": ok,
+    }
+
+
+def run_overflow(args, rng):
+    from app.utils.live import LiveBroker
+
+    group = FakeGroup(rng, args.members)
+    broker = LiveBroker(queue_size=4, debounce=0, load=group.load)
+    subscriptions = [broker.subscribe("g1", group.version, group.balances) for _ in range(args.subscribers)]
+    for _ in range(10):
+        group.write()
+        broker.refresh("g1")
+
+    version, balances = broker.snapshot("g1")
+    return {
+        "overflows": broker.overflows,
+        "all_flagged": all(s.overflowed for s in subscriptions),
+        "ok": (broker.overflows == args.subscribers * 6 and version == group.version
+               and balances == group.balances),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--members", type=int, default=12)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    results = {
+        "fanout": run_fanout(args, rng),
+        "end_to_end": run_end_to_end(args, rng),
+        "overflow": run_overflow(args, rng),
+    }
+
+    f, e, o = results["fanout"], results["end_to_end"], results["overflow"]
+    print(f"{args.subscribers} subscribers, {args.events} events, {args.members} members")
+    print(f"subscribe    {f['subscribe_ms']} ms total")
+    print(f"fanout       p50 {f['p50_ms']} ms  p95 {f['p95_ms']} ms  "
+          f"{f['us_per_subscriber']} us/subscriber  {f['delivered']}/{f['expected']} frames  "
+          f"delta {f['delta_bytes']} B vs full {f['full_bytes']} B")
+    print(f"end_to_end   p50 {e['p50_ms']} ms  p95 {e['p95_ms']} ms  ({e['readers']} reader threads)")
+    print(f"overflow     {o['overflows']} dropped frames, all flagged for a snapshot: {o['all_flagged']}")
+
+    failed = [name for name, r in results.items() if not r["ok"]]
+    if args.save:
+        save_json(args.save, results)
+    if failed:
+        raise SystemExit(f"FAILED: {', '.join(failed)}")
+    print("ok: every subscriber got every frame")
+    return results
+
+
+if __name__ == "__main__":
+    main()
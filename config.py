@@ -17,6 +17,19 @@ class Config:
     MONGO_URI = get_required_env("MONGO_URI")
     MONGO_DBNAME = get_required_env("MONGO_DBNAME")
 
+    # Connection Pool (per worker process)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+    MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 50))
+    MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 2))
+    MONGO_MAX_IDLE_TIME_MS = int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", 5 * 60 * 1000))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000))
+    MONGO_COMPRESSORS = os.environ.get("MONGO_COMPRESSORS", "zstd,snappy,zlib")  # only installed ones are used
+
+    # Read Routing (analytics reads may go to secondaries with bounded staleness)
+    ANALYTICS_READ_PREFERENCE = os.environ.get("ANALYTICS_READ_PREFERENCE", "secondaryPreferred")
+    ANALYTICS_MAX_STALENESS_SECONDS = int(os.environ.get("ANALYTICS_MAX_STALENESS_SECONDS", 90))  # 90 is the driver minimum
+    READ_YOUR_WRITES_SECONDS = int(os.environ.get("READ_YOUR_WRITES_SECONDS", 30))
+
     # Email Configuration
     SMTP_EMAIL = get_required_env("SMTP_EMAIL")
     SMTP_PASS = get_required_env("SMTP_PASS")
@@ -25,8 +38,112 @@ class Config:
     # The fix: Ensure the string is available before converting to int
     SMTP_PORT = int(get_required_env("SMTP_PORT"))
 
-    # Otp Expire Timing
+    # Logging & Instrumentation
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+    N_PLUS_ONE_THRESHOLD = int(os.environ.get("N_PLUS_ONE_THRESHOLD", 5))
+    # Re-encodes every reply as BSON to measure it; off unless investigating payload sizes
+    INSTRUMENT_REPLY_BYTES = os.environ.get("INSTRUMENT_REPLY_BYTES", "false").lower() == "true"
+    SERVER_TIMING_ENABLED = os.environ.get("SERVER_TIMING_ENABLED", "false").lower() == "true"
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+    # Profiling (all of these can be changed at runtime via /debug/profiling)
+    PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", 0.01))
+    PROFILING_ENGINE = os.environ.get("PROFILING_ENGINE", "cprofile")
+    PROFILING_MIN_DURATION_MS = float(os.environ.get("PROFILING_MIN_DURATION_MS", 0))
+    PROFILING_DUMP_DIR = os.environ.get("PROFILING_DUMP_DIR", "instance/profiles")
+    PROFILING_MAX_DUMPS = int(os.environ.get("PROFILING_MAX_DUMPS", 200))
+    PROFILING_ADMIN_TOKEN = os.environ.get("PROFILING_ADMIN_TOKEN")
+    SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 100))
+
+    # Upload Processing
+    UPLOAD_THUMBNAIL_SIZES = (64, 256)
+    BACKGROUND_WORKERS = int(os.environ.get("BACKGROUND_WORKERS", 2))
+
+    # Static Assets (fingerprinted URLs are cached for a year)
+    STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+    # Response Compression & Fragment Cache
+    COMPRESS_MIN_BYTES = 500
+    COMPRESS_LEVEL = 6
+    FRAGMENT_CACHE_SIZE = int(os.environ.get("FRAGMENT_CACHE_SIZE", 2048))
+    FRAGMENT_CACHE_TTL = 10 * 60
+
+    # Query Fan-out (independent reads of one request run side by side)
+    QUERY_EXECUTOR_WORKERS = int(os.environ.get("QUERY_EXECUTOR_WORKERS", 16))
+    QUERY_TIMEOUT_SECONDS = float(os.environ.get("QUERY_TIMEOUT_SECONDS", 10))
+
+    # Async Views (dashboard & report summary issue their queries concurrently)
+    ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", "false").lower() == "true"
+
+    # Expense Archive (expenses older than this move to the cold collection)
+    ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", 365))
+
+    # Balance Checkpoints (written on settle-up; expenses younger than the
+    # lag may still be in flight and are always read as deltas)
+    CHECKPOINT_LAG_SECONDS = 60
+
+    # Live Balance Updates (SSE): "auto" adds a change-stream watcher per worker
+    # when the deployment supports it, "local" only sees this worker's writes.
+    # Every open group page holds one request thread for as long as it stays
+    # open, so only turn this on under async workers (gunicorn -k gevent);
+    # with sync or threaded workers a few open tabs use up a worker.
+    LIVE_UPDATES = os.environ.get("LIVE_UPDATES", "off").lower()  # auto | local | off
+    LIVE_HEARTBEAT_SECONDS = int(os.environ.get("LIVE_HEARTBEAT_SECONDS", 20))
+    LIVE_QUEUE_SIZE = 32  # frames a slow client may fall behind before it gets a snapshot
+    LIVE_DEBOUNCE_MS = 250
+
+    # Expense Event Projections (fed from expense_events after each write).
+    # Off by default: pages read balances from the checkpoints
+    # (settlementModel.py), not the projections; turn it on, or run
+    # `flask project-events` from cron, only where something reads them.
+    PROJECTIONS_LIVE = os.environ.get("PROJECTIONS_LIVE", "false").lower() == "true"
+    PROJECTION_BATCH_SIZE = 1000
+
+    # Otp Settings
     OTP_TTL_SECONDS = 5 * 60
+    OTP_LENGTH = 6
+    OTP_MAX_ATTEMPTS = 5  # wrong codes before the OTP is burned
+    OTP_SECRET = os.environ.get("OTP_SECRET")  # HMAC key for stored codes, defaults to SECRET_KEY
+
+    # Group Memberships (memberships collection next to groups.group_members).
+    # Reads switch to it once `flask backfill-memberships` has run.
+    MEMBERSHIP_READS = os.environ.get("MEMBERSHIP_READS", "false").lower() == "true"
+    MEMBERSHIP_ACTIVITY_RESOLUTION_SECONDS = 60  # how stale "last activity" may get before a rewrite
+    GROUPS_PAGE_SIZE = 20
+    # Large groups: pages show this many members (all of them in smaller
+    # groups) and page through the rest at /api/v1/groups/<id>/members
+    MEMBER_PREVIEW_SIZE = 50
+
+    # Pending Signups (server-side until the email OTP is verified)
+    PENDING_SIGNUP_TTL_SECONDS = 30 * 60
+
+    # Auth Rate Limits: (requests, per seconds), counted in a sliding window
+    # per client IP and per account (see utils/rate_limit.py).
+    # "mongo" shares the counters between workers, "memory" keeps them per worker.
+    RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_STORAGE = os.environ.get("RATE_LIMIT_STORAGE", "mongo")  # mongo | memory
+    RATE_LIMIT_LOGIN = (20, 60)
+    RATE_LIMIT_LOGIN_ACCOUNT = (10, 15 * 60)
+    RATE_LIMIT_SIGNUP = (5, 60 * 60)
+    RATE_LIMIT_OTP_VERIFY = (10, 5 * 60)
+    RATE_LIMIT_OTP_VERIFY_ACCOUNT = (10, 5 * 60)
+    RATE_LIMIT_OTP_RESEND = (5, 10 * 60)
+    RATE_LIMIT_OTP_RESEND_ACCOUNT = (3, 10 * 60)
+
+    # Account Lockout (wrong passwords in a row before login is refused)
+    LOGIN_MAX_FAILURES = 5
+    LOGIN_LOCKOUT_SECONDS = 15 * 60
+
+    # Password Hashing: any werkzeug method ("scrypt:N:r:p", "pbkdf2:sha256:iterations")
+    # or "argon2:time_cost:memory_kib:parallelism" with argon2-cffi installed.
+    # Changing it rehashes each user's password on their next login.
+    # Hashes run on PASSWORD_HASH_WORKERS processes per worker (0 = inline);
+    # past PASSWORD_HASH_MAX_PENDING waiting ones, requests get a 503.
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 16))
+    PASSWORD_HASH_TIMEOUT_SECONDS = float(os.environ.get("PASSWORD_HASH_TIMEOUT_SECONDS", 5))
 
     # JWT Configuration
     JWT_SECRET = get_required_env("JWT_SECRET")
\ No newline at end of file
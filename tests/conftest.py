@@ -0,0 +1,84 @@
+"""
+Shared fixtures. The app runs against mongomock's in-memory stand-in for
+MongoDB, so the suite needs no mongod:
+
+    python -m pytest -q
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Before config.py is imported (load_dotenv doesn't override these)
+os.environ["MONGO_URI"] = "mongodb://localhost:27017"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ.setdefault("FLASK_SECRET_KEY", "test-secret")
+os.environ.setdefault("JWT_SECRET", "test-jwt-secret-of-at-least-32-bytes")
+os.environ.setdefault("MONGO_DBNAME", "splitwith_test")
+
+import mongomock
+import pytest
+from pymongo import ReplaceOne
+
+import app.models as models_package
+
+models_package.MongoClient = mongomock.MongoClient
+
+
+def _bulk_write(self, requests, ordered=True, session=None, **kwargs):
+    # mongomock can't bulk_write UpdateOne/ReplaceOne; run them one by one
+    for op in requests:
+        write = self.replace_one if isinstance(op, ReplaceOne) else self.update_one
+        write(op._filter, op._doc, upsert=op._upsert, session=session)
+
+
+mongomock.collection.Collection.bulk_write = _bulk_write
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import create_app
+
+    application = create_app()
+    application.testing = True
+    return application
+
+
+@pytest.fixture
+def db(app):
+    from app.models import GetDB
+    from app.utils.cache import fragment_cache
+
+    with app.app_context():
+        database = GetDB._get_db()
+        yield database
+        for name in database.list_collection_names():
+            database.drop_collection(name)
+    fragment_cache.clear()
+
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app, db):
+    from app.models.userModel import UserModel
+
+    def make(name):
+        return str(UserModel.create_user(f"{name}@test.local", name, name.title(), "9000000000", "pw").inserted_id)
+    return make
+
+
+@pytest.fixture
+def login(app):
+    from app.routes.userAuth import SetAndGetSession
+
+    def log_in(client, user_id):
+        token = SetAndGetSession({"user_id": user_id, "username": "test", "email": "test@test.local"})["token"]
+        client.set_cookie("session_token", token)
+        return client
+    return log_in
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+from app.models.expenseModel import ExpenseModel
+from app.models.groupModel import GroupModel
+
+
+def _stages(pipeline):
+    return [next(iter(stage)) for stage in pipeline]
+
+
+def _expense(group_id, payer, members, amount=30.0):
+    ExpenseModel.collection().insert_one({
+        **ExpenseModel.build_document({
+            "title": "Lunch",
+            "amount": amount,
+            "created_by": payer,
+            "split_type": "equal",
+            "split_with": members,
+            "final_split": ExpenseModel.calculate_split(amount, members, "equal", payer,
+                                                        custom_payments={payer: amount}),
+            "description": "",
+            "created_at": datetime.utcnow(),
+        }),
+        # As stored before schema v2 or after it
+        "group_id": group_id,
+    })
+
+
+def test_groups_are_limited_before_they_are_read():
+    pipeline = ExpenseModel._most_active_groups_pipeline("65a000000000000000000001", 3)
+    stages = _stages(pipeline)
+
+    assert stages.index("$group") < stages.index("$sort") < stages.index("$limit")
+    assert pipeline[stages.index("$limit")]["$limit"] == 3
+    assert "$lookup" not in stages
+
+
+def test_string_and_object_id_expenses_count_towards_one_group(db, make_user):
+    alice, bob = make_user("alice"), make_user("bob")
+    busy = GroupModel.create_group(alice, "Busy", "", members=[alice, bob])
+    quiet = GroupModel.create_group(alice, "Quiet", "", members=[alice, bob])
+    for group_id in (busy, str(busy), str(busy), quiet, quiet):
+        _expense(group_id, alice, [alice, bob])
+
+    rows = ExpenseModel.get_most_active_groups_for_user(alice, limit=1)
+
+    assert [(str(row["_id"]), row["expense_count"]) for row in rows] == [(str(busy), 3)]
+    assert rows[0]["group"]["group_title"] == "Busy"
+    assert "group_members" not in rows[0]["group"]
+
+
+def test_dashboard_lists_the_active_groups(client, make_user, login):
+    alice, bob = make_user("alice"), make_user("bob")
+    group_id = GroupModel.create_group(alice, "Flatmates", "", members=[alice, bob])
+    _expense(group_id, alice, [alice, bob])
+    _expense(str(group_id), bob, [alice, bob])
+
+    response = login(client, alice).get("/dashboard")
+
+    assert response.status_code == 200
+    html = response.get_data(as_text=True)
+    assert "Flatmates" in html and "Expenses: 2" in html
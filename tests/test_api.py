@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+from app.models.expenseModel import ExpenseModel
+from app.models.groupModel import GroupModel
+from app.utils.json_provider import bson_default
+
+
+def _expense(group_id, payer, members, created_at):
+    return ExpenseModel.create_expense({
+        "title": "Taxi",
+        "amount": 40.0,
+        "group_id": group_id,
+        "created_by": payer,
+        "split_type": "equal",
+        "split_with": members,
+        "final_split": ExpenseModel.calculate_split(40.0, members, "equal", payer,
+                                                    custom_payments={payer: 40.0}),
+        "description": "",
+        "created_at": created_at,
+    }).inserted_id
+
+
+def test_expenses_are_encoded_by_the_app_json_provider(client, make_user, login):
+    alice, bob = make_user("alice"), make_user("bob")
+    group_id = GroupModel.create_group(alice, "Trip", "", members=[alice, bob])
+    expense_id = _expense(group_id, alice, [alice, bob], datetime(2024, 5, 1, 12, 30, 15, 123000))
+
+    body = login(client, alice).get(f"/api/v1/groups/{group_id}/expenses").get_json()
+
+    row = body["data"][0]
+    stored = ExpenseModel.collection().find_one({"_id": expense_id})
+    assert row["id"] == str(expense_id)
+    assert row["group_id"] == str(group_id)
+    # One datetime format for the API and for jsonify/tojson
+    assert row["created_at"] == bson_default(stored["created_at"])
+
+
+def test_expense_cursors_walk_every_page(client, make_user, login):
+    alice, bob = make_user("alice"), make_user("bob")
+    group_id = GroupModel.create_group(alice, "Trip", "", members=[alice, bob])
+    start = datetime(2024, 5, 1, 12, 0, 0, 250000)
+    ids = {str(_expense(group_id, alice, [alice, bob], start + timedelta(minutes=n))) for n in range(5)}
+    login(client, alice)
+
+    seen, cursor = [], None
+    while True:
+        url = f"/api/v1/groups/{group_id}/expenses?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        body = client.get(url).get_json()
+        seen += [row["id"] for row in body["data"]]
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+
+    assert sorted(seen) == sorted(ids)
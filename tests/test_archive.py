@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from app.models.archiveModel import ArchiveModel
+from app.models.expenseModel import ExpenseModel
+
+
+def _expense(user_id, amount=100.0):
+    members = [user_id]
+    return ExpenseModel.create_expense({
+        "title": "Dinner",
+        "amount": amount,
+        "created_by": user_id,
+        "split_type": "equal",
+        "split_with": members,
+        "final_split": ExpenseModel.calculate_split(amount, members, "equal", user_id,
+                                                    custom_payments={user_id: amount}),
+        "description": "",
+        "created_at": datetime.utcnow(),
+    }).inserted_id
+
+
+def _flashes(client):
+    with client.session_transaction() as session:
+        return [message for _, message in session.get("_flashes", [])]
+
+
+def test_deleting_a_hot_expense(client, make_user, login):
+    user_id = make_user("alice")
+    expense_id = _expense(user_id)
+
+    login(client, user_id).post(f"/expense/delete/{expense_id}")
+
+    assert ExpenseModel.collection().find_one({"_id": expense_id}) is None
+    assert _flashes(client) == ["Expense deleted!"]
+
+
+def test_archived_expenses_are_not_deleted(client, make_user, login):
+    user_id = make_user("alice")
+    expense_id = _expense(user_id)
+    # Moved to cold storage as archive_group would
+    ArchiveModel.cold().insert_one(ExpenseModel.collection().find_one_and_delete({"_id": expense_id}))
+
+    login(client, user_id).post(f"/expense/delete/{expense_id}")
+
+    assert ArchiveModel.is_archived(expense_id)
+    assert _flashes(client) == ["Archived expenses can't be deleted."]
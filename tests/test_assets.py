@@ -0,0 +1,76 @@
+import gzip
+import os
+
+import pytest
+
+from app.utils.assets import fingerprint, precompress_static
+
+CSS = b"".join(b".card-%d { margin: %dpx; padding: 4px; color: #333; }\n" % (i, i % 16) for i in range(400))
+
+
+@pytest.fixture
+def static(app, client, tmp_path, monkeypatch):
+    (tmp_path / "app.css").write_bytes(CSS)
+    monkeypatch.setattr(app, "static_folder", str(tmp_path))
+    return tmp_path
+
+
+def test_precompressed_variants_are_smaller(static):
+    original, compressed = precompress_static(str(static))
+
+    gz = (static / "app.css.gz").read_bytes()
+    assert gzip.decompress(gz) == CSS
+    assert original >= len(CSS) and compressed < original
+    for variant in static.glob("app.css.*"):
+        assert variant.stat().st_size < len(CSS), variant.name
+
+
+def test_fingerprinted_asset_then_304(client, static):
+    url = f"/static/app.css?v={fingerprint(str(static / 'app.css'))}"
+
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.data == CSS
+    assert first.headers["ETag"]
+    assert "immutable" in first.headers["Cache-Control"]
+
+    again = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.data == b""
+
+
+def test_unfingerprinted_asset_revalidates(client, static):
+    response = client.get("/static/app.css")
+    assert response.status_code == 200
+    assert "no-cache" in response.headers["Cache-Control"]
+    assert client.get("/static/app.css", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+
+def test_precompressed_variant_is_served_and_saves_bytes(client, static):
+    precompress_static(str(static))
+
+    response = client.get("/static/app.css", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.data) == CSS
+    saved = len(CSS) - len(response.data)
+    assert saved > len(CSS) / 2
+
+    # Each encoding has its own ETag, and revalidates on its own
+    assert response.headers["ETag"] != client.get("/static/app.css").headers["ETag"]
+    again = client.get("/static/app.css", headers={"Accept-Encoding": "gzip",
+                                                   "If-None-Match": response.headers["ETag"]})
+    assert again.status_code == 304
+
+
+def test_stale_precompressed_variant_is_skipped(client, static):
+    precompress_static(str(static))
+    edited = CSS.replace(b"#333", b"#444")
+    (static / "app.css").write_bytes(edited)
+    gz = static / "app.css.gz"
+    os.utime(static / "app.css", ns=(gz.stat().st_mtime_ns + 10**9,) * 2)
+
+    response = client.get("/static/app.css", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.data == edited
@@ -0,0 +1,34 @@
+from app.utils.query_executor import QueryTimeout
+
+
+def _time_out_on_call(app, monkeypatch, n):
+    executor = app.query_executor
+    gather = executor.gather
+    calls = []
+
+    def timing_out(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == n:
+            raise QueryTimeout("too slow")
+        return gather(*args, **kwargs)
+
+    monkeypatch.setattr(executor, "gather", timing_out)
+    return calls
+
+
+def test_dashboard_renders(app, client, make_user, login):
+    user_id = make_user("alice")
+    assert login(client, user_id).get("/dashboard").status_code == 200
+
+
+def test_first_wave_timeout_is_a_503(app, client, make_user, login, monkeypatch):
+    user_id = make_user("alice")
+    _time_out_on_call(app, monkeypatch, 1)
+    assert login(client, user_id).get("/dashboard").status_code == 503
+
+
+def test_group_balances_timeout_is_a_503(app, client, make_user, login, monkeypatch):
+    user_id = make_user("alice")
+    calls = _time_out_on_call(app, monkeypatch, 2)
+    assert login(client, user_id).get("/dashboard").status_code == 503
+    assert len(calls) == 2
@@ -0,0 +1,71 @@
+from datetime import datetime
+
+from app.models.expenseModel import ExpenseModel
+from app.models.groupModel import GroupModel
+from app.routes.dashboard.groupRoute import cached_member_balances, compute_member_balances
+
+
+def test_cached_balances_include_a_new_group_expense(db, make_user):
+    alice, bob = make_user("alice"), make_user("bob")
+    group_id = GroupModel.create_group(alice, "Trip", "", members=[alice, bob])
+    members = [alice, bob]
+
+    # What the create route does, with a page view between the two writes
+    GroupModel.add_total_balance(group_id=group_id, amount=100.0)
+    assert cached_member_balances(GroupModel.find_by_id(group_id)) == {}
+    ExpenseModel.create_expense({
+        "title": "Dinner",
+        "amount": 100.0,
+        "group_id": group_id,
+        "created_by": alice,
+        "split_type": "equal",
+        "split_with": members,
+        "final_split": ExpenseModel.calculate_split(100.0, members, "equal", alice,
+                                                    custom_payments={alice: 100.0}),
+        "description": "",
+        "created_at": datetime.utcnow(),
+    })
+
+    expected = compute_member_balances(group_id)
+    assert expected == {alice: 50.0, bob: -50.0}
+    assert cached_member_balances(GroupModel.find_by_id(group_id)) == expected
+
+
+def _count_calls(monkeypatch, owner, name):
+    calls = []
+    original = getattr(owner, name)
+
+    def counted(*args, **kwargs):
+        calls.append(1)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(owner, name, staticmethod(counted))
+    return calls
+
+
+def test_group_page_data_is_read_once_per_version(client, make_user, login, monkeypatch):
+    from app.utils.cache import fragment_cache
+
+    alice, bob = make_user("alice"), make_user("bob")
+    group_id = GroupModel.create_group(alice, "Trip", "", members=[alice, bob])
+    reads = _count_calls(monkeypatch, ExpenseModel, "get_expenses_for_group")
+
+    for user_id in (alice, bob, alice):
+        assert login(client, user_id).get(f"/groups/{group_id}").status_code == 200
+    assert len(reads) == 1
+
+    GroupModel.touch(group_id)
+    login(client, alice).get(f"/groups/{group_id}")
+    assert len(reads) == 2
+    assert fragment_cache.stats_by_fragment()["group-page"]["hits"] >= 2
+
+
+def test_group_cards_skip_the_avatar_read_when_cached(client, make_user, login, monkeypatch):
+    alice, bob = make_user("alice"), make_user("bob")
+    GroupModel.create_group(alice, "Trip", "", members=[alice, bob])
+    reads = _count_calls(monkeypatch, GroupModel, "attach_preview_users")
+    login(client, alice)
+
+    assert "Trip" in client.get("/groups").get_data(as_text=True)
+    assert "Trip" in client.get("/groups").get_data(as_text=True)
+    assert len(reads) == 1
@@ -0,0 +1,25 @@
+from app.models.expenseModel import ExpenseModel
+from app.models.migrations import INDEXES
+
+
+def _leading_keys(collection):
+    return {next(iter(model.document["key"])) for model in INDEXES[collection]}
+
+
+def _or_branches(query):
+    return [next(iter(branch)) for branch in query["$or"]]
+
+
+def test_every_branch_of_the_user_expense_filters_is_indexed():
+    # An $or is only answered from indexes when every branch has one;
+    # otherwise the whole query scans the collection
+    user_id = "65a000000000000000000001"
+    filters = [
+        ExpenseModel._user_expenses_filter(user_id),
+        ExpenseModel._user_owes_pipeline(user_id)[0]["$match"],
+    ]
+    for collection in ("expenses", "expenses_archive"):
+        indexed = _leading_keys(collection)
+        for query in filters:
+            missing = [field for field in _or_branches(query) if field not in indexed]
+            assert not missing, f"{collection}: no index leads with {missing}"
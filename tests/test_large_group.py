@@ -0,0 +1,56 @@
+import pytest
+from bson import ObjectId
+
+from app.models.groupModel import GroupModel
+from app.models.membershipModel import MEMBER, OWNER
+from config import Config
+
+MEMBERS = 10000
+PAGE_SIZE = 200
+
+
+@pytest.fixture
+def large_group(db):
+    # No user documents: the walk only checks ids, and mongomock scans
+    # the whole collection for every page's name lookup
+    ids = [ObjectId() for _ in range(MEMBERS)]
+
+    group = GroupModel.build_group(
+        created_by=ids[0], title="Large Group", description="", members=[str(uid) for uid in ids]
+    )
+    group["_id"] = ObjectId()
+    db.groups.insert_one(group)
+    db.memberships.insert_many([
+        {"user_id": uid, "group_id": group["_id"], "role": OWNER if uid == ids[0] else MEMBER,
+         "joined_at": group["created_at"], "last_activity": group["created_at"]}
+        for uid in ids
+    ])
+    return str(group["_id"]), [str(uid) for uid in ids]
+
+
+def _walk_members(client, group_id):
+    seen, cursor = [], None
+    while True:
+        url = f"/api/v1/groups/{group_id}/members?limit={PAGE_SIZE}"
+        if cursor:
+            url += f"&cursor={cursor}"
+        response = client.get(url)
+        assert response.status_code == 200
+        body = response.get_json()
+        assert len(body["data"]) <= PAGE_SIZE
+        seen += [row["user_id"] for row in body["data"]]
+        cursor = body["next_cursor"]
+        if not cursor:
+            return seen
+
+
+@pytest.mark.parametrize("membership_reads", [False, True], ids=["member_array", "memberships"])
+def test_every_member_is_served_exactly_once(app, client, login, large_group, monkeypatch, membership_reads):
+    monkeypatch.setattr(Config, "MEMBERSHIP_READS", membership_reads)
+    monkeypatch.setitem(app.config, "MEMBERSHIP_READS", membership_reads)
+    group_id, ids = large_group
+
+    seen = _walk_members(login(client, ids[0]), group_id)
+
+    assert len(seen) == MEMBERS
+    assert sorted(seen) == sorted(ids)
@@ -0,0 +1,87 @@
+import json
+import random
+
+import pytest
+
+from app.utils.live import LiveBroker
+
+SUBSCRIBERS = 10000
+EVENTS = 20
+
+
+class FakeGroup:
+    """Stands in for the group's balance read: two members move per write."""
+
+    def __init__(self, members=12, seed=42):
+        self.rng = random.Random(seed)
+        self.version = 1
+        self.balances = {f"user{i}": 0.0 for i in range(members)}
+
+    def write(self):
+        payer, other = self.rng.sample(sorted(self.balances), 2)
+        amount = round(self.rng.uniform(1, 500), 2)
+        self.balances[payer] = round(self.balances[payer] + amount, 2)
+        self.balances[other] = round(self.balances[other] - amount, 2)
+        self.version += 1
+
+    def load(self, group_id):
+        return self.version, dict(self.balances)
+
+
+def _versions(frames):
+    return [json.loads(frame.split(b"data: ", 1)[1])["version"] for frame in frames]
+
+
+@pytest.fixture
+def group():
+    return FakeGroup()
+
+
+def test_every_subscriber_gets_every_frame_once_in_order(group):
+    broker = LiveBroker(queue_size=EVENTS + 1, debounce=0, load=group.load)
+    subscriptions = [broker.subscribe("g1", group.version, group.balances) for _ in range(SUBSCRIBERS)]
+
+    versions = []
+    for _ in range(EVENTS):
+        group.write()
+        versions.append(group.version)
+        delta = broker.refresh("g1")
+        # Only the two members that moved go out
+        assert set(delta["balances"]) <= set(group.balances) and len(delta["balances"]) == 2
+
+    assert broker.delivered == SUBSCRIBERS * EVENTS
+    for subscription in subscriptions:
+        frames = [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+        assert _versions(frames) == versions
+
+
+def test_notify_reaches_subscribers_through_the_dispatcher(group):
+    broker = LiveBroker(queue_size=EVENTS + 1, debounce=0, load=group.load)
+    subscriptions = [broker.subscribe("g1", group.version, group.balances) for _ in range(SUBSCRIBERS)]
+
+    for _ in range(EVENTS):
+        group.write()
+        broker.notify("g1")
+        # Every client has this version before the next write
+        assert {_versions([s.next(timeout=10)])[0] for s in subscriptions} == {group.version}
+
+
+def test_slow_clients_overflow_to_a_snapshot(group):
+    broker = LiveBroker(queue_size=4, debounce=0, load=group.load)
+    subscriptions = [broker.subscribe("g1", group.version, group.balances) for _ in range(SUBSCRIBERS)]
+    for _ in range(10):
+        group.write()
+        broker.refresh("g1")
+
+    assert broker.overflows == SUBSCRIBERS * 6
+    assert all(s.overflowed for s in subscriptions)
+    assert broker.snapshot("g1") == (group.version, group.balances)
+
+
+def test_unsubscribing_the_last_client_forgets_the_group(group):
+    broker = LiveBroker(load=group.load)
+    subscription = broker.subscribe("g1", group.version, group.balances)
+    broker.unsubscribe(subscription)
+    assert broker.subscriber_count() == 0
+    broker.notify("g1")  # nobody watches it: nothing is queued
+    assert broker.snapshot("g1") == (0, {})
@@ -0,0 +1,43 @@
+import logging
+
+import pytest
+from flask import Flask
+
+from app.utils import profiling
+from app.utils.profiling import ProfilerSettings, init_profiling, slow_query_logger
+
+
+@pytest.fixture
+def settings(tmp_path, monkeypatch):
+    fresh = ProfilerSettings()
+    fresh.enabled = False
+    fresh.dump_dir = str(tmp_path / "profiles")
+    monkeypatch.setattr(profiling, "settings", fresh)
+    yield fresh
+    profiling._detach_slow_query_file()
+
+
+@pytest.mark.parametrize("value, expected", [
+    (True, True), ("true", True), ("on", True), ("1", True),
+    (False, False), ("false", False), ("0", False), ("off", False),
+])
+def test_enabled_is_parsed_from_strings(settings, value, expected):
+    assert settings.update({"enabled": value})["enabled"] is expected
+
+
+def test_slow_query_file_only_once_enabled(settings, tmp_path):
+    log = tmp_path / "profiles" / "slow_queries.log"
+
+    init_profiling(Flask(__name__))
+    assert not log.exists()
+
+    settings.update({"enabled": "true"})
+    assert log.exists()
+
+
+def test_slow_query_file_detached_once_disabled(settings):
+    settings.update({"enabled": "true"})
+    assert any(isinstance(h, logging.FileHandler) for h in slow_query_logger.handlers)
+
+    settings.update({"enabled": "false"})
+    assert not any(isinstance(h, logging.FileHandler) for h in slow_query_logger.handlers)
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from app.models import eventModel
+from app.models.eventModel import EventModel
+from app.models.expenseModel import ExpenseModel
+from app.models.groupModel import GroupModel
+from app.models.projectionModel import PROJECTIONS, ProjectionModel
+
+
+def _expense(group_id, payer, members, amount):
+    return ExpenseModel.create_expense({
+        "title": "Groceries",
+        "amount": amount,
+        "group_id": group_id,
+        "created_by": payer,
+        "split_type": "equal",
+        "split_with": members,
+        "final_split": ExpenseModel.calculate_split(amount, members, "equal", payer,
+                                                    custom_payments={payer: amount}),
+        "description": "",
+        "created_at": datetime.utcnow(),
+    }).inserted_id
+
+
+def test_events_are_projected_in_id_order_once_settled(db, make_user, monkeypatch):
+    alice, bob = make_user("alice"), make_user("bob")
+    groups = [GroupModel.create_group(alice, f"G{i}", "", members=[alice, bob]) for i in range(2)]
+    _expense(groups[0], alice, [alice, bob], 100.0)
+    _expense(groups[1], bob, [alice, bob], 30.0)
+    _expense(groups[0], bob, [alice, bob], 20.0)
+
+    # Still inside the settle window: nothing is read yet
+    assert EventModel.read_after(None) == []
+    assert ProjectionModel.catch_up() == {name: 0 for name in PROJECTIONS}
+
+    monkeypatch.setattr(eventModel, "EVENT_SETTLE_SECONDS", -5)
+    events = EventModel.read_after(None)
+    assert [e["_id"] for e in events] == sorted(e["_id"] for e in events)
+    assert ProjectionModel.catch_up() == {name: 3 for name in PROJECTIONS}
+    assert ProjectionModel.offset("group_totals") == events[-1]["_id"]
+
+    totals = PROJECTIONS["group_totals"].collection()
+    assert totals.find_one({"_id": GroupModel.find_by_id(groups[0])["_id"]})["total"] == 120.0
+    assert ProjectionModel.group_balances(groups[0]) == {alice: 40.0, bob: -40.0}
+
+    # A batch replayed after a crash doesn't count twice
+    PROJECTIONS["group_totals"].apply(events)
+    assert totals.find_one({"_id": GroupModel.find_by_id(groups[0])["_id"]})["total"] == 120.0
+    assert ProjectionModel.catch_up() == {name: 0 for name in PROJECTIONS}
+
+
+def test_ensure_indexes_drops_the_old_seq_index(db):
+    from app.models.migrations import ensure_indexes
+
+    db.expense_events.create_index("seq", unique=True, name="seq")
+    ensure_indexes(db)
+    assert "seq" not in db.expense_events.index_information()
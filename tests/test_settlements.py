@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import settlementModel
+from app.models.archiveModel import ArchiveModel
+from app.models.expenseModel import ExpenseModel
+from app.models.groupModel import GroupModel
+from app.models.settlementModel import SettlementModel
+
+
+@pytest.fixture
+def rebuilds(monkeypatch):
+    # Run the checkpoint rebuilds by hand instead of on the background pool
+    queued = []
+    monkeypatch.setattr(settlementModel, "submit_in_app", lambda fn, *args: queued.append(args))
+    return queued
+
+
+def _split(amount, payer, members):
+    return ExpenseModel.calculate_split(amount, members, "equal", payer, custom_payments={payer: amount})
+
+
+def _expense(group_id, payer, members, amount, days_ago):
+    return ExpenseModel.create_expense({
+        "title": "Supplies",
+        "amount": amount,
+        "group_id": group_id,
+        "created_by": payer,
+        "split_type": "equal",
+        "split_with": members,
+        "final_split": _split(amount, payer, members),
+        "description": "",
+        "created_at": datetime.utcnow() - timedelta(days=days_ago),
+    }).inserted_id
+
+
+def _from_scratch(group_id):
+    """Every expense, hot or archived, and every settlement summed again."""
+    query = ExpenseModel._group_filter(group_id)
+    expenses = list(ExpenseModel.collection().find(query)) + list(ArchiveModel.cold().find(query))
+    balances = {uid: round(net, 2) for uid, net in ExpenseModel.sum_net_balances(expenses).items()}
+    return SettlementModel.apply_settlements(balances, SettlementModel.collection().find(query))
+
+
+def _assert_agrees(group_id):
+    computed = SettlementModel.compute_balances(group_id)
+    expected = _from_scratch(group_id)
+    for uid in set(computed) | set(expected):
+        assert computed.get(uid, 0.0) == pytest.approx(expected.get(uid, 0.0), abs=0.01), uid
+
+
+def test_balances_match_a_full_recompute(db, make_user, rebuilds):
+    alice, bob, carol = make_user("alice"), make_user("bob"), make_user("carol")
+    members = [alice, bob, carol]
+    group_id = GroupModel.create_group(alice, "House", "", members=members)
+    old = _expense(group_id, alice, members, 90.0, days_ago=30)
+    _expense(group_id, bob, members, 60.0, days_ago=20)
+
+    # A settlement writes a checkpoint covering both expenses
+    SettlementModel.record_settlement(group_id, bob, alice, 20.0, created_by=bob)
+    assert SettlementModel.latest_checkpoint(group_id) is not None
+    _assert_agrees(group_id)
+
+    # Editing an expense the checkpoint covers makes it stale until rebuilt
+    ExpenseModel.update_expense(old, {"amount": 120.0, "split_with": members,
+                                      "final_split": _split(120.0, alice, members)})
+    assert rebuilds and SettlementModel.latest_checkpoint(group_id) is None
+    _assert_agrees(group_id)
+    SettlementModel.rebuild_checkpoints(group_id)
+    assert SettlementModel.latest_checkpoint(group_id) is not None
+    _assert_agrees(group_id)
+
+    # A backdated expense lands behind the checkpoint
+    _expense(group_id, carol, members, 45.0, days_ago=1)
+    _assert_agrees(group_id)
+    SettlementModel.rebuild_checkpoints(group_id)
+    _assert_agrees(group_id)
+
+    # Archiving moves checkpointed expenses into the snapshot
+    assert ArchiveModel.archive_group(group_id, datetime.utcnow() - timedelta(days=10)) == 2
+    _assert_agrees(group_id)
+
+    # Deleting one the checkpoint covers
+    recent = _expense(group_id, bob, members, 30.0, days_ago=5)
+    SettlementModel.record_settlement(group_id, carol, bob, 10.0, created_by=carol)
+    ExpenseModel.delete_expense(recent)
+    SettlementModel.rebuild_checkpoints(group_id)
+    _assert_agrees(group_id)